@@ -0,0 +1,12 @@
+"""
+Biblyser (c) is a bibliometric workflow for evaluating the bib metrics of an
+individual or a group of people (an organisation).
+
+Biblyser is licensed under a MIT License.
+
+You should have received a copy of the license along with this work. If not,
+see <https://choosealicense.com/licenses/mit/>.
+
+BIBLYSER BENCHMARKS INITIALISATION FILE
+This file is needed for the benchmarks subpackage initialisation.
+"""
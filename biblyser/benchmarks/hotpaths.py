@@ -0,0 +1,306 @@
+"""
+The Hotpaths module benchmarks the hot paths of Biblyser on synthetic data at
+given sizes (see biblyser.benchmarks.synthetic), timing each path and tracking
+its peak memory. Results are saved as .json files, which can be compared
+between versions
+
+Run as a script to benchmark at default sizes e.g.
+python -m biblyser.benchmarks.hotpaths results.json --compare previous.json
+"""
+
+import os
+import io
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+import tracemalloc
+import pandas as pd
+import biblyser.name as name
+from biblyser.deferred import DeferredQueue, setDeferredQueue
+from biblyser.bibcollection import BibCollection, bibsFromCSV
+from biblyser.benchmarks.synthetic import makeOrganisation, \
+    makeBibCollection, fakeSources
+
+#Default benchmark sizes
+DEFAULT_SIZES = [{'names': 50, 'bibs': 1000, 'authors': 8,
+                  'duplicate_rate': 0.1},
+                 {'names': 200, 'bibs': 10000, 'authors': 8,
+                  'duplicate_rate': 0.1}]
+
+#Rates without rate limiting, for harvesting from local fakes
+NO_RATES = {'scopus': None, 'scholar': None, 'crossref': None,
+            'altmetric': None}
+
+#------------------------------------------------------------------------------
+
+def benchGetOrgAuthors(size, seed=0):
+    """Set up benchmark of Bib.getOrgAuthors over all bibs"""
+    collection = makeBibCollection(size['names'], size['bibs'],
+                                   size['authors'], size['duplicate_rate'],
+                                   seed=seed)
+    org = collection.getOrganisation()
+    return lambda: [b.getOrgAuthors(org) for b in collection.bibs]
+
+
+def benchAsDataFrame(size, seed=0):
+    """Set up benchmark of BibCollection.asDataFrame"""
+    collection = makeBibCollection(size['names'], size['bibs'],
+                                   size['authors'], size['duplicate_rate'],
+                                   seed=seed)
+    return collection.asDataFrame
+
+
+def benchRemoveDuplicates(size, seed=0):
+    """Set up benchmark of BibCollection.removeDuplicates"""
+    collection = makeBibCollection(size['names'], size['bibs'],
+                                   size['authors'], size['duplicate_rate'],
+                                   seed=seed)
+    return collection.removeDuplicates
+
+
+def benchGetAllGenders(size, seed=0):
+    """Set up benchmark of BibCollection.getAllGenders, with the organisation
+    as gender database. Genders are guessed without a warm cache, and
+    ambiguous genders are queued in a temporary deferred queue instead of
+    prompting"""
+    collection = makeBibCollection(size['names'], size['bibs'],
+                                   size['authors'], size['duplicate_rate'],
+                                   genders=False, seed=seed)
+    org = collection.getOrganisation()
+    name.GENDER_CACHE.clear()
+
+    def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            setDeferredQueue(DeferredQueue(os.path.join(tmp, 'queue.json')))
+            try:
+                collection.getAllGenders(org)
+            finally:
+                setDeferredQueue(None)
+    return run
+
+
+def benchBibsFromCSV(size, seed=0):
+    """Set up benchmark of bibsFromCSV, reading an exported BibCollection
+    from a temporary file"""
+    collection = makeBibCollection(size['names'], size['bibs'],
+                                   size['authors'], size['duplicate_rate'],
+                                   seed=seed)
+    tmp = tempfile.mkdtemp()
+    csv_file = os.path.join(tmp, 'bibs.csv')
+    collection.asDataFrame().to_csv(csv_file)
+
+    def run():
+        try:
+            bibsFromCSV(csv_file)
+        finally:
+            os.remove(csv_file)
+            os.rmdir(tmp)
+    return run
+
+
+def benchHarvestBibs(size, seed=0):
+    """Set up benchmark of BibCollection.harvestBibs from all sources, with
+    local fakes in place of bib databases. Bibs per name and source are set
+    so that the harvest totals roughly the benchmark number of bibs"""
+    org = makeOrganisation(size['names'], seed)
+    collection = BibCollection(org)
+    per_name = max(1, size['bibs'] // (3 * size['names']))
+
+    def run():
+        with fakeSources(per_name, size['authors'], seed):
+            collection.harvestBibs(scopus=True, scholar=True, crossref=True,
+                                   workers=4, rates=NO_RATES)
+    return run
+
+
+#Benchmarks by hot path name, each setting up and returning a run function
+BENCHMARKS = {'getOrgAuthors': benchGetOrgAuthors,
+              'asDataFrame': benchAsDataFrame,
+              'removeDuplicates': benchRemoveDuplicates,
+              'getAllGenders': benchGetAllGenders,
+              'bibsFromCSV': benchBibsFromCSV,
+              'harvestBibs': benchHarvestBibs}
+
+#------------------------------------------------------------------------------
+
+def runBenchmark(bench, size, repeats=3, seed=0):
+    """Run a benchmark, timing it over repeats and measuring its peak memory
+    in a separate run, as memory tracing slows execution. Each run is set up
+    afresh, and set up is neither timed nor traced
+
+    Parameters
+    ----------
+    bench : function
+      Benchmark set up function, taking a size and seed and returning a run
+      function
+    size : dict
+      Benchmark size (names, bibs, authors, duplicate_rate)
+    repeats : int, default 3
+      Number of timed runs
+    seed : int, default 0
+      Random seed of synthetic data
+
+    Returns
+    -------
+    dict
+      Best and all run times in seconds ("seconds", "all"), and peak memory
+      in bytes ("peak_memory")
+    """
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(repeats):
+            run = bench(size, seed)
+            t0 = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - t0)
+
+        #Measure peak memory of run
+        run = bench(size, seed)
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {'seconds': min(times), 'all': times, 'peak_memory': peak}
+
+
+def runBenchmarks(sizes=None, benchmarks=None, repeats=3, seed=0,
+                  label=None):
+    """Run benchmarks at all sizes
+
+    Parameters
+    ----------
+    sizes : list, optional
+      Benchmark sizes, as dicts of number of organisation names ("names"),
+      number of bibs ("bibs"), mean authors per bib ("authors") and duplicate
+      fraction ("duplicate_rate") (default is DEFAULT_SIZES)
+    benchmarks : list, optional
+      Names of benchmarks to run (default is all of BENCHMARKS)
+    repeats : int, default 3
+      Number of timed runs of each benchmark
+    seed : int, default 0
+      Random seed of synthetic data
+    label : str, optional
+      Label of results, such as a version or commit
+
+    Returns
+    -------
+    dict
+      Benchmark results, with environment information
+    """
+    if sizes is None:
+        sizes = DEFAULT_SIZES
+    if benchmarks is None:
+        benchmarks = list(BENCHMARKS)
+    for b in benchmarks:
+        if b not in BENCHMARKS:
+            raise ValueError(f'Invalid benchmark {b}. Expected one of ' \
+                             f'{list(BENCHMARKS)}')
+    results = []
+    for size in sizes:
+        for b in benchmarks:
+            print(f'Benchmarking {b} with {size}...')
+            result = runBenchmark(BENCHMARKS[b], size, repeats, seed)
+            results.append(dict(benchmark=b, **size, **result))
+    return {'label': label,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'repeats': repeats,
+            'seed': seed,
+            'results': results}
+
+
+def saveResults(results, filepath):
+    """Save benchmark results to .json file
+
+    Parameters
+    ----------
+    results : dict
+      Benchmark results (see runBenchmarks)
+    filepath : str
+      Filepath to .json file
+    """
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+
+def loadResults(filepath):
+    """Load benchmark results from .json file
+
+    Parameters
+    ----------
+    filepath : str
+      Filepath to .json file
+
+    Returns
+    -------
+    dict
+      Benchmark results
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compareResults(old, new):
+    """Compare benchmark results, such as between versions
+
+    Parameters
+    ----------
+    old : dict
+      Baseline benchmark results
+    new : dict
+      Benchmark results to compare with the baseline
+
+    Returns
+    -------
+    pandas.DataFrame
+      Best times and peak memory of benchmarks in both results, with the
+      ratio of new to old (below 1 is an improvement)
+    """
+    keys = ['benchmark', 'names', 'bibs', 'authors', 'duplicate_rate']
+    cols = keys + ['seconds', 'peak_memory']
+    df = pd.merge(pd.DataFrame(old['results'])[cols],
+                  pd.DataFrame(new['results'])[cols],
+                  on=keys, suffixes=('_old', '_new'))
+    df['time_ratio'] = df['seconds_new'] / df['seconds_old']
+    df['memory_ratio'] = df['peak_memory_new'] / df['peak_memory_old']
+    return df
+
+#------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark Biblyser hot ' \
+                                     'paths on synthetic data')
+    parser.add_argument('output', help='Filepath to output .json file')
+    parser.add_argument('--compare', help='Filepath to .json results to ' \
+                        'compare with')
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS),
+                        help='Benchmarks to run (default is all)')
+    parser.add_argument('--bibs', nargs='+', type=int,
+                        help='Numbers of bibs to benchmark at, with 50 ' \
+                        'names per 1000 bibs and default authors and ' \
+                        'duplicate rate')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--label', help='Label of results, e.g. a version')
+    args = parser.parse_args()
+
+    if args.bibs is not None:
+        sizes = [{'names': max(1, n // 20), 'bibs': n, 'authors': 8,
+                  'duplicate_rate': 0.1} for n in args.bibs]
+    else:
+        sizes = None
+    results = runBenchmarks(sizes, args.benchmarks, args.repeats,
+                            label=args.label)
+    saveResults(results, args.output)
+    df = pd.DataFrame(results['results'])
+    print(df[['benchmark', 'bibs', 'seconds', 'peak_memory']]
+          .to_string(index=False))
+    if args.compare is not None:
+        print(compareResults(loadResults(args.compare), results)
+              .to_string(index=False))
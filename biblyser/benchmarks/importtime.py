@@ -0,0 +1,103 @@
+"""
+The Importtime module measures the import time of the core data classes, and
+checks it against a budget. Source clients (Scopus, Google Scholar, CrossRef,
+gender guessing) are imported on first use, so importing the core data
+classes should not import any of them. Each import is measured in a fresh
+interpreter, so that modules already imported are not counted as free
+
+Run as a script to check the budget e.g.
+python -m biblyser.benchmarks.importtime
+"""
+
+import sys
+import json
+import subprocess
+
+#Core modules measured, as used in offline analysis
+CORE_MODULES = ['biblyser.bibcollection', 'biblyser.organisation',
+                'biblyser.stats', 'biblyser.cube']
+
+#Modules that should not be imported by the core modules
+LAZY_MODULES = ['scholarly', 'pybliometrics', 'habanero', 'gender_guesser',
+                'requests', 'selenium']
+
+#Import time budget of the core modules, in seconds
+IMPORT_BUDGET = 1.5
+
+#Script run in a fresh interpreter to measure import time
+MEASURE_SCRIPT = '''
+import sys, json, time
+t0 = time.perf_counter()
+for m in {modules!r}:
+    __import__(m)
+t = time.perf_counter() - t0
+print(json.dumps({{'seconds': t,
+                  'lazy': [m for m in {lazy!r} if m in sys.modules]}}))
+'''
+
+#------------------------------------------------------------------------------
+
+def measureImportTime(modules=None, repeats=5):
+    """Measure import time of modules in fresh interpreters
+
+    Parameters
+    ----------
+    modules : list, optional
+      Modules to import together (default is CORE_MODULES)
+    repeats : int, default 5
+      Number of fresh interpreters to measure in
+
+    Returns
+    -------
+    dict
+      Best and all import times in seconds ("seconds", "all"), and any lazy
+      modules that were imported ("lazy")
+    """
+    if modules is None:
+        modules = CORE_MODULES
+    script = MEASURE_SCRIPT.format(modules=list(modules), lazy=LAZY_MODULES)
+    times = []
+    lazy = set()
+    for i in range(repeats):
+        out = subprocess.run([sys.executable, '-c', script], check=True,
+                             capture_output=True, text=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        times.append(result['seconds'])
+        lazy.update(result['lazy'])
+    return {'seconds': min(times), 'all': times, 'lazy': sorted(lazy)}
+
+
+def checkImportBudget(budget=IMPORT_BUDGET, modules=None, repeats=5):
+    """Check that modules import within a time budget and without importing
+    any source clients
+
+    Parameters
+    ----------
+    budget : float, optional
+      Import time budget, in seconds (default is IMPORT_BUDGET)
+    modules : list, optional
+      Modules to import together (default is CORE_MODULES)
+    repeats : int, default 5
+      Number of fresh interpreters to measure in, of which the best is
+      compared against the budget
+
+    Returns
+    -------
+    dict
+      Import time result (see measureImportTime)
+    """
+    result = measureImportTime(modules, repeats)
+    if len(result['lazy']) > 0:
+        raise RuntimeError(f'Source clients imported eagerly: ' \
+                           f'{", ".join(result["lazy"])}')
+    if result['seconds'] > budget:
+        raise RuntimeError(f'Import time {result["seconds"]:.3f} s exceeds ' \
+                           f'budget of {budget:.3f} s')
+    return result
+
+#------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    result = checkImportBudget()
+    print(f'Import time {result["seconds"]:.3f} s within budget of ' \
+          f'{IMPORT_BUDGET:.3f} s')
@@ -0,0 +1,340 @@
+"""
+The Synthetic module generates synthetic Organisation and BibCollection
+objects at given sizes, for benchmarking without network access. Bib database
+sources (Scopus, Google Scholar, CrossRef, Altmetric) can be replaced by local
+fakes that generate bibs instead of retrieving them (see fakeSources).
+Generated data is deterministic for a given seed
+"""
+
+import zlib
+import contextlib
+import numpy as np
+from datetime import datetime, timedelta
+import biblyser.bibcollection as bibcollection
+from biblyser.bib import Bib
+from biblyser.organisation import Organisation
+
+#First names by gender, including names that gender_guesser finds ambiguous
+FIRST_NAMES = {'female': ['Anna', 'Maria', 'Karen', 'Sarah', 'Emma', 'Laura',
+                          'Helen', 'Sofia', 'Ingrid', 'Julia', 'Hanna',
+                          'Louise', 'Clara', 'Eva', 'Nina', 'Ruth'],
+               'male': ['Peter', 'Jens', 'Michael', 'David', 'Thomas',
+                        'Lars', 'Martin', 'Andreas', 'Robert', 'Henrik',
+                        'Paul', 'Erik', 'Jonas', 'Simon', 'Karl', 'Mark'],
+               'non-binary': ['Alex', 'Robin', 'Kim', 'Sam', 'Charlie',
+                              'Jamie']}
+
+#Syllables that synthetic surnames are composed of
+SURNAME_SYLLABLES = ['and', 'ber', 'dal', 'sen', 'hol', 'mar', 'kin', 'ston',
+                     'win', 'gaard', 'lund', 'fer', 'ring', 'ton', 'vik',
+                     'mo', 'ley', 'brook', 'har', 'quist']
+
+#Words that synthetic titles are composed of
+TITLE_WORDS = ['ice', 'sheet', 'glacier', 'mass', 'balance', 'melt', 'runoff',
+               'surface', 'Greenland', 'Arctic', 'snow', 'firn', 'climate',
+               'model', 'velocity', 'calving', 'ocean', 'temperature',
+               'observations', 'satellite', 'radar', 'altimetry', 'changes',
+               'dynamics', 'retreat', 'albedo', 'energy', 'budget', 'basal',
+               'sliding', 'terminus', 'fjord', 'sea', 'level', 'rise',
+               'projections', 'uncertainty', 'trends', 'records', 'seasonal']
+
+#Journals of synthetic bibs, including ones removed by keyword filters
+JOURNALS = ['The Cryosphere', 'Journal of Glaciology', 'Nature',
+            'Geophysical Research Letters', 'Annals of Glaciology',
+            'Earth System Science Data', 'The Cryosphere Discussions',
+            'EGU General Assembly Abstracts']
+
+#Affiliation institutes and countries of synthetic bibs
+INSTITUTES = [['GEUS', 'Denmark'], ['University of Copenhagen', 'Denmark'],
+              ['NASA Goddard', 'United States'], ['Utrecht University',
+              'Netherlands'], ['Alfred Wegener Institute', 'Germany'],
+              ['University of Leeds', 'United Kingdom'], ['ETH Zurich',
+              'Switzerland'], ['University of Oslo', 'Norway']]
+
+#Sources of bibs for duplicates, which differ from the original source
+DUPLICATE_SOURCES = {'scopus': 'crossref', 'crossref': 'scholar',
+                     'scholar': 'scopus'}
+
+#------------------------------------------------------------------------------
+
+def makeNames(n, seed=0, middle_rate=0.3):
+    """Make unique synthetic full names, with genders given by first name
+
+    Parameters
+    ----------
+    n : int
+      Number of names
+    seed : int, default 0
+      Random seed
+    middle_rate : float, default 0.3
+      Fraction of names with a middle name
+
+    Returns
+    -------
+    names : list
+      Full name strings
+    genders : list
+      Gender of each name
+    """
+    rng = np.random.RandomState(seed)
+    firsts = [[f, g] for g in FIRST_NAMES for f in FIRST_NAMES[g]]
+    names = {}
+    while len(names) < n:
+        first, g = firsts[rng.randint(len(firsts))]
+        k = rng.randint(len(SURNAME_SYLLABLES), size=rng.randint(2, 4))
+        surname = ''.join([SURNAME_SYLLABLES[i] for i in k]).capitalize()
+        if rng.rand() < middle_rate:
+            middle = firsts[rng.randint(len(firsts))][0]
+            fullname = f'{first} {middle} {surname}'
+        else:
+            fullname = f'{first} {surname}'
+        names.setdefault(fullname, g)
+    return list(names), list(names.values())
+
+
+def makeOrganisation(n_names, seed=0):
+    """Make synthetic Organisation, with the gender of every name given
+
+    Parameters
+    ----------
+    n_names : int
+      Number of names
+    seed : int, default 0
+      Random seed
+
+    Returns
+    -------
+    Organisation
+      Synthetic Organisation
+    """
+    names, genders = makeNames(n_names, seed)
+    return Organisation(names, genders=genders)
+
+
+def makeBib(rng, authors, genders=None, source='scopus'):
+    """Make synthetic Bib object with random publication information
+
+    Parameters
+    ----------
+    rng : numpy.random.RandomState
+      Random state
+    authors : list
+      Author full name strings
+    genders : list, optional
+      Gender of each author. If not given, genders are left undefined
+    source : str, default "scopus"
+      Bib database source
+
+    Returns
+    -------
+    Bib
+      Synthetic Bib object
+    """
+    k = rng.randint(len(TITLE_WORDS), size=rng.randint(6, 13))
+    title = ' '.join([TITLE_WORDS[i] for i in k]).capitalize()
+    doi = f'10.{5000+rng.randint(100)}/synth-{rng.randint(1 << 30):x}'
+    date = datetime(2000, 1, 1) + timedelta(days=int(rng.randint(8766)))
+    aff = [INSTITUTES[i] for i in
+           sorted(set(rng.randint(len(INSTITUTES), size=rng.randint(1, 4))))]
+    return Bib(doi=doi, title=title, authors=authors, date=date,
+               ptype='Journal', journal=JOURNALS[rng.randint(len(JOURNALS))],
+               citations=int(rng.poisson(20)), genders=genders,
+               aff_institutes=[a[0] for a in aff],
+               aff_countries=list(dict.fromkeys([a[1] for a in aff])),
+               source=source)
+
+
+def makeBibs(n_bibs, organisation=None, authors_per_bib=8, duplicate_rate=0.1,
+             org_rate=0.5, genders=True, seed=0):
+    """Make synthetic bibs, with co-authors drawn from a pool of synthetic
+    names and a fraction of authors from an organisation. Duplicates are
+    copies of earlier bibs from another source, with a differently formatted
+    DOI and a different citation count
+
+    Parameters
+    ----------
+    n_bibs : int
+      Number of bibs, including duplicates
+    organisation : Organisation, optional
+      Organisation that authors are drawn from
+    authors_per_bib : int, default 8
+      Mean number of authors per bib
+    duplicate_rate : float, default 0.1
+      Fraction of bibs that are duplicates of other bibs
+    org_rate : float, default 0.5
+      Fraction of bibs with an organisation first author. Other authors are
+      organisation authors at a fifth of this rate
+    genders : bool, default True
+      Flag to denote if author genders should be given (True), or left
+      undefined (False)
+    seed : int, default 0
+      Random seed
+
+    Returns
+    -------
+    list
+      Synthetic Bib objects
+    """
+    rng = np.random.RandomState(seed)
+    pool, pool_genders = makeNames(max(100, n_bibs), seed+1)
+    if organisation is not None:
+        org_names = [n.fullname for n in organisation.names]
+        org_genders = [n.gender for n in organisation.names]
+    else:
+        org_names = []
+
+    #Make unique bibs
+    n_dup = int(round(n_bibs * duplicate_rate))
+    bibs = []
+    for i in range(n_bibs - n_dup):
+        authors, gens = [], []
+        for j in range(1 + rng.poisson(max(authors_per_bib-1, 0))):
+            rate = org_rate if j == 0 else org_rate / 5
+            if len(org_names) > 0 and rng.rand() < rate:
+                k = rng.randint(len(org_names))
+                authors.append(org_names[k])
+                gens.append(org_genders[k])
+            else:
+                k = rng.randint(len(pool))
+                authors.append(pool[k])
+                gens.append(pool_genders[k])
+        bibs.append(makeBib(rng, authors, gens if genders else None))
+
+    #Insert duplicates after the bibs they duplicate
+    for i in sorted(rng.randint(len(bibs), size=n_dup), reverse=True):
+        b = bibs[i]
+        dup = Bib(doi='https://doi.org/' + b.doi.upper(), title=b.title,
+                  authors=[a.fullname for a in b.authors], date=b.date,
+                  ptype=b.ptype, journal=b.journal,
+                  citations=b.citations + int(rng.randint(5)),
+                  genders=b.genders, aff_institutes=b.aff_institutes,
+                  aff_countries=b.aff_countries,
+                  source=DUPLICATE_SOURCES[b.source])
+        bibs.insert(i+1, dup)
+    return bibs
+
+
+def makeBibCollection(n_names, n_bibs, authors_per_bib=8, duplicate_rate=0.1,
+                      genders=True, seed=0):
+    """Make synthetic BibCollection with an affiliated synthetic Organisation
+
+    Parameters
+    ----------
+    n_names : int
+      Number of organisation names
+    n_bibs : int
+      Number of bibs, including duplicates
+    authors_per_bib : int, default 8
+      Mean number of authors per bib
+    duplicate_rate : float, default 0.1
+      Fraction of bibs that are duplicates of other bibs
+    genders : bool, default True
+      Flag to denote if author genders should be given (True), or left
+      undefined (False)
+    seed : int, default 0
+      Random seed
+
+    Returns
+    -------
+    BibCollection
+      Synthetic BibCollection
+    """
+    org = makeOrganisation(n_names, seed)
+    bibs = makeBibs(n_bibs, org, authors_per_bib, duplicate_rate,
+                    genders=genders, seed=seed)
+    collection = bibcollection.BibCollection(bibs)
+    collection.addOrganisation(org)
+    return collection
+
+
+def fakeFetcher(source, bibs_per_name=10, authors_per_bib=8, seed=0):
+    """Get fake bib retrieval function for a bib database source, which
+    generates bibs with the given name as first author. The same bibs are
+    generated for a name on every call
+
+    Parameters
+    ----------
+    source : str
+      Bib database source ("scopus", "scholar" or "crossref")
+    bibs_per_name : int, default 10
+      Number of bibs generated per name
+    authors_per_bib : int, default 8
+      Mean number of authors per bib
+    seed : int, default 0
+      Random seed
+
+    Returns
+    -------
+    function
+      Fake retrieval function, taking a Name object and returning a list of
+      Bib objects
+    """
+    pool, pool_genders = makeNames(max(100, bibs_per_name * 10), seed+1)
+
+    def fetch(n):
+        rng = np.random.RandomState(zlib.crc32(f'{seed} {source} ' \
+                                               f'{n.fullname}'.encode()))
+        bibs = []
+        for i in range(bibs_per_name):
+            k = rng.randint(len(pool),
+                            size=rng.poisson(max(authors_per_bib-1, 0)))
+            authors = [n.fullname] + [pool[j] for j in k]
+            bibs.append(makeBib(rng, authors, source=source))
+        return bibs
+    return fetch
+
+
+def fakeAltmetricScore(doi):
+    """Fake Altmetric score retrieval, giving a score derived from the DOI
+    (see biblyser.bib.retrieveAltmetricScore)
+
+    Parameters
+    ----------
+    doi : str
+      DOI string
+
+    Returns
+    -------
+    score : float or None
+      Altmetric score, or None if no DOI is given
+    status : str
+      Outcome of retrieval ("found" or "no_doi")
+    """
+    if not isinstance(doi, str) or doi == '':
+        return None, 'no_doi'
+    return zlib.crc32(doi.encode()) % 1000 / 10, 'found'
+
+
+@contextlib.contextmanager
+def fakeSources(bibs_per_name=10, authors_per_bib=8, seed=0):
+    """Context manager replacing bib database sources with local fakes, so
+    that harvesting bibs (see BibCollection.harvestBibs) and retrieving
+    Altmetric scores make no network calls e.g.
+
+    with fakeSources(bibs_per_name=20):
+        collection.harvestBibs(scopus=True, scholar=True, crossref=True)
+
+    Parameters
+    ----------
+    bibs_per_name : int, default 10
+      Number of bibs generated per name and source
+    authors_per_bib : int, default 8
+      Mean number of authors per bib
+    seed : int, default 0
+      Random seed
+    """
+    fakes = {'fetchScopusBibs': fakeFetcher('scopus', bibs_per_name,
+                                            authors_per_bib, seed),
+             'fetchScholarBibs': fakeFetcher('scholar', bibs_per_name,
+                                             authors_per_bib, seed),
+             'fetchCRBibs': fakeFetcher('crossref', bibs_per_name,
+                                        authors_per_bib, seed),
+             'retrieveAltmetricScore': fakeAltmetricScore}
+    originals = {k: getattr(bibcollection, k) for k in fakes}
+    for k, f in fakes.items():
+        setattr(bibcollection, k, f)
+    try:
+        yield
+    finally:
+        for k, f in originals.items():
+            setattr(bibcollection, k, f)
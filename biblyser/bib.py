@@ -3,11 +3,17 @@ The Bib module handles all functionality with a publication, or bib item, such
 as information retrieval from a bib database and authorship analysis
 """
 
-import requests
-from datetime import datetime
-from habanero import Crossref
-from scholarly import scholarly
+import math
+import numbers
+import hashlib
+from datetime import datetime, date as dt_date
 from biblyser.name import Name, getKeyValue
+from biblyser.cache import cachedCall
+from biblyser.clients import crossrefWorks, altmetricDOI
+from biblyser.concurrency import limitRate
+
+#Recognised publication date string formats (see toDatetime)
+DATE_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%d/%m/%Y', '%Y']
 
 #------------------------------------------------------------------------------
 
@@ -34,12 +40,23 @@ class Bib(object):
       Number of citations
     altmetrics : int
       Altmetric score
+    altmetric_status : str
+      Outcome of Altmetric retrieval (see retrieveAltmetricScore)
     genders : list
       List of author genders
    aff_institutes : list
       List of author institutes
    aff_countries : list
       List of author countries
+    source : str
+      Bib database the publication was retrieved from (e.g. "scopus", 
+      "scholar", "crossref")
+    author_ids : list
+      Bib database IDs of authors (e.g. Scopus author IDs), in author order
+    author_institutes : list
+      Affiliation institutes of each author, in author order
+    author_countries : list
+      Affiliation countries of each author, in author order
     """
     
     def __init__(self, **kwargs):
@@ -49,7 +66,9 @@ class Bib(object):
         ----------           
         **kwargs : dict, optional                  
           Keyword arguments for input to Bib object. Keywords include doi, 
-          title, date, ptype, journal, citations, altmetrics and genders
+          title, date, ptype, journal, citations, altmetrics, 
+          altmetric_status, genders, aff_institutes, aff_countries, source, author_ids, 
+          author_institutes and author_countries
         """
         
         #Take doi and/or title inputs
@@ -82,9 +101,14 @@ class Bib(object):
             self.journal = getKeyValue(kwargs, 'journal')
             self.citations = getKeyValue(kwargs, 'citations')
             self.altmetrics = getKeyValue(kwargs, 'altmetrics')
+            self.altmetric_status = getKeyValue(kwargs, 'altmetric_status')
             self.genders = getKeyValue(kwargs, 'genders')
             self.aff_institutes= getKeyValue(kwargs, 'aff_institutes')
-            self.aff_countries = getKeyValue(kwargs, 'aff_countries')            
+            self.aff_countries = getKeyValue(kwargs, 'aff_countries')
+            self.source = getKeyValue(kwargs, 'source')
+            self.author_ids = getKeyValue(kwargs, 'author_ids')
+            self.author_institutes = getKeyValue(kwargs, 'author_institutes')
+            self.author_countries = getKeyValue(kwargs, 'author_countries')
         
 
     def getFirstAuthor(self):
@@ -103,13 +127,7 @@ class Bib(object):
     def getStrAuthors(self):
         """Return all author full names as a comma-delineated string"""
         if self.authors != None:
-            all_authors=[]
-            for a in self.authors:
-                try:
-                    all_authors.append(a.originalname)
-                except:
-                    all_authors.append(a)
-            return ', '.join(all_authors)
+            return ', '.join(getOriginalNames(self.authors))
         else:
             return None
         
@@ -128,9 +146,9 @@ class Bib(object):
           Flag denoting if bib was published before (False) or after (True) 
           given date
         """        
-        if self.date != None:
-            if self.date >= dt:
-                return True
+        date = toDatetime(self.date)
+        if date != None:
+            return date >= toDatetime(dt)
         else:
             return False
         
@@ -148,20 +166,44 @@ class Bib(object):
         org_names : list
           List of bib authors that are within Organisation
         """
-        org_names=[]
+        org_names={}
         if self.authors != None:
             for a in self.authors:
-                all_a = a.getAllNameFormats()
-                for aa in all_a:
+                for aa in a.getFormats()[:4]:
                     name = organisation.checkOrgName(aa)
                     if name != None:
-                        org_names.append(name)
-            org_names = list(set(org_names))
-            return org_names
+                        org_names[name] = None
+            return list(org_names)
         else:
             return None
 
 
+    def matchOrgAuthors(self, organisation):
+        """Return organisation name matching each bib author, checking the 
+        most specific name format (full name) first
+        
+        Parameters
+        ----------
+        organisation : Organisation         
+          Organisation object to compare Bib authors to
+        
+        Returns
+        -------
+        list
+          Organisation Name objects in author order, with None for authors
+          that are not within Organisation
+        """
+        matches = []
+        for a in self.authors:
+            match = None
+            for aa in a.getFormats()[:4]:
+                match = organisation.checkOrgName(aa)
+                if match != None:
+                    break
+            matches.append(match)
+        return matches
+
+
     def getOrgGender(self, org_names):
         """Return genders of organisation authors
         
@@ -235,11 +277,14 @@ class Bib(object):
         else:
             
             #Conduct CrossRef search based on title
-            cr = Crossref()   
             clean_title = self.title.lower()
             if '…' in clean_title:
                 clean_title = clean_title[:-1]
-            search = cr.works(query_title = clean_title, select='title,DOI')
+            search = cachedCall('crossref', 
+                                {'query_title': clean_title, 
+                                 'select': 'title,DOI'},
+                                lambda: crossrefWorks(query_title=clean_title, 
+                                                      select='title,DOI'))
             assert search['status'] == "ok"
             
             #Find matching titles
@@ -257,24 +302,18 @@ class Bib(object):
     def retrieveFromAMetric(self): 
         """get Altmetrics of Bib object. If Altmetrics are not already a Bib
         attribute, Altmetrics will be retrieved using a DOI search from the 
-        Altmetrics API
+        Altmetrics API, and the outcome recorded in altmetric_status. Bibs 
+        already found or not found on Altmetric are not retrieved again
         
         Returns
         -------
         int
           Altmetric score
         """
-        if self.altmetrics == None:
-            try:
-                altmet = fetchAltmetrics(self.doi)
-                self.altmetrics = getKeyValue(altmet, 'score')
-                # getKeyValue(altmet, 'title')
-                # getKeyValue(altmet, 'authors')
-                # getKeyValue(altmet, 'journal')
-                # getKeyValue(altmet, 'type')
-                # getKeyValue(altmet, 'published_on')
-            except:
-                self.altmetrics = None
+        if self.altmetrics == None and \
+            self.altmetric_status not in ['found', 'not_found']:
+            self.altmetrics, self.altmetric_status = \
+                retrieveAltmetricScore(self.doi)
         return self.altmetrics
             
                             
@@ -298,6 +337,93 @@ class Bib(object):
     
 #------------------------------------------------------------------------------         
 
+def toDatetime(date):
+    """Normalise publication date to a datetime object, from a datetime, date,
+    year, or string (e.g. "2021-03-01 00:00:00", "2021-03-01", "2021")
+    
+    Parameters
+    ----------
+    date : datetime or date or int or float or str
+      Publication date, where numbers (including numpy numbers) are years
+    
+    Returns
+    -------
+    datetime or None
+      Publication date as datetime, or None if date is missing or invalid 
+      (e.g. NaN, infinite or out of range years)
+    """
+    if isinstance(date, datetime):
+        return date
+    elif isinstance(date, dt_date):
+        return datetime(date.year, date.month, date.day)
+    elif isinstance(date, numbers.Real) and not isinstance(date, bool):
+        if not math.isfinite(date):
+            return None
+        try:
+            return datetime(int(date), 1, 1)
+        except ValueError:
+            return None
+    elif isinstance(date, str):
+        for f in DATE_FORMATS:
+            try:
+                return datetime.strptime(date.strip(), f)
+            except ValueError:
+                pass
+    return None
+
+
+def getOriginalNames(authors):
+    """Return original names of authors, as given when the Name objects were
+    created
+    
+    Parameters
+    ----------
+    authors : list
+      List of Name objects or name strings
+    
+    Returns
+    -------
+    list
+      List of name strings
+    """
+    all_authors=[]
+    for a in authors:
+        try:
+            all_authors.append(a.originalname)
+        except AttributeError:
+            all_authors.append(a)
+    return all_authors
+
+
+def getAuthorID(author, org_name=None, scopusid=None):
+    """Return stable author ID, hashed from the Scopus ID of the author if 
+    known, otherwise from their organisation name or their full name
+    
+    Parameters
+    ----------
+    author : Name
+      Bib author
+    org_name : Name, optional
+      Organisation name matching the author
+    scopusid : str, optional
+      Scopus author ID given in the bib
+    
+    Returns
+    -------
+    str
+      Author ID, as 16 hexadecimal characters
+    """
+    if org_name != None and org_name.scopusid not in [None, '']:
+        scopusid = org_name.scopusid
+    if scopusid not in [None, '']:
+        key = 'scopus:' + str(scopusid)
+    elif org_name != None:
+        key = 'name:' + org_name.fullname.lower()
+    else:
+        key = 'name:' + author.fullname.lower()
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
 def countGenders(genders):
     """Count genders in list
     
@@ -381,10 +507,10 @@ def fromCrossRef(author):
     #Initialise crossref and search
     out=[]
     a = author.lower()
-    cr = Crossref()
     
     #Conduct search based on author
-    search = cr.works(query=author)
+    search = cachedCall('crossref', {'query': author}, 
+                        lambda: crossrefWorks(query=author))
     
     #Match author to names in authorship list
     assert search['status'] == "ok"
@@ -472,6 +598,7 @@ def fromScopus(scopus_author):
     bibs : list
       List of Scopus search publications (scopus.scopus_search.Document)
     """
+    limitRate('scopus')
     bibs = scopus_author.get_documents()   
     return bibs
 
@@ -489,12 +616,14 @@ def fromScholar(scholar_author):
     bibs : list
       List of Scholar bibs
     """
+    from scholarly import scholarly
     bibs = []
     
     #Get all publications
     for p in scholar_author['publications']: 
         
         #Populate search hit
+        limitRate('scholar')
         pub = scholarly.fill(p)
     
         #Get info
@@ -541,7 +670,25 @@ def extractScholarItem(pub, item):
 
 
 def fetchAltmetrics(doi):
-    """Fetch altmetrics from DOI
+    """Fetch altmetrics from DOI. Responses are cached if a response cache is
+    active, including DOIs without an Altmetric record
+    
+    Parameters
+    ----------
+    doi : str                           
+      DOI string to search with
+    
+    Returns
+    -------
+    result : dict or None
+      Altmetrics result, or None if DOI has no Altmetric record
+    """
+    return cachedCall('altmetric', {'doi': doi}, 
+                      lambda: requestAltmetrics(doi), cache_none=True)
+
+
+def requestAltmetrics(doi):
+    """Request altmetrics from the Altmetrics API
     
     Parameters
     ----------
@@ -550,12 +697,44 @@ def fetchAltmetrics(doi):
     
     Returns
     -------
-    result : dict
-      Altmetrics result
+    result : dict or None
+      Altmetrics result, or None if DOI has no Altmetric record
     """
-    api = 'https://api.altmetric.com/v1/doi/'
-    response = requests.get(api + doi)
+    response = altmetricDOI(doi)
     if response.status_code == 200:
-        result = response.json()
-    return result
+        return response.json()
+    elif response.status_code == 404:
+        return None
+    else:
+        response.raise_for_status()
+        raise IOError(f'Unexpected Altmetric response {response.status_code}'\
+                      f' for {doi}')
+
 
+def retrieveAltmetricScore(doi):
+    """Retrieve Altmetric score from DOI, along with the outcome of the 
+    retrieval
+    
+    Parameters
+    ----------
+    doi : str                           
+      DOI string to search with
+    
+    Returns
+    -------
+    score : float or None
+      Altmetric score, or None if not retrieved
+    status : str
+      Outcome of retrieval ("found", "not_found", "no_doi", or "error" 
+      followed by the error message)
+    """
+    if not isinstance(doi, str) or doi == '':
+        return None, 'no_doi'
+    try:
+        altmet = fetchAltmetrics(doi)
+    except Exception as e:
+        return None, f'error: {e}'
+    if altmet is None:
+        return None, 'not_found'
+    else:
+        return getKeyValue(altmet, 'score'), 'found'
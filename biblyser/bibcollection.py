@@ -4,17 +4,24 @@ publications associated with an author or group of authors
 """
 
 import copy
+from bisect import bisect_left
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from scholarly import scholarly
-import gender_guesser.detector as gender
-from pybliometrics.scopus import AuthorRetrieval
 
-from biblyser.name import Name, guessGender, defineGender
+from biblyser.deferred import getDeferredQueue
+from biblyser.concurrency import getRateLimiters, runConcurrent, limitRate
+from biblyser.name import Name, guessGenders, defineGender, AMBIGUOUS_GENDERS
 from biblyser.bib import Bib, fromCrossRef, fromScholar, fromScopus, countGenders, \
-    listToStr
+    listToStr, retrieveAltmetricScore, toDatetime, getOriginalNames, \
+    getAuthorID
 from biblyser.organisation import Organisation, orgFromCSV, checkGender
+from biblyser.database import NameDatabase
+from biblyser.dedup import groupDuplicates, mergeBibs, findNearDuplicates
+from biblyser.stats import getGenderDistrib, firstFromDF, countByYear
+from biblyser.cube import BibCube
+from biblyser.filters import keywordPredicate, authorCountPredicate, \
+    anyPredicate, compileKeywords, matchKeywords
 
 #------------------------------------------------------------------------------
 
@@ -28,6 +35,9 @@ class BibCollection(object):
       Organisation associated with BibCollection
     bibs : list
       List of Bib objects
+    date_index : DateIndex
+      Bibs sorted by publication date, built on first date query (see 
+      getDateIndex)
     """
     
     def __init__(self, args):
@@ -40,6 +50,7 @@ class BibCollection(object):
           Name objects
         """
         print(f'Defining BibCollection object from {type(args)}...')
+        self.date_index = None
         
         #Assign from Organisation object input
         if isinstance(args, Organisation):
@@ -50,7 +61,7 @@ class BibCollection(object):
         elif isinstance(args, list):
             
             #Compile Bib objects
-            if isinstance(args[0], Bib):
+            if len(args) == 0 or isinstance(args[0], Bib):
                 self.organisation = None
                 self.bibs = args
             
@@ -96,103 +107,94 @@ class BibCollection(object):
             [self.bibs.append(b) for b in bibs_list]   
         else:
             self.bibs = bibs_list  
+        self.date_index = None
         
         
-    def getCRBibs(self):
-        """Retrieve CrossRef bibs associated with authors in organisation"""
-        bibs=[]
-        org = self.getOrganisation()
-        for n in org.names:  
-             
-             #Get all name formats of author
-             all_formats = n.getAllNameFormats()
-             
-             #Retrieve publications from CrossRef 
-             for f in all_formats:
-                 search1 = fromCrossRef(author=f)
-                                  
-                 #Construct Bib oject from all search hits
-                 for s in search1:
-                     bibs.append(Bib(doi=s[0], title=s[1], authors=s[2],
-                                     journal=s[3], ptype=s[4], date=s[5],
-                                     citations=s[6]))       
-        #Append Bib objects
-        self.addBibs(bibs)                    
-
-
-    def getScopusBibs(self):        
-        """Retrieve all Scopus bibs associated with authors in organisation"""
-        bibs=[]
-        org = self.getOrganisation()
-        for n in org.names: 
-            
-            #Retrieve Scopus ID author and all publications
-            if n.scopusid != None:
-                author = AuthorRetrieval(n.scopusid)   
-                scopus_bibs = fromScopus(author) 
-                
-                #Extract information from all scopus bibs
-                for s in scopus_bibs:                
-                    a = []
-                    a_split = s.author_names.split(';')
-                    for asp in a_split:
-                        a.append(' '.join([asp.split(', ')[1],asp.split(', ')[0]]))
-                    d = datetime.strptime(str(s.coverDate), '%Y-%m-%d')
-                    
-                    if hasattr(s, 'affilname'):
-                        aff_name = str(s.affilname).split(';')
-                        aff_name = list(set(aff_name))
-                    else:
-                        aff_name = None
-                    
-                    if hasattr(s, 'affiliation_country'):
-                        aff_coun = str(s.affiliation_country).split(';')
-                        aff_coun = list(set(aff_coun))
-                    else:
-                        aff_coun = None
-                    
-                    #Construct Bib object
-                    bibs.append(Bib(doi=s.doi, 
-                                    title=s.title, 
-                                    authors=a,
-                                    journal=s.publicationName, 
-                                    ptype=s.aggregationType, 
-                                    date=d,
-                                    citations=s.citedby_count,
-                                    aff_institutes=aff_name,
-                                    aff_countries=aff_coun))                       
-        #Append Bib objects
-        self.addBibs(bibs) 
+    def getCRBibs(self, workers=1, rates=None):
+        """Retrieve CrossRef bibs associated with authors in organisation
+        
+        Parameters
+        ----------
+        workers : int, default 1
+          Number of concurrent author retrievals
+        rates : dict, optional
+          Request rates by source in requests per second (see harvestBibs)
+        """
+        self.harvestBibs(scopus=False, crossref=True, workers=workers, 
+                         rates=rates)                   
+
+
+    def getScopusBibs(self, workers=1, rates=None):        
+        """Retrieve all Scopus bibs associated with authors in organisation
+        
+        Parameters
+        ----------
+        workers : int, default 1
+          Number of concurrent author retrievals
+        rates : dict, optional
+          Request rates by source in requests per second (see harvestBibs)
+        """
+        self.harvestBibs(scopus=True, workers=workers, rates=rates)
        
 
-    def getScholarBibs(self):
-        """Retrieve all Scholar bibs associated with authors in organisation"""
-        bibs=[]
+    def getScholarBibs(self, workers=1, rates=None):
+        """Retrieve all Scholar bibs associated with authors in organisation
+        
+        Parameters
+        ----------
+        workers : int, default 1
+          Number of concurrent author retrievals
+        rates : dict, optional
+          Request rates by source in requests per second (see harvestBibs)
+        """
+        self.harvestBibs(scopus=False, scholar=True, workers=workers, 
+                         rates=rates)
+        
+        
+    def harvestBibs(self, scopus=True, scholar=False, crossref=False, 
+                    workers=1, rates=None):
+        """Retrieve bibs associated with authors in organisation from 
+        selected databases. With more than one worker, retrievals are run 
+        concurrently across all authors and databases, with each database 
+        rate limited separately. Retrieved bibs are added to the BibCollection 
+        in one merge, ordered by author and then database
+        
+        Parameters
+        ----------
+        scopus : bool, default True
+          Flag to denote if bibs should be retrieved from Scopus
+        scholar : bool, default False
+          Flag to denote if bibs should be retrieved from Scholar
+        crossref : bool, default False
+          Flag to denote if bibs should be retrieved from CrossRef
+        workers : int, default 1
+          Number of concurrent author retrievals
+        rates : dict, optional
+          Request rates by source ("scopus", "scholar", "crossref") in 
+          requests per second, if different from default rates (see 
+          biblyser.concurrency.DEFAULT_RATES)
+        """
+        #Compile retrievals for all authors and databases
+        tasks=[]
         org = self.getOrganisation()
+        for n in org.names:
+            if scopus:
+                tasks.append(['scopus', fetchScopusBibs, [n]])
+            if scholar:
+                tasks.append(['scholar', fetchScholarBibs, [n]])
+            if crossref:
+                tasks.append(['crossref', fetchCRBibs, [n]])
         
-        #Iterate through organisation Name objects
-        for n in org.names:  
+        #Retrieve bibs, concurrently if more than one worker
+        if workers == 1:
+            results = [func(*args) for source, func, args in tasks]
+        else:
+            results = runConcurrent(tasks, workers, getRateLimiters(rates))
             
-            #Check for Google Scholar ID 
-             if n.scholarid != None:
-                 
-                 #Fetch bibs using ID search
-                 author = scholarly.search_author_id(n.scholarid)
-                 author = scholarly.fill(author)
-                 search = fromScholar(author)
-                            
-                 #Compile search hits into bib objects
-                 for s in search:
-                     b = Bib(doi=s[0], title=s[1], authors=s[2], journal=s[3], 
-                             ptype=s[4], date=s[5], citations=s[6]) 
-                     
-                     #Retrieve DOI if not given in Scholar hit
-                     if b.doi == None:
-                         b.retrieveDOIFromTitle()
-                     bibs.append(b)
-                     
-        #Append Bib objects
-        self.addBibs(bibs) 
+        #Append Bib objects, skipping failed retrievals
+        bibs=[]
+        [bibs.extend(r) for r in results if not isinstance(r, Exception)]
+        self.addBibs(bibs)
         
          
     def removeBib(self, idx):
@@ -204,50 +206,58 @@ class BibCollection(object):
           Index position of bib to delete
         """
         del self.bibs[idx]  
+        self.date_index = None
 
 
+    def removeWhere(self, *predicates):
+        """Remove bibs from BibCollection that match any of the given 
+        predicates (see biblyser.filters), evaluated in a single pass
+        
+        Parameters
+        ----------
+        *predicates : function
+          Predicates that take a Bib object and return True if it should be
+          removed
+        """
+        match = anyPredicate(*predicates)
+        self.bibs = [b for b in self.bibs if not match(b)]
+        
+        
     def removeFromKeyword(self, bib_att, keyword):
         """Remove bibs from BibCollection based on keyword (case non-specific) 
-        in specified bib attribute journal
+        in specified bib attribute
         
         Parameters
         ----------
-        bib_att : list
-          Bib attribute list to base removal on
-        keyword : str
-          Word to classify removal
+        bib_att : str or list
+          Bib attribute name to base removal on (e.g. "journal"), or list of 
+          attribute values in the same order as the bibs, with one value per 
+          bib
+        keyword : str or list
+          Word or list of words to classify removal
         """
-        idx=[]
-        
-        #Check if keyword is in bib attribute
-        for b in range(len(bib_att)):
-            try:
-                journal = bib_att[b].lower()
-                if keyword in journal:
-                    idx.append(b)
-            except:
-                pass
-        
-        #Delete all bibs based on retained indices
-        if idx != None:
-            idx.sort(reverse=True)
-            [self.removeBib(i) for i in idx]
+        if isinstance(bib_att, str):
+            self.removeWhere(keywordPredicate(bib_att, keyword))
+        else:
+            if len(bib_att) != len(self.bibs):
+                raise ValueError(f'Got {len(bib_att)} attribute values for ' \
+                                 f'{len(self.bibs)} bibs. Expected one ' \
+                                 'value per bib')
+            matcher = compileKeywords(keyword)
+            self.bibs = [b for b, v in zip(self.bibs, bib_att) 
+                         if not matchKeywords(v, matcher)]
             
 
     def removeAbstracts(self):
         """Remove conference abstract bibs from BibCollection based on journal
         title containinng the word "abstract" (case non-specific)"""
-        journals = []
-        [journals.append(b.journal) for b in self.bibs]
-        self.removeFromKeyword(journals, 'abstract')
+        self.removeWhere(keywordPredicate('journal', 'abstract'))
 
 
     def removeDiscussions(self):
         """Remove discussion paper bibs from BibCollection based on journal
         title containinng the word "discussion" (case non-specific)"""
-        journals = []
-        [journals.append(b.journal) for b in self.bibs]
-        self.removeFromKeyword(journals, 'discussion')
+        self.removeWhere(keywordPredicate('journal', 'discussion'))
                 
 
     def checkBibs(self): 
@@ -284,26 +294,89 @@ class BibCollection(object):
                 break
             
             
-    def removeDuplicates(self):
-        """Remove duplicate bib objects from BibCollection based on doi and 
-        title"""
-        #Get dois and find duplicates
-        dois = []
-        [dois.append(str(b.doi).lower()) for b in self.bibs]
-        i1 = findDuplicates(dois)
-        
-        #Get titles and find duplicates
-        titles= [] 
-        [titles.append(str(b.title).lower()) for b in self.bibs]
-        i2 = findDuplicates(titles)
-        
-        #Merge indices and remove bibs
-        idx = list(set(np.concatenate((i1, i2)).tolist()))               
-        if idx != None:
-            idx.sort(reverse=True)
-            [self.removeBib(i) for i in idx]
+    def removeDuplicates(self, priority=None, near_threshold=None, 
+                         cross_doi=False):
+        """Remove duplicate bib objects from BibCollection based on normalised
+        doi and title. Duplicates are merged into a copy of the bib 
+        from the highest priority source, filling in missing attributes and 
+        keeping the maximum citation count and all affiliations (see 
+        biblyser.dedup.mergeBibs)
+        
+        Parameters
+        ----------
+        priority : list, optional
+          Bib sources in order of priority, highest first (default is 
+          ["scopus", "crossref", "scholar"])
+        near_threshold : float, optional
+          Title similarity threshold, between 0 and 1, above which bibs with 
+          near-duplicate titles are also merged (see findNearDuplicates). If
+          not given, only exact duplicates are merged
+        cross_doi : bool, default False
+          Flag to denote if near-duplicates with different DOIs should be 
+          merged or not. Bibs with different DOIs are otherwise never merged,
+          so preprint and published versions of a publication, which usually 
+          have different DOIs, are only merged if this is set
+        """
+        groups = groupDuplicates(self.bibs, near_threshold, cross_doi)
+        self.bibs = [mergeBibs([self.bibs[i] for i in g], priority) 
+                     for g in groups]
             
 
+    def findNearDuplicates(self, threshold=0.8):
+        """Find bibs with near-duplicate titles, such as preprint and final 
+        versions, titles with HTML entities, and truncated Google Scholar 
+        titles
+        
+        Parameters
+        ----------
+        threshold : float, default 0.8
+          Title similarity threshold, between 0 and 1
+        
+        Returns
+        -------
+        list
+          Clusters of near-duplicate bib indices
+        """
+        return findNearDuplicates([b.title for b in self.bibs], threshold)
+            
+            
+    def getDateIndex(self):
+        """Return date index of bibs in BibCollection, building it if the 
+        bibs have changed since it was last built. Changes to the dates of 
+        existing bibs are not detected, in which case the date_index 
+        attribute should be reset to None
+        
+        Returns
+        -------
+        DateIndex
+          Bibs sorted by publication date
+        """
+        if self.date_index is None or not self.date_index.isCurrent(self.bibs):
+            self.date_index = DateIndex(self.bibs)
+        return self.date_index
+    
+    
+    def getSubCollection(self, bibs):
+        """Return new BibCollection of given bibs, with the same organisation
+        
+        Parameters
+        ----------
+        bibs : list
+          List of Bib objects
+        
+        Returns
+        -------
+        BibCollection
+          New BibCollection
+        """
+        if self.organisation is not None:
+            new_bibs = BibCollection(self.organisation)
+            new_bibs.addBibs(bibs)
+        else:
+            new_bibs = BibCollection(bibs)
+        return new_bibs
+    
+    
     def getRecent(self, dt):
         """Return all bibs in BibCollection that were published after a certain
         date (given as a datetime object)
@@ -316,23 +389,86 @@ class BibCollection(object):
         Returns
         -------
         new_bibs : BibCollection      
-          BibCollection with only recent Bibs
+          BibCollection with only recent Bibs, ordered by publication date
+        """
+        return self.getDateRange(start=dt)
+    
+    
+    def getDateRange(self, start=None, end=None):
+        """Return all bibs in BibCollection that were published within a date
+        range. Bibs without a publication date are excluded
+        
+        Parameters
+        ----------
+        start : datetime, optional
+          Start of date range, inclusive. If not given, the range is open
+        end : datetime, optional
+          End of date range, exclusive. If not given, the range is open
+        
+        Returns
+        -------
+        BibCollection
+          BibCollection with bibs in date range, ordered by publication date
         """
-        recent_bibs = []
+        return self.getSubCollection(self.getDateIndex().getRange(start, end))
+    
+    
+    def getByYear(self, year):
+        """Return all bibs in BibCollection that were published in a given
+        year
         
-        #Check date of each bib
-        for bib in self.bibs:
-            check = bib.checkBibDate(dt)
-            if check:
-                recent_bibs.append(bib)
-                
-        #Add bibs to new Bib Collection object
-        try:
-            new_bibs = BibCollection(self.organisation) 
-            new_bibs.addBibs(recent_bibs)
-        except:
-            new_bibs = BibCollection(recent_bibs)
-        return new_bibs
+        Parameters
+        ----------
+        year : int
+          Publication year
+        
+        Returns
+        -------
+        BibCollection
+          BibCollection with bibs from year, ordered by publication date
+        """
+        return self.getDateRange(datetime(year, 1, 1), datetime(year+1, 1, 1))
+    
+    
+    def getWindows(self, window, step=None, start=None, end=None):
+        """Return bibs in BibCollection in rolling date windows
+        
+        Parameters
+        ----------
+        window : timedelta
+          Length of each window
+        step : timedelta, optional
+          Step between window starts. If not given, this is equal to the 
+          window length (i.e. consecutive windows)
+        start : datetime, optional
+          Start of first window. If not given, the earliest publication date 
+          is used
+        end : datetime, optional
+          Latest start of windows. If not given, the latest publication date
+          is used
+        
+        Returns
+        -------
+        list
+          Windows, each given as [window start, window end, BibCollection]
+        """
+        if step is None:
+            step = window
+        index = self.getDateIndex()
+        if len(index.dates) == 0:
+            return []
+        if start is None:
+            start = index.dates[0]
+        if end is None:
+            end = index.dates[-1]
+            
+        windows = []
+        while start <= end:
+            stop = start + window
+            windows.append([start, stop, 
+                            self.getSubCollection(index.getRange(start, stop))])
+            start = start + step
+        return windows
         
         
     def getAllGenders(self, database):
@@ -341,127 +477,561 @@ class BibCollection(object):
         
         Parameters
         -----------
-        database : Organisation or str
-          Database of names and genders, either as an Organisation object or as
-          a .csv filepath to an Organisation dataframe
+        database : Organisation or NameDatabase or str
+          Database of names and genders, either as an Organisation object, as 
+          a NameDatabase, as a .csv filepath to an Organisation dataframe, or 
+          as a filepath to a NameDatabase file
         """
-        if isinstance(database, Organisation):
+        if isinstance(database, Organisation) or \
+            isinstance(database, NameDatabase):
             gdb = database
         elif isinstance(database, str):
-            gdb = orgFromCSV(database)
+            if database.endswith('.csv'):
+                gdb = orgFromCSV(database)
+            else:
+                gdb = NameDatabase(database)
+        else:
+            raise TypeError(f'Got database type {type(database)}. ' \
+                            'Expecting type Organisation, NameDatabase or str')
+        
+        #Look up genders with name database index if given
+        if isinstance(gdb, NameDatabase):
+            check = gdb.checkGender
         else:
-            TypeError(f'Got database type {type(database)}. ' \
-                      'Expecting type Organisation or str')
+            check = lambda n: checkGender(n, gdb)
         
-        #Iterate through Bibs in BibCollection
+        #Treat undefined genders as missing, so that they are defined again 
+        #(e.g. from an answered deferred queue)
+        def lookup(n):
+            g = check(n)
+            if g == 'unknown':
+                return None
+            return g
+        
+        #Check co-author names in database
+        unknown = []
         for b in self.bibs:
+            if b.authors is None:
+                continue
             gens = []
             for author in b.authors:
+                g = lookup(author.fullname)
+                if not g:
+                    unknown.append(author)
+                gens.append(g)
+            b.genders = gens
         
-                #Check name in database
-                g = checkGender(author.fullname, gdb)
-               
-                #Guess gender
-                if not g:            
-                    guesser = gender.Detector()
-                    g = guessGender(guesser, author.fullname)
+        #Guess genders of names not in database in one batch
+        guessed = guessGenders([author.fullname for author in unknown])
+        for author, g in zip(unknown, guessed):
+            
+            #Check if name has since been added to database
+            g_db = lookup(author.fullname)
+            if g_db:
+                author.gender = g_db
+                continue
+            
+            #If name is ambiguous, define gender manually
+            if g in AMBIGUOUS_GENDERS:
+                g = defineGender(author.fullname)
+            author.gender = g
+            
+            #Do not add names still queued for definition to database, so 
+            #that the queued answer is used once given
+            if g == 'unknown':
+                continue
                 
-                    #If name is ambiguous, define gender manually
-                    if g in ['unknown', 'andy', 'mostly_male', 'mostly_female']:
-                        g = defineGender(author.fullname)
-                        
-                    #Add name to database
-                    author.gender = g             
-                    gdb.addName(author)
-                      
-            #Append author genders     
-                gens.append(g)        
-            b.genders = gens 
+            #Add name to database, committing database additions together
+            if isinstance(gdb, NameDatabase):
+                gdb.addName(author, commit=False)
+            else:
+                gdb.addName(author)
+        if isinstance(gdb, NameDatabase):
+            gdb.commit()
+        
+        #Append author genders
+        for b in self.bibs:
+            if b.authors is not None:
+                b.genders = [author.gender if g is None else g 
+                             for author, g in zip(b.authors, b.genders)]
                 
             
-    def asDataFrame(self):
-        """Retrieve BibCollection attributes as dataframe
+    def applyDeferred(self, queue=None):
+        """Apply gender answers from a deferred queue to all co-authors in 
+        BibCollection
+        
+        Parameters
+        ----------
+        queue : DeferredQueue, optional
+          Deferred queue to apply answers from. If not given, the active 
+          deferred queue is used
+        """
+        if queue is None:
+            queue = getDeferredQueue()
+        genders = queue.getAnswers('gender')
+        
+        for b in self.bibs:
+            if b.authors is None or b.genders is None:
+                continue
+            for i, author in enumerate(b.authors):
+                if author.fullname in genders:
+                    author.gender = genders[author.fullname]
+                    b.genders[i] = author.gender
+                    
+            
+    def retrieveAltmetrics(self, workers=4, rates=None):
+        """Retrieve Altmetric scores for all Bibs in BibCollection that do not 
+        already have one. DOIs are deduplicated and retrieved concurrently 
+        with a rate limit, and the outcome for each Bib is recorded in its 
+        altmetric_status attribute. Bibs already found or not found on 
+        Altmetric are not retrieved again, whereas failed retrievals are 
+        retried. This is kept separate from exporting, so that asDataFrame 
+        does not make any network calls
+        
+        Parameters
+        ----------
+        workers : int, default 4
+          Number of concurrent retrievals
+        rates : dict, optional
+          Request rates by source ("altmetric") in requests per second, if 
+          different from default rates (see 
+          biblyser.concurrency.DEFAULT_RATES)
+        """
+        #Group Bibs without Altmetric scores or outcomes by DOI
+        dois = {}
+        for b in self.bibs:
+            if b.altmetrics is None and \
+                b.altmetric_status not in ['found', 'not_found']:
+                if isinstance(b.doi, str) and b.doi.strip() != '':
+                    dois.setdefault(b.doi.strip().lower(), []).append(b)
+                else:
+                    b.altmetric_status = 'no_doi'
+        
+        #Retrieve each DOI once
+        tasks = [['altmetric', retrieveAltmetricScore, [d]] for d in dois]
+        results = runConcurrent(tasks, workers, getRateLimiters(rates))
+        
+        #Assign scores and record outcomes
+        for d, r in zip(dois, results):
+            if isinstance(r, Exception):
+                score, status = None, f'error: {r}'
+            else:
+                score, status = r
+            for b in dois[d]:
+                b.altmetrics = score
+                b.altmetric_status = status
+            
+            
+    def asDataFrame(self, as_lists=False):
+        """Retrieve BibCollection attributes as dataframe. Altmetric scores are
+        exported as held in each Bib (see retrieveAltmetrics), and 
+        organisation author genders as held in each Name, with undefined 
+        genders exported as "unknown" (see getAllGenders)
+        
+        Parameters
+        ----------
+        as_lists : bool, default False
+          Flag to denote if author, gender, affiliation and country columns 
+          are given as lists (True), or as comma-delineated strings (False)
         
         Returns
         -------
         df : pandas.DataFrame
           Dataframe containing all attributes of BibCollection object
         """
-        df = pd.DataFrame()
+        cols = {c: [] for c in ['doi', 'title', 'type', 'journal', 'date', 
+                                'citations', 'altmetric', 'authors', 
+                                'org_led', 'org_authors', 'genders', 
+                                'org_genders', 'first_gender', 'last_gender',
+                                'female_authors', 'male_authors', 
+                                'nonbinary_authors', 'affiliations', 
+                                'countries']}
+        org = self.organisation
+        if as_lists:
+            join = list
+        else:
+            join = listToStr
         for b in self.bibs:
             
             #Get formatted authors
             if b.authors != None:
-                author_str = b.getStrAuthors()
-                
-                #Get organisation affiliated authors            
-                oa = b.getOrgAuthors(self.organisation)
-                org_authors = []
-                [org_authors.append(author.fullname) for author in oa]
-                org_authors = listToStr(org_authors)
-                org_first = str(b.checkOrgFirstAuthor(self.organisation))
-                org_gen = b.getOrgGender(oa)
-                org_gen = listToStr(org_gen)
+                author_str = join(getOriginalNames(b.authors))
             else:
                 author_str = None
+                
+            #Get organisation affiliated authors
+            if b.authors != None and org != None:
+                oa = b.getOrgAuthors(org)
+                org_authors = join([author.fullname for author in oa])
+                org_first = b.checkOrgFirstAuthor(org)
+                org_gen = join([author.gender if author.gender is not None
+                                else 'unknown' for author in oa])
+            else:
                 org_authors = None
                 org_first = None
                 org_gen = None
           
             #Get authors genders
             genders = b.genders
-            if genders != None:
+            if genders != None and len(genders) > 0:
                 first = genders[0]
                 if len(genders) > 1:
                     last = genders[-1]
-                    genders_str = ', '.join(genders)
                 else:
                     last = None
-                    genders_str = genders[0]    
                 f, m, nb = countGenders(genders)
+                genders_str = join(genders)
             else:
-                genders_str=None
-                first=None
-                last=None
-                f=None
-                m=None
-                nb=None
+                genders_str, first, last, f, m, nb = [None]*6
             
             #Get author affiliations and countries
             if b.aff_institutes != None:
-                aff = listToStr(b.aff_institutes)
+                aff = join(b.aff_institutes)
             else:
                 aff=None
             if b.aff_countries != None:
-                co = listToStr(b.aff_countries)
+                co = join(b.aff_countries)
             else:
                 co=None
             
-            #Construct pandas series and append to dataframe
-            series = pd.Series({'doi': b.doi, 
-                              'title': b.title,
-                              'type': b.ptype, 
-                              'journal': b.journal,
-                              'date': b.date, 
-                              'citations': b.citations,
-                              'altmetric': b.retrieveFromAMetric(),
-                              'authors': author_str, 
-                              'org_led': org_first,
-                              'org_authors': org_authors,
-                              'genders': genders_str,
-                              'org_genders': org_gen,
-                              'first_gender': first,
-                              'last_gender': last,
-                              'female_authors': f,
-                              'male_authors': m,
-                              'nonbinary_authors': nb,
-                              'affiliations': aff,
-                              'countries': co})
-            df = df.append(series, ignore_index=True)
+            #Append to columns
+            for c, v in zip(cols, [b.doi, b.title, b.ptype, b.journal, b.date, 
+                                   b.citations, b.altmetrics, author_str, 
+                                   org_first, org_authors, genders_str, 
+                                   org_gen, first, last, f, m, nb, aff, co]):
+                cols[c].append(v)
+        
+        #Construct dataframe with typed columns
+        df = pd.DataFrame(cols)
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        for c in ['citations', 'altmetric']:
+            df[c] = pd.to_numeric(df[c], errors='coerce')
+        for c in ['female_authors', 'male_authors', 'nonbinary_authors']:
+            df[c] = df[c].astype('Int64')
+        df['org_led'] = df['org_led'].astype('boolean')
+        return df
+    
+    
+    def asAuthorDataFrame(self):
+        """Retrieve BibCollection as a long-format dataframe, with one row for
+        each author of each bib. Affiliation institutes and countries of each
+        author are given as lists where known (i.e. for Scopus bibs)
+        
+        Returns
+        -------
+        df : pandas.DataFrame
+          Dataframe with columns bib (bib index position), doi, position 
+          (author position, from 1), n_authors, first_author, last_author, 
+          author, author_id (see bib.getAuthorID), gender, org_author, 
+          org_name, affiliations and countries
+        """
+        cols = {c: [] for c in ['bib', 'doi', 'position', 'n_authors', 
+                                'first_author', 'last_author', 'author', 
+                                'author_id', 'gender', 'org_author', 
+                                'org_name', 'affiliations', 'countries']}
+        org = self.organisation
+        for i, b in enumerate(self.bibs):
+            if not b.authors:
+                continue
+            n = len(b.authors)
+            names = getOriginalNames(b.authors)
+            
+            #Get attributes of each author, where aligned with authors
+            per_author = []
+            for att in [b.genders, b.author_ids, b.author_institutes, 
+                        b.author_countries]:
+                if att != None and len(att) == n:
+                    per_author.append(att)
+                else:
+                    per_author.append([None]*n)
+            if org != None:
+                matches = b.matchOrgAuthors(org)
+            else:
+                matches = [None]*n
+            
+            #Append author rows to columns
+            for p, a, name, m, g, sid, inst, co in zip(range(n), b.authors, 
+                                                       names, matches, 
+                                                       *per_author):
+                for c, v in zip(cols, [i, b.doi, p+1, n, p==0, p==n-1 and n>1,
+                                       name, getAuthorID(a, m, sid), g, 
+                                       m != None, 
+                                       None if m == None else m.fullname,
+                                       inst, co]):
+                    cols[c].append(v)
+                    
+        #Construct dataframe with typed columns
+        df = pd.DataFrame(cols)
+        for c in ['bib', 'position', 'n_authors']:
+            df[c] = df[c].astype('int64')
+        for c in ['first_author', 'last_author', 'org_author']:
+            df[c] = df[c].astype('bool')
         return df
     
+    
+    def buildCube(self):
+        """Build count cube of bibs over year, first author gender, 
+        organisation lead, journal and country, for repeated slice and rollup
+        queries (see biblyser.cube.BibCube)
+        
+        Returns
+        -------
+        BibCube
+          Count cube of bibs
+        """
+        return BibCube(self.asDataFrame())
+    
+    
+    def saveParquet(self, filepath):
+        """Save BibCollection to Parquet file, with author, gender, 
+        affiliation and country columns kept as lists. This requires the 
+        pyarrow package
+        
+        Parameters
+        ----------
+        filepath : str
+          Filepath to Parquet file
+        """
+        self.asDataFrame(as_lists=True).to_parquet(filepath, index=False)
+        
+
+class DateIndex(object):
+    """The DateIndex object holds the bibs of a BibCollection sorted by 
+    normalised publication date, so that date queries are bisect lookups 
+    rather than a scan of all bibs
+    
+    Attributes
+    ----------
+    dates : list
+      Publication dates, as sorted datetime objects
+    bibs : list
+      Bib objects with a publication date, in the same order as the dates
+    """
+    
+    def __init__(self, bibs):
+        """Initialise date index
+        
+        Parameters
+        ----------
+        bibs : list
+          List of Bib objects
+        """
+        self.source = bibs
+        self.size = len(bibs)
+        dated = [(toDatetime(b.date), i) for i, b in enumerate(bibs)]
+        dated = sorted([d for d in dated if d[0] is not None])
+        self.dates = [d[0] for d in dated]
+        self.bibs = [bibs[d[1]] for d in dated]
+        
+        
+    def isCurrent(self, bibs):
+        """Check if index is still current for a list of bibs, i.e. it was 
+        built from the same list and no bibs have been added or removed since
+        
+        Parameters
+        ----------
+        bibs : list
+          List of Bib objects
+        
+        Returns
+        -------
+        bool
+          Flag denoting if index is current
+        """
+        return bibs is self.source and len(bibs) == self.size
+        
+        
+    def getRange(self, start=None, end=None):
+        """Return bibs published within a date range
+        
+        Parameters
+        ----------
+        start : datetime, optional
+          Start of date range, inclusive
+        end : datetime, optional
+          End of date range, exclusive
+        
+        Returns
+        -------
+        list
+          Bib objects in date range, ordered by publication date
+        """
+        i = 0 if start is None else bisect_left(self.dates, toDatetime(start))
+        j = len(self.dates) if end is None \
+            else bisect_left(self.dates, toDatetime(end))
+        return self.bibs[i:j]
+
 #------------------------------------------------------------------------------
  
+def fetchCRBibs(n):
+    """Retrieve CrossRef bibs associated with author
+    
+    Parameters
+    ----------
+    n : Name
+      Author to retrieve bibs for
+    
+    Returns
+    -------
+    bibs : list
+      List of Bib objects
+    """
+    bibs=[]
+    
+    #Retrieve publications from CrossRef using all name formats of author
+    for f in n.getAllNameFormats():
+        search1 = fromCrossRef(author=f)
+                         
+        #Construct Bib oject from all search hits
+        for s in search1:
+            bibs.append(Bib(doi=s[0], title=s[1], authors=s[2],
+                            journal=s[3], ptype=s[4], date=s[5],
+                            citations=s[6], source='crossref'))       
+    return bibs
+
+
+def fetchScopusBibs(n):
+    """Retrieve all Scopus bibs associated with author
+    
+    Parameters
+    ----------
+    n : Name
+      Author to retrieve bibs for, with Scopus ID
+    
+    Returns
+    -------
+    bibs : list
+      List of Bib objects, empty if author has no Scopus ID
+    """
+    bibs=[]
+    
+    #Retrieve Scopus ID author and all publications
+    if n.scopusid != None:
+        from pybliometrics.scopus import AuthorRetrieval
+        limitRate('scopus')
+        author = AuthorRetrieval(n.scopusid)   
+        scopus_bibs = fromScopus(author) 
+        
+        #Extract information from all scopus bibs
+        for s in scopus_bibs:                
+            a = []
+            a_split = s.author_names.split(';')
+            for asp in a_split:
+                a.append(' '.join([asp.split(', ')[1],asp.split(', ')[0]]))
+            d = datetime.strptime(str(s.coverDate), '%Y-%m-%d')
+            
+            if hasattr(s, 'affilname'):
+                aff_name = str(s.affilname).split(';')
+                aff_name = list(set(aff_name))
+            else:
+                aff_name = None
+            
+            if hasattr(s, 'affiliation_country'):
+                aff_coun = str(s.affiliation_country).split(';')
+                aff_coun = list(set(aff_coun))
+            else:
+                aff_coun = None
+            
+            #Get affiliations of each author
+            ids, inst, coun = getScopusAuthorAffiliations(s)
+            
+            #Construct Bib object
+            bibs.append(Bib(doi=s.doi, 
+                            title=s.title, 
+                            authors=a,
+                            journal=s.publicationName, 
+                            ptype=s.aggregationType, 
+                            date=d,
+                            citations=s.citedby_count,
+                            aff_institutes=aff_name,
+                            aff_countries=aff_coun,
+                            source='scopus',
+                            author_ids=ids,
+                            author_institutes=inst,
+                            author_countries=coun))                       
+    return bibs
+
+
+def getScopusAuthorAffiliations(s):
+    """Get Scopus author IDs and the affiliation institutes and countries of
+    each author from a Scopus document
+    
+    Parameters
+    ----------
+    s : namedtuple
+      Scopus document, as returned by AuthorRetrieval.get_documents
+    
+    Returns
+    -------
+    ids : list or None
+      Scopus author IDs, in author order
+    institutes : list or None
+      Affiliation institutes of each author, in author order
+    countries : list or None
+      Affiliation countries of each author, in author order
+    """
+    ids = getattr(s, 'author_ids', None)
+    if ids in [None, '']:
+        return None, None, None
+    ids = ids.split(';')
+    
+    #Look up affiliation names and countries by affiliation ID
+    afids = getattr(s, 'author_afids', None)
+    if afids in [None, ''] or getattr(s, 'afid', None) in [None, '']:
+        return ids, None, None
+    names = dict(zip(s.afid.split(';'), str(s.affilname).split(';')))
+    countries = dict(zip(s.afid.split(';'), 
+                         str(s.affiliation_country).split(';')))
+    
+    #Get affiliations of each author, where multiple are separated by "-"
+    institutes = []
+    author_countries = []
+    for a in afids.split(';'):
+        a = [i for i in a.split('-') if i != '']
+        institutes.append([names[i] for i in a if i in names])
+        author_countries.append(list(dict.fromkeys([countries[i] for i in a 
+                                                    if i in countries])))
+    return ids, institutes, author_countries
+
+
+def fetchScholarBibs(n):
+    """Retrieve all Scholar bibs associated with author
+    
+    Parameters
+    ----------
+    n : Name
+      Author to retrieve bibs for, with Google Scholar ID
+    
+    Returns
+    -------
+    bibs : list
+      List of Bib objects, empty if author has no Google Scholar ID
+    """
+    bibs=[]
+    
+    #Check for Google Scholar ID 
+    if n.scholarid != None:
+         
+        #Fetch bibs using ID search
+        from scholarly import scholarly
+        limitRate('scholar')
+        author = scholarly.search_author_id(n.scholarid)
+        limitRate('scholar')
+        author = scholarly.fill(author)
+        search = fromScholar(author)
+                   
+        #Compile search hits into bib objects
+        for s in search:
+            b = Bib(doi=s[0], title=s[1], authors=s[2], journal=s[3], 
+                    ptype=s[4], date=s[5], citations=s[6], source='scholar') 
+            
+            #Retrieve DOI if not given in Scholar hit
+            if b.doi == None:
+                b.retrieveDOIFromTitle()
+            bibs.append(b)
+    return bibs
+
+
 def findDuplicates(l):
     """Find index of duplicates in list, disregarding nan values
     
@@ -495,112 +1065,112 @@ def bibsFromCSV(csv_file):
     bibs : BibCollection
       BibCollection object
     """
-    bibs=[]
-    
-    #Read each row of CSV database
-    database = pd.read_csv(csv_file)
-    for i, r in database.iterrows():
-        
-        #Construct Bib object for each row
-        bibs.append(Bib(doi=r['doi'], title=r['title'], 
-                    authors=str(r['authors']).split(', '), ptype=r['type'], 
-                    date=r['date'], journal=r['journal'], 
-                    citations=r['citations'], altmetrics=r['altmetric'],
-                    genders=str(r['genders']).split(', '),  
-                    aff_institutes=str(r['affiliations']).split(', '), 
-                    aff_countries=str(r['countries']).split(', ')))
-    
-    #Input list of Bib objects into BibCollection                
-    bibs = BibCollection(bibs)
-    return bibs
+    return bibsFromDataFrame(pd.read_csv(csv_file))
 
 
-def getGenderDistrib(df, first=True):
-    '''Get gender distribution of women, men and non-binary authors as a 
-    percentage. This is derived from the gender count columns from a given
-    dataframe
+def bibsFromParquet(filepath):
+    """Import BibCollection from Parquet file (see BibCollection.saveParquet).
+    This requires the pyarrow package
     
     Parameters
     ----------
-    df : pandas.Dataframe
-      A dataframe representing an exported BibCollection
-    first : bool
-      Flag to denote if first author gender should be included or not
+    filepath : str
+      Filepath to Parquet file
+      
+    Returns
+    -------
+    bibs : BibCollection
+      BibCollection object
+    """
+    return bibsFromDataFrame(pd.read_parquet(filepath))
+
+
+def bibsFromDataFrame(df):
+    """Import BibCollection from dataframe, in the format exported by 
+    BibCollection.asDataFrame. Columns are parsed as a whole, with dates given
+    as datetime objects, missing values given as None, and author, gender, 
+    affiliation and country columns given as lists, whether they are stored as
+    lists or as comma-delineated strings
     
+    Parameters
+    ----------
+    df : pandas.DataFrame
+      Dataframe of bibs
+      
     Returns
     -------
-    f : list
-      List of percentage of female authors for each publication
-    m : list
-      List of percentage of male authors for each publication
-    nb : list
-      List of percentage of non-binary authors for each publication
-    '''
-    f=[]
-    m=[]
-    nb=[]
-    
-    #Iterate through authorship gender list
-    for g in list(df['genders']): 
-        genders = g.split(', ')
-        
-        #Count authorship genders
-        if first==True:
-            female, male, nonbin = countGenders(genders)
-            total=len(genders)
-        else:
-            female, male, nonbin = countGenders(genders[1:])
-            total=len(genders)-1
-            
-        #Append if authorship list is more than 0
-        if total > 0:
-            f.append((female/total)*100)
-            m.append((male/total)*100)
-            nb.append((nonbin/total)*100)                         
-    return f, m, nb
+    bibs : BibCollection
+      BibCollection object
+    """
+    cols = {}
+    for c in ['doi', 'title', 'type', 'journal']:
+        cols[c] = columnToList(df[c])
+    dates = pd.to_datetime(df['date'], errors='coerce')
+    pydates = np.array(dates.dt.to_pydatetime(), dtype=object)
+    pydates[dates.isna().to_numpy()] = None
+    cols['date'] = pydates.tolist()
+    cols['citations'] = columnToList(pd.to_numeric(df['citations'], 
+                                                   errors='coerce')
+                                     .astype('Int64'))
+    cols['altmetric'] = columnToList(pd.to_numeric(df['altmetric'], 
+                                                   errors='coerce'))
+    for c in ['authors', 'genders', 'affiliations', 'countries']:
+        cols[c] = columnToLists(df[c])
+    
+    #Construct Bib objects
+    bibs = [Bib(doi=d, title=t, ptype=p, journal=j, date=dt, citations=ci, 
+                altmetrics=al, authors=au, genders=g, aff_institutes=af,
+                aff_countries=co)
+            for d, t, p, j, dt, ci, al, au, g, af, co 
+            in zip(*[cols[c] for c in ['doi', 'title', 'type', 'journal', 
+                                       'date', 'citations', 'altmetric', 
+                                       'authors', 'genders', 'affiliations', 
+                                       'countries']])]
+    
+    #Input list of Bib objects into BibCollection                
+    bibs = BibCollection(bibs)
+    return bibs
 
 
-def firstFromDF(df, first=True):
-    '''Get either Organisation-led (i.e. first author) or co-author publication 
-    entries from dataframe
+def columnToList(column):
+    """Return dataframe column as list, with missing values given as None
     
     Parameters
     ----------
-    df : pandas.Dataframe
-      A dataframe representing an exported BibCollection
-    first : bool
-      Flag to denote if first author or co-author publications should be 
-      retrieved
+    column : pandas.Series
+      Dataframe column
     
     Returns
     -------
-    df1 : pandas.Dataframe
-      A dataframe of only Organisation-led publication entries
-    '''
-    #Convert column to boolean
-    if isinstance(type(list(df['org_led'])[0]), str):
-        df['org_led'] = df['org_led'].astype('bool')
-        
-    #Get all first author bib entries, or co-author if flag is false
-    return df.loc[df['org_led']==first]       
-      
+    list
+      Column values
+    """
+    column = column.astype(object)
+    return column.where(column.notna(), None).tolist()
 
-def countByYear(df):
-    '''Count publications in dataframe by year
+
+def columnToLists(column):
+    """Return dataframe column of lists as a list of lists, where the column 
+    holds either list-like values or comma-delineated strings. Missing values
+    are given as None
     
     Parameters
     ----------
-    df : pandas.Dataframe
-      A dataframe representing an exported BibCollection
+    column : pandas.Series
+      Dataframe column
     
     Returns
     -------
-    pandas.Dataframe
-      A dataframe of only co-authors publication entries
-    '''
-    if isinstance(list(df['date'])[0], str):
-        df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d %H:%M:%S')
-    return df['date'].groupby([df['date'].dt.year]).agg({'count'})
+    list
+      Column values, as lists
+    """
+    if column.isna().all():
+        return [None] * len(column)
+    if pd.api.types.infer_dtype(column, skipna=True) in ['string', 'empty']:
+        return columnToList(column.astype(object).str.split(', '))
+    return [None if v is None 
+            else v.tolist() if isinstance(v, np.ndarray) 
+            else list(v) for v in columnToList(column)]
 
 
 def calcDivIdx(name, years, scopus=True, scholar=False, crossref=False, 
@@ -638,17 +1208,11 @@ def calcDivIdx(name, years, scopus=True, scholar=False, crossref=False,
     #Construct bib object using organisation
     bibs = BibCollection(n)                   
     
-    #Search for bibs in selected databases
-    if scopus:
-        bibs.getScopusBibs()                       #From Scopus (Pure)
-    if scholar:
-        bibs.getScholarBibs()                      #From Google Scholar
-    if crossref:
-        bibs.getCRBibs()                           #From CrossRef
-    
-    #Filter gathered bibs
-    bibs.removeAbstracts()                          #Remove abstracts
-    bibs.removeDiscussions()                        #Remove discussion papers
+    #Search for bibs in selected databases (Scopus/Pure, Scholar, CrossRef)
+    bibs.harvestBibs(scopus, scholar, crossref)
+    
+    #Filter gathered bibs, removing abstracts and discussion papers
+    bibs.removeWhere(keywordPredicate('journal', ['abstract', 'discussion']))
     bibs.removeDuplicates()                         #Remove duplicate search hits
                  
     #Calculate time range for bib search
@@ -662,14 +1226,7 @@ def calcDivIdx(name, years, scopus=True, scholar=False, crossref=False,
     new = bibs.getRecent(past)  
     
     #Remove bibs with 1 author or >20 authors
-    idx=[]
-    for i in range(len(new.bibs)):
-        if new.bibs[i].authors != None:
-            if len(new.bibs[i].authors) == 1 or len(new.bibs[i].authors) > 20:
-                idx.append(i)
-    if idx != None:
-        idx.sort(reverse=True)
-        [new.removeBib(i) for i in idx]
+    new.removeWhere(authorCountPredicate(min_authors=2, max_authors=20))
     
     #Check bibs
     if check:
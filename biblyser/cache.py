@@ -0,0 +1,484 @@
+"""
+The Cache module handles on-disk caching of responses from bib databases,
+such as CrossRef, Altmetric and Google Scholar, so that repeated lookups
+within and across runs do not need a new network call
+"""
+
+import os
+import time
+import json
+import pickle
+import hashlib
+import sqlite3
+import threading
+
+#Active response cache (see setCache)
+CACHE = None
+
+#Number of cache hits whose access times are held in memory before being
+#written to the SQLite backend together
+ACCESS_BATCH = 100
+
+#Fraction of maximum size that the file backend evicts down to, so that its 
+#cache directory is scanned only once per several evicted responses
+EVICT_FRACTION = 0.9
+
+#Default time-to-live of cached responses by source, in seconds
+DEFAULT_TTL = {'crossref': 30*86400,
+               'altmetric': 7*86400,
+               'scholar': 30*86400}
+
+#------------------------------------------------------------------------------
+
+class ResponseCache(object):
+    """The ResponseCache object holds cached responses on disk, keyed on
+    source and normalised request parameters. Responses expire after a
+    per-source time-to-live, and the least recently used responses are evicted
+    when the cache exceeds a maximum size
+
+    Attributes
+    ----------
+    backend : SQLiteBackend or FileBackend
+      Storage backend
+    ttl : dict
+      Time-to-live of responses by source, in seconds (None for no expiry)
+    max_size : int
+      Maximum size of cache in bytes (None for no limit)
+    hits : dict
+      Number of cache hits by source
+    misses : dict
+      Number of cache misses by source
+    """
+
+    def __init__(self, filepath, backend='sqlite', ttl=None, max_size=None):
+        """Initialise response cache
+
+        Parameters
+        ----------
+        filepath : str
+          Filepath to SQLite database file, or to cache directory if the file
+          backend is used
+        backend : str, default "sqlite"
+          Storage backend, either "sqlite" or "file"
+        ttl : dict, optional
+          Time-to-live of responses by source, in seconds, which updates the
+          default time-to-lives (see DEFAULT_TTL)
+        max_size : int, optional
+          Maximum size of cache in bytes
+        """
+        if backend == 'sqlite':
+            self.backend = SQLiteBackend(filepath)
+        elif backend == 'file':
+            self.backend = FileBackend(filepath)
+        else:
+            raise ValueError(f'Invalid cache backend {backend}. Expected ' \
+                             '"sqlite" or "file"')
+        self.ttl = dict(DEFAULT_TTL)
+        if ttl is not None:
+            self.ttl.update(ttl)
+        self.max_size = max_size
+        self.hits = {}
+        self.misses = {}
+        self.lock = threading.Lock()
+
+
+    def get(self, source, params):
+        """Get cached response
+
+        Parameters
+        ----------
+        source : str
+          Source of response (e.g. "crossref", "altmetric", "scholar")
+        params : dict
+          Request parameters
+
+        Returns
+        -------
+        found : bool
+          Flag denoting if a valid response was found in the cache
+        value : object
+          Cached response, or None if not found
+        """
+        key = getRequestKey(source, params)
+        with self.lock:
+            entry = self.backend.get(key)
+
+            #Discard expired response
+            if entry is not None:
+                created, value = entry
+                ttl = self.ttl.get(source)
+                if ttl is not None and time.time() - created > ttl:
+                    self.backend.delete(key)
+                    entry = None
+
+            #Count hit or miss
+            if entry is not None:
+                self.hits[source] = self.hits.get(source, 0) + 1
+                return True, pickle.loads(value)
+            else:
+                self.misses[source] = self.misses.get(source, 0) + 1
+                return False, None
+
+
+    def set(self, source, params, value):
+        """Add response to cache, evicting the least recently used responses
+        if the cache exceeds its maximum size
+
+        Parameters
+        ----------
+        source : str
+          Source of response (e.g. "crossref", "altmetric", "scholar")
+        params : dict
+          Request parameters
+        value : object
+          Response to cache, which must be picklable
+        """
+        key = getRequestKey(source, params)
+        with self.lock:
+            self.backend.set(key, source, pickle.dumps(value), time.time())
+            if self.max_size is not None and self.backend.size > self.max_size:
+                self.backend.evict(self.max_size)
+
+
+    def getStats(self):
+        """Return hit and miss counts of cache by source
+
+        Returns
+        -------
+        dict
+          Hit count, miss count and hit rate by source
+        """
+        stats = {}
+        for source in set(self.hits) | set(self.misses):
+            h = self.hits.get(source, 0)
+            m = self.misses.get(source, 0)
+            stats[source] = {'hits': h, 'misses': m, 'hit_rate': h/(h+m)}
+        return stats
+
+
+    def flush(self):
+        """Write access times held in memory to the storage backend"""
+        with self.lock:
+            self.backend.flush()
+
+
+    def clear(self):
+        """Remove all responses from cache and reset hit and miss counts"""
+        with self.lock:
+            self.backend.clear()
+            self.hits = {}
+            self.misses = {}
+
+
+class SQLiteBackend(object):
+    """Cache storage backend using a single SQLite database file. Access 
+    times of cache hits are held in memory and written together in batches, 
+    and before least recently used responses are evicted, so that hits do not
+    each need a write
+
+    Attributes
+    ----------
+    filepath : str
+      Filepath to SQLite database file
+    batch : int
+      Number of access times held in memory before being written
+    accessed : dict
+      Access times held in memory, by key
+    size : int
+      Total size of responses in bytes
+    """
+
+    def __init__(self, filepath, batch=ACCESS_BATCH):
+        """Initialise SQLite backend, creating database if it does not exist
+
+        Parameters
+        ----------
+        filepath : str
+          Filepath to SQLite database file
+        batch : int, optional
+          Number of access times held in memory before being written (default
+          is ACCESS_BATCH)
+        """
+        self.filepath = filepath
+        self.batch = batch
+        self.accessed = {}
+        self.conn = sqlite3.connect(filepath, check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS responses (' \
+                          'key TEXT PRIMARY KEY, source TEXT, value BLOB, ' \
+                          'size INTEGER, created REAL, accessed REAL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ' \
+                          'ON responses (accessed)')
+        self.conn.commit()
+        self.size = self.getTotalSize()
+
+
+    def getTotalSize(self):
+        """Return total size of responses in bytes"""
+        return self.conn.execute('SELECT COALESCE(SUM(size), 0) ' \
+                                 'FROM responses').fetchone()[0]
+
+
+    def getSize(self, key):
+        """Return size of response in bytes, or 0 if not found"""
+        row = self.conn.execute('SELECT size FROM responses WHERE key=?', 
+                                (key,)).fetchone()
+        if row is None:
+            return 0
+        return row[0]
+
+
+    def get(self, key):
+        """Return creation time and pickled response, or None if not found"""
+        row = self.conn.execute('SELECT created, value FROM responses ' \
+                                'WHERE key=?', (key,)).fetchone()
+        if row is not None:
+            self.accessed[key] = time.time()
+            if len(self.accessed) >= self.batch:
+                self.flush()
+        return row
+
+
+    def flush(self):
+        """Write access times held in memory"""
+        if len(self.accessed) > 0:
+            self.conn.executemany('UPDATE responses SET accessed=? ' \
+                                  'WHERE key=?', 
+                                  [(t, k) for k, t in self.accessed.items()])
+            self.conn.commit()
+            self.accessed = {}
+
+
+    def set(self, key, source, value, created):
+        """Add pickled response"""
+        self.accessed.pop(key, None)
+        self.size -= self.getSize(key)
+        self.conn.execute('INSERT OR REPLACE INTO responses VALUES ' \
+                          '(?, ?, ?, ?, ?, ?)',
+                          (key, source, value, len(value), created, created))
+        self.conn.commit()
+        self.size += len(value)
+
+
+    def delete(self, key):
+        """Remove response"""
+        self.accessed.pop(key, None)
+        self.size -= self.getSize(key)
+        self.conn.execute('DELETE FROM responses WHERE key=?', (key,))
+        self.conn.commit()
+
+
+    def evict(self, max_size):
+        """Remove least recently used responses until under maximum size. 
+        The total size is first recounted, in case other processes share the
+        database"""
+        self.size = self.getTotalSize()
+        if self.size > max_size:
+            self.flush()
+            while self.size > max_size:
+                rows = self.conn.execute('SELECT key, size FROM responses ' \
+                                         'ORDER BY accessed LIMIT 100') \
+                    .fetchall()
+                if len(rows) == 0:
+                    break
+                for key, size in rows:
+                    if self.size <= max_size:
+                        break
+                    self.conn.execute('DELETE FROM responses WHERE key=?', 
+                                      (key,))
+                    self.size -= size
+            self.conn.commit()
+
+
+    def clear(self):
+        """Remove all responses"""
+        self.accessed = {}
+        self.conn.execute('DELETE FROM responses')
+        self.conn.commit()
+        self.size = 0
+
+
+class FileBackend(object):
+    """Cache storage backend using one pickle file per response in a cache
+    directory, with file modification times used as access times
+
+    Attributes
+    ----------
+    directory : str
+      Cache directory
+    size : int
+      Total size of responses in bytes
+    """
+
+    def __init__(self, directory):
+        """Initialise file backend, creating cache directory if it does not
+        exist
+
+        Parameters
+        ----------
+        directory : str
+          Cache directory
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum([e.stat().st_size for e in self.getEntries()])
+
+
+    def getEntries(self):
+        """Return directory entries of all responses"""
+        return [e for e in os.scandir(self.directory) 
+                if e.name.endswith('.pkl')]
+
+
+    def getSize(self, key):
+        """Return size of response in bytes, or 0 if not found"""
+        try:
+            return os.path.getsize(self.getPath(key))
+        except OSError:
+            return 0
+
+
+    def getPath(self, key):
+        """Return filepath of response"""
+        return os.path.join(self.directory, key + '.pkl')
+
+
+    def get(self, key):
+        """Return creation time and pickled response, or None if not found"""
+        path = self.getPath(key)
+        try:
+            with open(path, 'rb') as f:
+                source, created, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        os.utime(path)
+        return created, value
+
+
+    def flush(self):
+        """Write access times held in memory, which are already written as 
+        file modification times"""
+        pass
+
+
+    def set(self, key, source, value, created):
+        """Add pickled response"""
+        self.size -= self.getSize(key)
+        with open(self.getPath(key), 'wb') as f:
+            pickle.dump((source, created, value), f)
+            self.size += f.tell()
+
+
+    def delete(self, key):
+        """Remove response"""
+        size = self.getSize(key)
+        try:
+            os.remove(self.getPath(key))
+            self.size -= size
+        except FileNotFoundError:
+            pass
+
+
+    def evict(self, max_size):
+        """Remove least recently used responses until under a fraction of 
+        the maximum size (see EVICT_FRACTION), so that the cache directory is 
+        not scanned on every write. The total size is first recounted, in 
+        case other processes share the directory"""
+        entries = self.getEntries()
+        self.size = sum([e.stat().st_size for e in entries])
+        if self.size > max_size:
+            for e in sorted(entries, key=lambda e: e.stat().st_mtime):
+                if self.size <= max_size * EVICT_FRACTION:
+                    break
+                self.size -= e.stat().st_size
+                os.remove(e.path)
+
+
+    def clear(self):
+        """Remove all responses"""
+        for e in self.getEntries():
+            os.remove(e.path)
+        self.size = 0
+
+#------------------------------------------------------------------------------
+
+def getRequestKey(source, params):
+    """Get cache key from source and request parameters. String parameters are
+    normalised (stripped, lower case, single-spaced) and parameters are
+    sorted, so equivalent requests share the same key
+
+    Parameters
+    ----------
+    source : str
+      Source of request
+    params : dict
+      Request parameters
+
+    Returns
+    -------
+    str
+      Cache key
+    """
+    norm = {}
+    for k, v in params.items():
+        if isinstance(v, str):
+            v = ' '.join(v.lower().split())
+        norm[k] = v
+    request = json.dumps([source, norm], sort_keys=True, default=str)
+    return hashlib.sha1(request.encode('utf-8')).hexdigest()
+
+
+def setCache(cache):
+    """Set the active response cache, which is used by all bib database
+    lookups
+
+    Parameters
+    ----------
+    cache : ResponseCache or None
+      Response cache to activate, or None to disable caching
+    """
+    global CACHE
+    CACHE = cache
+
+
+def getCache():
+    """Return the active response cache
+
+    Returns
+    -------
+    ResponseCache or None
+      Active response cache, or None if caching is disabled
+    """
+    return CACHE
+
+
+def cachedCall(source, params, func, cache_none=False):
+    """Return response from the active response cache if present, otherwise
+    call function and cache its response
+
+    Parameters
+    ----------
+    source : str
+      Source of request (e.g. "crossref", "altmetric", "scholar")
+    params : dict
+      Request parameters
+    func : function
+      Function with no arguments that makes the request
+    cache_none : bool, default False
+      Flag to denote if None responses should be cached (e.g. for negative
+      results) or not
+
+    Returns
+    -------
+    object
+      Response
+    """
+    cache = getCache()
+    if cache is None:
+        return func()
+    found, value = cache.get(source, params)
+    if found:
+        return value
+    value = func()
+    if value is not None or cache_none:
+        cache.set(source, params, value)
+    return value
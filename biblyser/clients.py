@@ -0,0 +1,168 @@
+"""
+The Clients module handles the HTTP clients used to query bib databases over
+their web APIs, such as CrossRef and Altmetric. A single pooled session is
+shared by all lookups so that connections are kept alive between requests
+"""
+
+import time
+import threading
+from biblyser.concurrency import limitRate
+
+#Client settings (see configureClients)
+SETTINGS = {'pool_size': 10,
+            'timeout': 30,
+            'retries': 3,
+            'crossref_url': 'https://api.crossref.org',
+            'altmetric_url': 'https://api.altmetric.com/v1',
+            'mailto': None}
+
+#Shared HTTP session, created on first use (see getSession)
+SESSION = None
+SESSION_LOCK = threading.Lock()
+
+#User agent sent with all requests
+USER_AGENT = 'biblyser (https://github.com/GEUS-Glaciology-and-Climate/Biblyser)'
+
+#------------------------------------------------------------------------------
+
+def configureClients(**kwargs):
+    """Configure HTTP clients. Any existing shared session is closed, and a new
+    session is created with the updated settings on next use
+
+    Parameters
+    ----------
+    **kwargs : dict
+      Client settings (valid keywords: pool_size, timeout, retries,
+      crossref_url, altmetric_url, mailto)
+    """
+    global SESSION
+    for k in kwargs:
+        if k not in SETTINGS:
+            raise ValueError(f'Invalid client setting {k}. Expected one of ' \
+                             f'{list(SETTINGS)}')
+    with SESSION_LOCK:
+        SETTINGS.update(kwargs)
+        if SESSION is not None:
+            SESSION.close()
+            SESSION = None
+
+
+def getSession():
+    """Return the shared HTTP session, which keeps a pool of alive connections
+    for each host
+
+    Returns
+    -------
+    requests.Session
+      Shared HTTP session
+    """
+    global SESSION
+    with SESSION_LOCK:
+        if SESSION is None:
+            SESSION = createSession(SETTINGS['pool_size'], SETTINGS['retries'])
+        return SESSION
+
+
+def createSession(pool_size, retries):
+    """Create HTTP session with connection pooling
+
+    Parameters
+    ----------
+    pool_size : int
+      Maximum number of pooled connections per host
+    retries : int
+      Number of retries on failed connections
+
+    Returns
+    -------
+    requests.Session
+      HTTP session
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'User-Agent': USER_AGENT})
+    return session
+
+
+def crossrefWorks(**kwargs):
+    """Search CrossRef works with the CrossRef REST API. Keywords follow the
+    habanero package, where field queries are given with underscores (e.g.
+    query_title for query.title, query_container_title for 
+    query.container-title)
+
+    Parameters
+    ----------
+    **kwargs : dict
+      Search parameters (e.g. query, query_title, select, rows)
+
+    Returns
+    -------
+    dict
+      CrossRef search result
+    """
+    params = {}
+    for k, v in kwargs.items():
+        if v is not None:
+            if k.startswith('query_'):
+                k = 'query.' + k[6:].replace('_', '-')
+            params[k] = v
+    if SETTINGS['mailto'] is not None:
+        params['mailto'] = SETTINGS['mailto']
+    limitRate('crossref')
+    response = getSession().get(SETTINGS['crossref_url'] + '/works',
+                                params=params, timeout=SETTINGS['timeout'])
+    response.raise_for_status()
+    return response.json()
+
+
+def altmetricDOI(doi):
+    """Request Altmetric record of DOI with the Altmetric API
+
+    Parameters
+    ----------
+    doi : str
+      DOI string to search with
+
+    Returns
+    -------
+    requests.Response
+      Altmetric API response
+    """
+    limitRate('altmetric')
+    return getSession().get(SETTINGS['altmetric_url'] + '/doi/' + doi,
+                            timeout=SETTINGS['timeout'])
+
+
+def measureLatency(url, n=20, pooled=True):
+    """Measure mean request latency to a URL, either with the shared pooled
+    session or with a new connection for every request. This is intended for
+    comparing the two against a local stand-in server
+
+    Parameters
+    ----------
+    url : str
+      URL to request
+    n : int, default 20
+      Number of requests
+    pooled : bool, default True
+      Flag to denote if the shared session (True) or a new connection per
+      request (False) should be used
+
+    Returns
+    -------
+    float
+      Mean request latency, in seconds
+    """
+    import requests
+    t0 = time.perf_counter()
+    for i in range(n):
+        if pooled:
+            getSession().get(url, timeout=SETTINGS['timeout']).content
+        else:
+            requests.get(url, timeout=SETTINGS['timeout']).content
+    return (time.perf_counter() - t0) / n
@@ -0,0 +1,176 @@
+"""
+The Concurrency module handles concurrent requests to bib databases, such as
+Scopus, Google Scholar, CrossRef and Altmetric, with a separate rate limit for
+each database
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+#Default request rates by source, in requests per second
+DEFAULT_RATES = {'scopus': 5,
+                 'scholar': 1,
+                 'crossref': 10,
+                 'altmetric': 1}
+
+#Active rate limiters by source, used by all bib database requests (see 
+#setRateLimiters)
+LIMITERS = {}
+
+#------------------------------------------------------------------------------
+
+class RateLimiter(object):
+    """The RateLimiter object is a token bucket that limits the rate of
+    requests to a source, shared across threads. Tokens are refilled at a
+    steady rate up to the bucket capacity, and each request takes one token
+
+    Attributes
+    ----------
+    rate : float
+      Refill rate, in requests per second
+    capacity : float
+      Maximum number of tokens, i.e. the largest burst of requests
+    tokens : float
+      Number of available tokens
+    """
+
+    def __init__(self, rate, capacity=None):
+        """Initialise rate limiter with a full bucket
+
+        Parameters
+        ----------
+        rate : float
+          Refill rate, in requests per second
+        capacity : float, optional
+          Maximum number of tokens. If not given, this is equal to the rate
+          (or 1 if the rate is less than 1)
+        """
+        if rate <= 0:
+            raise ValueError(f'Rate must be greater than 0, got {rate}')
+        self.rate = rate
+        if capacity is None:
+            capacity = max(1, rate)
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+
+    def acquire(self):
+        """Take one token from bucket, waiting until one is available"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity,
+                                  self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+#------------------------------------------------------------------------------
+
+def getRateLimiters(rates=None):
+    """Get rate limiters for all sources
+
+    Parameters
+    ----------
+    rates : dict, optional
+      Request rates by source, in requests per second, which update the
+      default rates (see DEFAULT_RATES). A rate of None disables rate limiting
+      for that source
+
+    Returns
+    -------
+    dict
+      RateLimiter objects by source
+    """
+    all_rates = dict(DEFAULT_RATES)
+    if rates is not None:
+        all_rates.update(rates)
+    return {s: RateLimiter(r) for s, r in all_rates.items() if r is not None}
+
+
+def setRateLimiters(limiters):
+    """Set the active rate limiters, which every request to a bib database
+    waits on before it is made (see limitRate)
+
+    Parameters
+    ----------
+    limiters : dict or None
+      RateLimiter objects by source, or None to disable rate limiting
+    """
+    global LIMITERS
+    if limiters is None:
+        limiters = {}
+    LIMITERS = limiters
+
+
+def getActiveRateLimiters():
+    """Return the active rate limiters
+
+    Returns
+    -------
+    dict
+      Active RateLimiter objects by source
+    """
+    return LIMITERS
+
+
+def limitRate(source):
+    """Wait on the active rate limiter of a source before making a request.
+    Sources without an active rate limiter are not limited
+
+    Parameters
+    ----------
+    source : str
+      Source of request (e.g. "scopus", "scholar", "crossref", "altmetric")
+    """
+    limiter = LIMITERS.get(source)
+    if limiter is not None:
+        limiter.acquire()
+
+
+def runConcurrent(tasks, workers, limiters=None):
+    """Run tasks concurrently in a thread pool. Rate limiters are made active
+    while the tasks run, so that every request made within a task waits on 
+    the rate limiter of its source (see limitRate). A task that fails does 
+    not stop the other tasks, and its error is returned in place of its 
+    result
+
+    Parameters
+    ----------
+    tasks : list
+      Tasks to run, each given as [source, function, arguments]
+    workers : int
+      Maximum number of concurrent tasks
+    limiters : dict, optional
+      RateLimiter objects by source. If not given, the active rate limiters 
+      are kept
+
+    Returns
+    -------
+    list
+      Results of all tasks, in the same order as the tasks, with the raised
+      exception in place of the result of each failed task
+    """
+    previous = getActiveRateLimiters()
+    if limiters is not None:
+        setRateLimiters(limiters)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(f, *a) for s, f, a in tasks]
+            results = []
+            for (source, func, args), future in zip(tasks, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f'{source} task {func.__name__} failed for ' \
+                          f'{args}: {e}')
+                    results.append(e)
+    finally:
+        setRateLimiters(previous)
+    return results
@@ -0,0 +1,214 @@
+"""
+The Cube module handles a precomputed count cube of publications over year,
+first author gender, organisation lead and journal, and additionally country
+of affiliation. The cube is built once from an exported BibCollection, and
+slice and rollup queries are answered from the cube without rescanning the
+publications
+"""
+
+import numpy as np
+import pandas as pd
+from biblyser.stats import toBoolean, explodeLists
+
+#Dimensions of cube, in order
+DIMENSIONS = ['year', 'gender', 'org_led', 'journal']
+
+#Additional dimension of publications with several values, held separately
+COUNTRY = 'country'
+
+#------------------------------------------------------------------------------
+
+class BibCube(object):
+    """The BibCube object holds publication counts over year, first author
+    gender, organisation lead and journal as a sparse table of dimension
+    codes, with one row per combination that occurs. As publications may be
+    affiliated with several countries, counts by country are held in a second
+    table, where a publication is counted once for each of its countries
+
+    Attributes
+    ----------
+    labels : dict
+      Dimension labels by dimension, where the position of each label is its
+      code in the tables
+    table : pandas.DataFrame
+      Publication counts by dimension codes, in column "count"
+    country_table : pandas.DataFrame
+      Publication counts by dimension and country codes, in column "count"
+    """
+
+    def __init__(self, df):
+        """Initialise cube from an exported BibCollection
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+          A dataframe representing an exported BibCollection (see
+          BibCollection.asDataFrame)
+        """
+        years = pd.to_datetime(df['date'], errors='coerce').dt.year
+        columns = {'year': years.astype('Int64'),
+                   'gender': df['first_gender'],
+                   'org_led': toBoolean(df['org_led']),
+                   'journal': df['journal']}
+
+        #Factorise dimensions, with missing values given code -1
+        self.labels = {}
+        codes = {}
+        for d in DIMENSIONS:
+            codes[d], labels = pd.factorize(columns[d], sort=True)
+            self.labels[d] = list(labels)
+        codes = pd.DataFrame(codes)
+        self.table = aggregateCodes(codes, DIMENSIONS)
+
+        #Factorise countries of each publication
+        rows, countries, positions = explodeLists(df['countries'])
+        country_codes, labels = pd.factorize(countries, sort=True)
+        self.labels[COUNTRY] = list(labels)
+        codes = codes.iloc[rows].reset_index(drop=True)
+        codes[COUNTRY] = country_codes
+        codes = codes.assign(row=rows).drop_duplicates(['row', COUNTRY])
+        self.country_table = aggregateCodes(codes, DIMENSIONS + [COUNTRY])
+
+
+    def getLabels(self, dimension):
+        """Return labels of a dimension
+
+        Parameters
+        ----------
+        dimension : str
+          Dimension name (year, gender, org_led, journal or country)
+
+        Returns
+        -------
+        list
+          Dimension labels
+        """
+        checkDimensions([dimension])
+        return list(self.labels[dimension])
+
+
+    def getSlice(self, dimensions, filters):
+        """Return rows of the cube table matching filters
+
+        Parameters
+        ----------
+        dimensions : list
+          Dimensions that the slice is rolled up by
+        filters : dict
+          Dimension values to filter on, given as a single value or list of
+          values by dimension. None matches missing values
+
+        Returns
+        -------
+        pandas.DataFrame
+          Matching rows of the publication table, or of the country table if
+          country is a filter or rollup dimension
+        """
+        checkDimensions(list(dimensions) + list(filters))
+        if COUNTRY in dimensions or COUNTRY in filters:
+            table = self.country_table
+        else:
+            table = self.table
+        mask = np.ones(len(table.index), dtype=bool)
+        for d, values in filters.items():
+            if not isinstance(values, (list, tuple, set)):
+                values = [values]
+            lookup = {l: i for i, l in enumerate(self.labels[d])}
+            codes = [-1 if v is None else lookup.get(v) for v in values]
+            mask &= np.isin(table[d].to_numpy(),
+                            [c for c in codes if c is not None])
+        return table[mask]
+
+
+    def count(self, **filters):
+        """Count publications matching filters e.g.
+        count(gender='female', org_led=True, year=2020)
+
+        Parameters
+        ----------
+        **filters : dict
+          Dimension values to filter on, given as a single value or list of
+          values by dimension (valid keywords: year, gender, org_led, journal,
+          country). None matches missing values
+
+        Returns
+        -------
+        int
+          Number of publications. If filtered on several countries, a
+          publication is counted once for each matching country
+        """
+        return int(self.getSlice([], filters)['count'].sum())
+
+
+    def rollup(self, by, **filters):
+        """Count publications matching filters, grouped by one or more
+        dimensions e.g. rollup('year', gender='female', journal='Nature')
+
+        Parameters
+        ----------
+        by : str or list
+          Dimension or list of dimensions to group by
+        **filters : dict
+          Dimension values to filter on, given as a single value or list of
+          values by dimension (valid keywords: year, gender, org_led, journal,
+          country). None matches missing values
+
+        Returns
+        -------
+        pandas.Series
+          Publication counts, indexed by dimension labels. Missing values are
+          labelled None, or NaN when grouped by several dimensions
+        """
+        if isinstance(by, str):
+            by = [by]
+        rows = self.getSlice(by, filters)
+        counts = rows.groupby(by)['count'].sum()
+
+        #Decode dimension labels
+        decoded = []
+        for d in by:
+            labels = np.array(self.labels[d] + [None], dtype=object)
+            decoded.append(labels[counts.index.get_level_values(d)])
+        if len(by) == 1:
+            index = pd.Index(decoded[0], name=by[0])
+        else:
+            index = pd.MultiIndex.from_arrays(decoded, names=by)
+        return pd.Series(counts.to_numpy(), index=index, name='count')
+
+#------------------------------------------------------------------------------
+
+def aggregateCodes(codes, dimensions):
+    """Aggregate dimension codes into a sparse count table
+
+    Parameters
+    ----------
+    codes : pandas.DataFrame
+      Dimension codes, with one row per publication
+    dimensions : list
+      Dimensions to aggregate by
+
+    Returns
+    -------
+    pandas.DataFrame
+      Count of each occurring combination of dimension codes, in column
+      "count"
+    """
+    table = codes.groupby(dimensions).size().rename('count').reset_index()
+    for d in dimensions:
+        table[d] = table[d].astype(np.int32)
+    table['count'] = table['count'].astype(np.int64)
+    return table
+
+
+def checkDimensions(dimensions):
+    """Check that all dimensions are cube dimensions
+
+    Parameters
+    ----------
+    dimensions : list
+      Dimension names
+    """
+    for d in dimensions:
+        if d not in DIMENSIONS + [COUNTRY]:
+            raise ValueError(f'Invalid dimension {d}. Expected one of ' \
+                             f'{DIMENSIONS + [COUNTRY]}')
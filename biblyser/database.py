@@ -0,0 +1,288 @@
+"""
+The Database module handles a persistent database of names and genders, held
+in an embedded SQLite file. Names are looked up by any of their name formats
+through an index, and new names are written incrementally
+"""
+
+import time
+import sqlite3
+import threading
+from biblyser.name import Name
+from biblyser.organisation import Organisation, orgFromCSV
+
+#Name attributes held in database, in column order
+NAME_COLUMNS = ['fullname', 'title', 'gender', 'orcid', 'scholarid',
+                'scopusid', 'hindex_scopus', 'hindex_scholar']
+
+#------------------------------------------------------------------------------
+
+class NameDatabase(object):
+    """The NameDatabase object holds names and genders in an SQLite file, as a
+    persistent alternative to an Organisation used as a gender database. Each
+    name is stored once by full name, and all of its name formats are indexed
+    for lookups. Where several names share a name format, the most recently
+    added name takes precedence, as in an Organisation
+
+    Attributes
+    ----------
+    filepath : str
+      Filepath to SQLite database file
+    """
+
+    def __init__(self, filepath):
+        """Initialise name database, creating database file if it does not
+        exist. The database uses write-ahead logging, so that other processes
+        can read from it while it is written to
+
+        Parameters
+        ----------
+        filepath : str
+          Filepath to SQLite database file
+        """
+        self.filepath = filepath
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(filepath, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS names (' \
+                          'id INTEGER PRIMARY KEY, fullname TEXT UNIQUE, ' \
+                          'title TEXT, gender TEXT, orcid TEXT, ' \
+                          'scholarid TEXT, scopusid TEXT, ' \
+                          'hindex_scopus REAL, hindex_scholar REAL, ' \
+                          'updated REAL)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS formats (' \
+                          'format TEXT, name_id INTEGER, ' \
+                          'PRIMARY KEY (format, name_id))')
+        self.conn.commit()
+
+
+    def __len__(self):
+        """Return number of names in database"""
+        return self.conn.execute('SELECT COUNT(*) FROM names').fetchone()[0]
+
+
+    def checkOrgName(self, n):
+        """Check if name is in database
+
+        Parameters
+        ----------
+        n : str
+          Name to check, in any name format
+
+        Returns
+        -------
+        Name or None
+          Name object that input name matches with, or None if there is no
+          match
+        """
+        cols = ', '.join(['n.' + c for c in NAME_COLUMNS])
+        with self.lock:
+            row = self.conn.execute(f'SELECT {cols} FROM formats f ' \
+                                    'JOIN names n ON n.id=f.name_id ' \
+                                    'WHERE f.format=? ' \
+                                    'ORDER BY n.updated DESC, n.id DESC ' \
+                                    'LIMIT 1',
+                                    (n,)).fetchone()
+        if row is not None:
+            return rowToName(row)
+        else:
+            return None
+
+
+    def checkGender(self, n):
+        """Check if name is in database and if so, return gender
+
+        Parameters
+        ----------
+        n : str
+          Name to check, in any name format
+
+        Returns
+        -------
+        str or None
+          Gender of name, or None if name does not appear in database
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT n.gender FROM formats f ' \
+                                    'JOIN names n ON n.id=f.name_id ' \
+                                    'WHERE f.format=? ' \
+                                    'ORDER BY n.updated DESC, n.id DESC ' \
+                                    'LIMIT 1',
+                                    (n,)).fetchone()
+        if row is not None:
+            return row[0]
+        else:
+            return None
+
+
+    def addName(self, n, t=None, g=None, commit=True, **kwargs):
+        """Add name to database, or update it if the full name is already
+        present. Missing attributes do not overwrite stored values
+
+        Parameters
+        ----------
+        n : Name or str or list
+          Name to add, given as either Name, fullname string, or
+          fullname list [firstname, middlename, lastname]
+        t : str, optional
+          Title
+        g : str, optional
+          Gender
+        commit : bool, default True
+          Flag to denote if the addition should be committed to file now
+          (True), or later with commit (False)
+        **kwargs : dict
+          Keyword arguments (valid keywords: orcid, scholarid, scopusid,
+          hindex_scopus, hindex_scholar)
+        """
+        if isinstance(n, list) or isinstance(n, str):
+            n = Name(n, t, g, **kwargs)
+        elif not isinstance(n, Name):
+            raise TypeError(f'Invalid name type {type(n)} given. ' \
+                            'Expected str, list or Name object.')
+        self.addNames([n], commit)
+
+
+    def addNames(self, names, commit=True):
+        """Add multiple names to database in one transaction, updating names
+        that are already present. Missing attributes do not overwrite stored
+        values, and updated names take precedence in lookups as if newly added
+
+        Parameters
+        ----------
+        names : list
+          List of Name objects
+        commit : bool, default True
+          Flag to denote if the additions should be committed to file now
+          (True), or later with commit (False)
+        """
+        cols = ', '.join(NAME_COLUMNS)
+        marks = ', '.join(['?'] * (len(NAME_COLUMNS)+1))
+        updates = ', '.join([f'{c}=COALESCE(excluded.{c}, names.{c})' 
+                             for c in NAME_COLUMNS[1:]])
+        with self.lock:
+            for n in names:
+                self.conn.execute(f'INSERT INTO names ({cols}, updated) ' \
+                                  f'VALUES ({marks}) ' \
+                                  'ON CONFLICT(fullname) DO UPDATE SET ' \
+                                  f'{updates}, updated=excluded.updated',
+                                  nameToRow(n) + [time.time()])
+                name_id = self.conn.execute('SELECT id FROM names ' \
+                                            'WHERE fullname=?', 
+                                            (n.fullname,)).fetchone()[0]
+
+                #Re-index name formats
+                self.conn.execute('DELETE FROM formats WHERE name_id=?',
+                                  (name_id,))
+                self.conn.executemany('INSERT OR IGNORE INTO formats ' \
+                                      'VALUES (?, ?)',
+                                      [(f, name_id)
+                                       for f in n.getAllNameFormats()])
+            if commit:
+                self.conn.commit()
+
+
+    def commit(self):
+        """Commit all added names to file"""
+        with self.lock:
+            self.conn.commit()
+
+
+    def getAllNames(self):
+        """Return all names in database
+
+        Returns
+        -------
+        list
+          List of Name objects, in the order they were added
+        """
+        with self.lock:
+            rows = self.conn.execute(f'SELECT {", ".join(NAME_COLUMNS)} ' \
+                                     'FROM names ORDER BY id').fetchall()
+        return [rowToName(r) for r in rows]
+
+
+    def asOrganisation(self):
+        """Return database as Organisation
+
+        Returns
+        -------
+        Organisation
+          Organisation object holding all names in database
+        """
+        return Organisation(self.getAllNames(), verbose=False)
+
+
+    def asDataFrame(self):
+        """Export database as dataframe, in the same format as an exported
+        Organisation
+
+        Returns
+        -------
+        pandas.DataFrame
+          Database names as dataframe
+        """
+        return self.asOrganisation().asDataFrame()
+
+
+    def close(self):
+        """Commit and close database"""
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+#------------------------------------------------------------------------------
+
+def nameToRow(n):
+    """Get database row values from Name object
+
+    Parameters
+    ----------
+    n : Name
+      Name object
+
+    Returns
+    -------
+    list
+      Name attributes, in database column order
+    """
+    return [n.fullname, n.title, n.gender, n.orcid, n.scholarid, n.scopusid,
+            n.hindex_scopus, n.hindex_scholar]
+
+
+def rowToName(row):
+    """Get Name object from database row values
+
+    Parameters
+    ----------
+    row : tuple
+      Name attributes, in database column order
+
+    Returns
+    -------
+    Name
+      Name object
+    """
+    fullname, title, gender, orcid, scholarid, scopusid, hsc, hsi = row
+    return Name(fullname, title, gender, orcid=orcid, scholarid=scholarid,
+                scopusid=scopusid, hindex_scopus=hsc, hindex_scholar=hsi)
+
+
+def databaseFromCSV(csv_file, filepath):
+    """Import names from an Organisation csv file (e.g. an existing gender
+    database) into a name database
+
+    Parameters
+    ----------
+    csv_file : str
+      Filepath to csv organisation
+    filepath : str
+      Filepath to SQLite database file
+
+    Returns
+    -------
+    NameDatabase
+      Name database with imported names
+    """
+    db = NameDatabase(filepath)
+    db.addNames(orgFromCSV(csv_file).names)
+    return db
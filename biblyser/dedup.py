@@ -0,0 +1,426 @@
+"""
+The Dedup module handles finding and merging duplicate bibs, such as the same
+publication retrieved from several bib databases or for several co-authors
+within an organisation
+"""
+
+import re
+import copy
+import html
+import numpy as np
+
+#Default priority of bib sources when merging duplicates, highest first
+DEFAULT_PRIORITY = ['scopus', 'crossref', 'scholar']
+
+#DOI prefixes to remove when normalising
+DOI_PREFIXES = ['https://doi.org/', 'http://doi.org/', 'https://dx.doi.org/',
+                'http://dx.doi.org/', 'doi:']
+
+#Bib attributes that are filled from lower priority duplicates if missing
+FILL_ATTRIBUTES = ['doi', 'title', 'date', 'ptype', 'journal']
+
+#Bib attributes given per author, which are merged together with the authors
+AUTHOR_ATTRIBUTES = ['authors', 'genders', 'author_ids', 'author_institutes',
+                     'author_countries']
+
+#Bib attributes that are merged across duplicates, and how
+MAX_ATTRIBUTES = ['citations', 'altmetrics']
+UNION_ATTRIBUTES = ['aff_institutes', 'aff_countries']
+
+#Truncation markers at the end of titles (e.g. from Google Scholar)
+TRUNCATION_MARKERS = ['…', '...']
+
+#------------------------------------------------------------------------------
+
+def normaliseDOI(doi):
+    """Normalise DOI for comparison e.g. "https://doi.org/10.5194/TC-1" >>
+    "10.5194/tc-1"
+
+    Parameters
+    ----------
+    doi : str
+      DOI string
+
+    Returns
+    -------
+    str or None
+      Normalised DOI, or None if DOI is missing
+    """
+    if not isinstance(doi, str):
+        return None
+    doi = doi.strip().lower()
+    for p in DOI_PREFIXES:
+        if doi.startswith(p):
+            doi = doi[len(p):]
+    if doi in ['', 'none', 'nan']:
+        return None
+    return doi
+
+
+def normaliseTitle(title):
+    """Normalise title for comparison, decoding HTML entities, removing
+    truncation ellipses and punctuation, and collapsing whitespace e.g.
+    "Ice &amp; Snow: A Review…" >> "ice snow a review"
+
+    Parameters
+    ----------
+    title : str
+      Title string
+
+    Returns
+    -------
+    str or None
+      Normalised title, or None if title is missing
+    """
+    if not isinstance(title, str):
+        return None
+    title = html.unescape(title).lower()
+    title = ' '.join(re.sub(r'[\W_]+', ' ', title).split())
+    if title in ['', 'none', 'nan']:
+        return None
+    return title
+
+
+def groupDuplicates(bibs, near_threshold=None, cross_doi=False):
+    """Group duplicate bibs, where bibs are duplicates if they share a 
+    normalised DOI or a normalised title. Optionally, groups with 
+    near-duplicate titles are also joined (see findNearDuplicates). Groups are
+    transitive, so bibs linked through another bib are grouped together, but
+    bibs with different DOIs are not grouped (e.g. two editorials with the 
+    same title). As preprints and their published versions usually have 
+    different DOIs, near-duplicates with different DOIs are only grouped if 
+    cross_doi is set
+
+    Parameters
+    ----------
+    bibs : list
+      List of Bib objects
+    near_threshold : float, optional
+      Title similarity threshold for near-duplicates, between 0 and 1. If not
+      given, only exact duplicates are grouped
+    cross_doi : bool, default False
+      Flag to denote if near-duplicates with different DOIs should be grouped
+      (e.g. preprint and published versions) or not
+
+    Returns
+    -------
+    groups : list
+      Groups of bib indices, ordered by first appearance. Unique bibs are
+      given as a group of one
+    """
+    dois = [normaliseDOI(getattr(b, 'doi', None)) for b in bibs]
+    
+    #Union-find over bib indices, with the DOI of each group held by its root
+    parent = list(range(len(bibs)))
+    group_doi = list(dois)
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    def join(i, j, cross=False):
+        ri, rj = find(i), find(j)
+        if ri == rj:
+            return
+        di, dj = group_doi[ri], group_doi[rj]
+        if not cross and di is not None and dj is not None and di != dj:
+            return
+        root, child = min(ri, rj), max(ri, rj)
+        parent[child] = root
+        group_doi[root] = di if di is not None else dj
+
+    #Join bibs sharing a DOI or title with the first bib they share it with
+    first = {}
+    for i, b in enumerate(bibs):
+        t = normaliseTitle(getattr(b, 'title', None))
+        for key in [('doi', dois[i]), ('title', t)]:
+            if key[1] is not None:
+                join(first.setdefault(key, i), i)
+
+    #Join groups with near-duplicate titles
+    if near_threshold is not None:
+        roots = sorted(set([find(i) for i in range(len(bibs))]))
+        clusters = findNearDuplicates([getattr(bibs[r], 'title', None)
+                                       for r in roots], near_threshold)
+        for c in clusters:
+            for g in c[1:]:
+                join(roots[c[0]], roots[g], cross_doi)
+
+    #Collect groups
+    groups = {}
+    for i in range(len(bibs)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def mergeBibs(bibs, priority=None):
+    """Merge duplicate bibs into a new bib. Attributes are taken from the bib 
+    from the highest priority source, with missing attributes filled from the
+    other duplicates, the maximum citation count and Altmetric score, and the
+    union of affiliation institutes and countries. Authors and their genders,
+    IDs and affiliations are taken together from a single bib, so that they 
+    stay in author order. The given bibs are not changed
+
+    Parameters
+    ----------
+    bibs : list
+      Duplicate Bib objects, in order of appearance
+    priority : list, optional
+      Bib sources in order of priority, highest first (default is
+      DEFAULT_PRIORITY). Bibs from unlisted sources have the lowest priority,
+      and ties are kept in order of appearance
+
+    Returns
+    -------
+    Bib
+      Merged Bib object
+    """
+    if len(bibs) == 1:
+        return bibs[0]
+    if priority is None:
+        priority = DEFAULT_PRIORITY
+
+    #Order duplicates by source priority
+    def rank(b):
+        source = getattr(b, 'source', None)
+        if source in priority:
+            return priority.index(source)
+        else:
+            return len(priority)
+    ordered = sorted(bibs, key=rank)
+    merged = copy.copy(ordered[0])
+
+    #Fill missing attributes
+    for att in FILL_ATTRIBUTES:
+        if getattr(merged, att, None) is None:
+            for b in ordered[1:]:
+                value = getattr(b, att, None)
+                if value is not None:
+                    setattr(merged, att, value)
+                    break
+
+    #Take authors from highest priority bib with authors, and fill missing 
+    #author attributes from bibs with the same number of authors
+    authored = [b for b in ordered if getattr(b, 'authors', None) is not None]
+    if len(authored) > 0:
+        for att in AUTHOR_ATTRIBUTES:
+            setattr(merged, att, getattr(authored[0], att, None))
+        for att in AUTHOR_ATTRIBUTES[1:]:
+            if getattr(merged, att, None) is None:
+                for b in authored[1:]:
+                    value = getattr(b, att, None)
+                    if value is not None and \
+                        len(b.authors) == len(merged.authors):
+                        setattr(merged, att, value)
+                        break
+
+    #Take maximum counts
+    for att in MAX_ATTRIBUTES:
+        values = [getattr(b, att, None) for b in ordered]
+        values = [v for v in values if v is not None and v == v]
+        if len(values) > 0:
+            setattr(merged, att, max(values))
+
+    #Take union of lists, in priority order
+    for att in UNION_ATTRIBUTES:
+        union = {}
+        for b in ordered:
+            value = getattr(b, att, None)
+            if value is not None:
+                union.update(dict.fromkeys(value))
+        if len(union) > 0:
+            setattr(merged, att, list(union))
+    return merged
+
+
+def isTruncated(title):
+    """Check if title is truncated, i.e. ends with an ellipsis
+
+    Parameters
+    ----------
+    title : str
+      Title string
+
+    Returns
+    -------
+    bool
+      Flag denoting if title is truncated
+    """
+    if not isinstance(title, str):
+        return False
+    title = title.rstrip()
+    return any([title.endswith(m) for m in TRUNCATION_MARKERS])
+
+
+def getShingles(title, vocab, k=3):
+    """Get character shingles of a normalised title, as integer shingle IDs
+
+    Parameters
+    ----------
+    title : str
+      Normalised title string
+    vocab : dict
+      Shingle IDs by shingle, which is updated with new shingles
+    k : int, default 3
+      Shingle length, in characters
+
+    Returns
+    -------
+    set
+      Shingle IDs
+    """
+    if len(title) <= k:
+        return {vocab.setdefault(title, len(vocab))}
+    return {vocab.setdefault(title[i:i+k], len(vocab))
+            for i in range(len(title)-k+1)}
+
+
+def getMinHashes(shingle_sets, a, b, chunk=1000):
+    """Get MinHash signatures of shingle sets, computed in chunks of sets. 
+    Each permutation is a multiply-shift hash of the shingle IDs, i.e. the 
+    upper 32 bits of (a*x + b) modulo 2^64
+
+    Parameters
+    ----------
+    shingle_sets : list
+      List of shingle ID sets, none of which are empty
+    a : numpy.ndarray
+      Permutation multipliers, as odd unsigned 64-bit integers
+    b : numpy.ndarray
+      Permutation increments, as unsigned 64-bit integers
+    chunk : int, default 1000
+      Number of sets per chunk
+
+    Returns
+    -------
+    numpy.ndarray
+      MinHash signatures, with one row per set
+    """
+    sigs = np.empty((len(a), len(shingle_sets)), dtype=np.uint64)
+    for c in range(0, len(shingle_sets), chunk):
+        sets = shingle_sets[c:c+chunk]
+        x = np.fromiter([h for s in sets for h in s], dtype=np.uint64)
+        starts = np.cumsum([0] + [len(s) for s in sets[:-1]])
+        with np.errstate(over='ignore'):
+            hashes = (np.outer(a, x) + b[:, None]) >> np.uint64(32)
+        sigs[:, c:c+chunk] = np.minimum.reduceat(hashes, starts, axis=1)
+    return sigs.T
+
+
+def getBands(threshold, num_perm, recall=0.99):
+    """Get number of LSH bands and rows per band for a similarity threshold. 
+    Two signatures with similarity s share at least one band with probability
+    1-(1-s^rows)^bands, so the most rows per band are chosen that still give
+    the required probability at the threshold, keeping false candidates few
+
+    Parameters
+    ----------
+    threshold : float
+      Similarity threshold, between 0 and 1
+    num_perm : int
+      Number of MinHash permutations
+    recall : float, default 0.99
+      Required probability of titles at the threshold becoming candidates
+
+    Returns
+    -------
+    bands : int
+      Number of bands
+    rows : int
+      Number of rows per band
+    """
+    bands, rows = num_perm, 1
+    for r in range(1, num_perm+1):
+        if num_perm % r == 0:
+            b = num_perm // r
+            if 1 - (1 - threshold**r)**b >= recall:
+                bands, rows = b, r
+    return bands, rows
+
+
+def findNearDuplicates(titles, threshold=0.8, num_perm=64, k=3,
+                       min_prefix=20, seed=1):
+    """Find near-duplicate titles in roughly linear time, using MinHash
+    locality-sensitive hashing over character shingles. Titles that share an
+    LSH band are candidates, and candidates are joined if the Jaccard 
+    similarity of their shingles meets the threshold. Truncated titles (e.g.
+    "Ice sheet mass balance from…") are also joined with titles that they are
+    a prefix of
+
+    Parameters
+    ----------
+    titles : list
+      List of title strings
+    threshold : float, default 0.8
+      Jaccard similarity threshold, between 0 and 1
+    num_perm : int, default 64
+      Number of MinHash permutations
+    k : int, default 3
+      Shingle length, in characters
+    min_prefix : int, default 20
+      Minimum normalised length of truncated titles matched by prefix
+    seed : int, default 1
+      Random seed for MinHash permutations
+
+    Returns
+    -------
+    list
+      Clusters of near-duplicate title indices, ordered by first appearance.
+      Titles without near-duplicates are not returned
+    """
+    rng = np.random.RandomState(seed)
+    a = rng.randint(0, 1 << 63, size=num_perm, dtype=np.uint64)
+    a = a * np.uint64(2) + np.uint64(1)
+    b = rng.randint(0, 1 << 63, size=num_perm, dtype=np.uint64)
+    bands, rows = getBands(threshold, num_perm)
+
+    #Union-find over title indices
+    parent = list(range(len(titles)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    def join(i, j):
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+
+    #Hash signature bands into buckets
+    norms = [normaliseTitle(t) for t in titles]
+    vocab = {}
+    shingles = {i: getShingles(t, vocab, k) for i, t in enumerate(norms)
+                if t is not None}
+    sigs = getMinHashes(list(shingles.values()), a, b)
+    buckets = {}
+    for i, sig in zip(shingles, sigs):
+        for band in range(bands):
+            key = (band, sig[band*rows:(band+1)*rows].tobytes())
+            buckets.setdefault(key, []).append(i)
+
+    #Check candidates sharing a bucket
+    for idx in buckets.values():
+        for n, i in enumerate(idx):
+            for j in idx[:n]:
+                if find(i) == find(j):
+                    continue
+                si, sj = shingles[i], shingles[j]
+                if len(si & sj) / len(si | sj) >= threshold:
+                    join(i, j)
+
+    #Join truncated titles with titles they are a prefix of
+    prefixes = {}
+    for i, t in enumerate(norms):
+        if t is not None and len(t) >= min_prefix:
+            prefixes.setdefault(t[:min_prefix], []).append(i)
+    for i, t in enumerate(norms):
+        if t is not None and len(t) >= min_prefix and isTruncated(titles[i]):
+            for j in prefixes[t[:min_prefix]]:
+                if j != i and norms[j].startswith(t):
+                    join(i, j)
+
+    #Collect clusters
+    clusters = {}
+    for i in range(len(titles)):
+        clusters.setdefault(find(i), []).append(i)
+    return [c for c in clusters.values() if len(c) > 1]
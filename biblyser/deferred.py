@@ -0,0 +1,199 @@
+"""
+The Deferred module handles non-interactive resolution of ambiguous items,
+such as ambiguous name genders and multiple Scopus author search hits. When a
+deferred queue is active, these items are queued to file instead of prompting
+the user, and can be resolved afterwards in one pass
+"""
+
+import os
+import json
+import threading
+
+#Active deferred queue (see setDeferredQueue)
+QUEUE = None
+
+#Valid user answers to gender prompts
+GENDER_ANSWERS = {'m': 'male', 'f': 'female', 'nb': 'non-binary'}
+
+#------------------------------------------------------------------------------
+
+class DeferredQueue(object):
+    """The DeferredQueue object holds ambiguous items that need user input,
+    along with any answers given to them. Items are grouped by kind ("gender"
+    or "scopus") and keyed by full name
+
+    Attributes
+    ----------
+    filepath : str
+      Filepath to .json queue file
+    items : dict
+      Queued items by kind, each holding a dict of full names to their
+      candidates and answer
+    """
+
+    def __init__(self, filepath):
+        """Initialise deferred queue, loading queued items from file if it
+        already exists
+
+        Parameters
+        ----------
+        filepath : str
+          Filepath to .json queue file
+        """
+        self.filepath = filepath
+        self.items = {'gender': {}, 'scopus': {}}
+        self.lock = threading.Lock()
+        if os.path.exists(filepath):
+            with open(filepath, 'r', encoding='utf-8') as f:
+                self.items.update(json.load(f))
+
+
+    def addGender(self, fullname):
+        """Queue name with ambiguous gender
+
+        Parameters
+        ----------
+        fullname : str
+          Full name
+        """
+        with self.lock:
+            if fullname not in self.items['gender']:
+                self.items['gender'][fullname] = {'candidates': None,
+                                                  'answer': None}
+
+
+    def addScopusAuthor(self, fullname, candidates):
+        """Queue name with multiple Scopus author search hits
+
+        Parameters
+        ----------
+        fullname : str
+          Full name
+        candidates : list
+          Candidate authors, given as dicts with keys eid, name, affiliation,
+          country and documents
+        """
+        with self.lock:
+            if fullname not in self.items['scopus']:
+                self.items['scopus'][fullname] = {'candidates': candidates,
+                                                  'answer': None}
+
+
+    def getAnswer(self, kind, fullname):
+        """Return answer to queued item
+
+        Parameters
+        ----------
+        kind : str
+          Item kind ("gender" or "scopus")
+        fullname : str
+          Full name
+
+        Returns
+        -------
+        str or None
+          Answer to item (gender, or Scopus author eid with "" to skip the
+          author), or None if item is not queued or not answered
+        """
+        item = self.items[kind].get(fullname)
+        if item is not None:
+            return item['answer']
+        else:
+            return None
+
+
+    def getAnswers(self, kind):
+        """Return all answered items of a given kind
+
+        Parameters
+        ----------
+        kind : str
+          Item kind ("gender" or "scopus")
+
+        Returns
+        -------
+        dict
+          Full names and their answers
+        """
+        return {k: v['answer'] for k, v in self.items[kind].items()
+                if v['answer'] is not None}
+
+
+    def getPending(self, kind):
+        """Return full names of all unanswered items of a given kind
+
+        Parameters
+        ----------
+        kind : str
+          Item kind ("gender" or "scopus")
+
+        Returns
+        -------
+        list
+          Full names of unanswered items
+        """
+        return [k for k, v in self.items[kind].items() if v['answer'] is None]
+
+
+    def resolve(self):
+        """Resolve all unanswered items with prompted user input, in one pass
+        """
+        #Prompt for ambiguous genders
+        for fullname in self.getPending('gender'):
+            while True:
+                usr = input(f'Is {fullname} male, female or non-binary ' \
+                            '[m/f/nb, or press enter to skip]? ')
+                if usr in GENDER_ANSWERS or usr == '':
+                    break
+            if usr != '':
+                self.items['gender'][fullname]['answer'] = GENDER_ANSWERS[usr]
+
+        #Prompt for Scopus author choices
+        for fullname in self.getPending('scopus'):
+            candidates = self.items['scopus'][fullname]['candidates']
+            print(f'Multiple authors found in search for {fullname}:')
+            for i, c in enumerate(candidates):
+                print(f'{i+1}: {c["name"]}, {c["affiliation"]}, ' \
+                      f'{c["country"]} ({c["documents"]} documents)')
+            while True:
+                i = input(f'Which author is correct? [1-{len(candidates)}, ' \
+                          'or press enter to skip] ')
+                if i == '':
+                    self.items['scopus'][fullname]['answer'] = ''
+                    break
+                elif i.isdigit() and 1 <= int(i) <= len(candidates):
+                    eid = candidates[int(i)-1]['eid']
+                    self.items['scopus'][fullname]['answer'] = eid
+                    break
+
+
+    def save(self):
+        """Write queued items and answers to file"""
+        with self.lock:
+            with open(self.filepath, 'w', encoding='utf-8') as f:
+                json.dump(self.items, f, ensure_ascii=False, indent=2)
+
+#------------------------------------------------------------------------------
+
+def setDeferredQueue(queue):
+    """Set the active deferred queue. When set, ambiguous genders and Scopus
+    author searches are queued instead of prompting the user
+
+    Parameters
+    ----------
+    queue : DeferredQueue or None
+      Deferred queue to activate, or None to return to prompted input
+    """
+    global QUEUE
+    QUEUE = queue
+
+
+def getDeferredQueue():
+    """Return the active deferred queue
+
+    Returns
+    -------
+    DeferredQueue or None
+      Active deferred queue, or None if prompted input is used
+    """
+    return QUEUE
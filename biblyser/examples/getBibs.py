@@ -10,11 +10,14 @@ see <https://choosealicense.com/licenses/mit/>.
 
 #import pyBibAnalyser classes and functions
 from bs4 import BeautifulSoup
-import requests, sys
+import requests, sys, os
 #sys.path.append('../')
 
-from biblyser.organisation import Organisation, orgFromCSV
+from biblyser.name import loadGenderCache, saveGenderCache
+from biblyser.cache import ResponseCache, setCache
+from biblyser.organisation import Organisation
 from biblyser.bibcollection import BibCollection
+from biblyser.database import NameDatabase, databaseFromCSV
 
 # # Set up Scopus configuration (only needs to be done once)
 # import pybliometrics
@@ -55,6 +58,13 @@ titles=[]
 #-------------------------   Create Organisation   ----------------------------
 
 
+#Cache CrossRef, Altmetric and Scholar responses between runs
+cache = ResponseCache('output/cache.sqlite')
+setCache(cache)
+
+#Load gender guesses from previous runs
+loadGenderCache('output/gender_cache.json')
+
 #Define organisation
 # org = Organisation(names, titles)                            #All in GEUS G&K
 org = Organisation(names[7:8], titles[7:8])                              #A single person
@@ -91,10 +101,19 @@ bibs.removeDuplicates()
 #Check bibs
 bibs.checkBibs()
 
-#Guess genders for all co-authors in BibCollection
-gdb = orgFromCSV('output/out_organisation.csv')
+#Guess genders for all co-authors in BibCollection, using a persistent name
+#database updated with the current organisation. The database is imported 
+#from the csv name database of previous runs if it does not exist yet
+if not os.path.exists('output/out_database.sqlite') and \
+    os.path.exists('output/out_database.csv'):
+    databaseFromCSV('output/out_database.csv', 'output/out_database.sqlite')
+gdb = NameDatabase('output/out_database.sqlite')
+gdb.addNames(org.names)
 bibs.getAllGenders(gdb)
 
+#Retrieve Altmetric scores
+bibs.retrieveAltmetrics()
+
 #Export bib database to dataframe           
 df2 = bibs.asDataFrame()                   
 
@@ -105,9 +124,9 @@ df2 = bibs.asDataFrame()
 #Write outputs to csv 
 df2.to_csv('output/out_bibs.csv')
 
-gdb_df = gdb.asDataFrame()
-gdb_df.to_csv('output/out_database.csv')
+saveGenderCache('output/gender_cache.json')
 
 
 #------------------------------------------------------------------------------
+print(f'Response cache statistics: {cache.getStats()}')
 print('Finished')
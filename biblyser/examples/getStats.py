@@ -11,14 +11,14 @@ see <https://choosealicense.com/licenses/mit/>.
 import sys
 import numpy as np
 import pandas as pd
-from collections import Counter
 from textwrap import wrap
 import matplotlib.gridspec as gridspec
 import matplotlib.pyplot as plt
 from matplotlib.ticker import StrMethodFormatter
 
 #sys.path.append('../')
-from biblyser.bibcollection import getGenderDistrib, countByYear
+from biblyser.stats import getGenderDistrib, firstFromDF, countByYear, \
+    countAuthorshipByYear, countTop, getSummary
 
     
 #Import organisation from csv
@@ -50,11 +50,11 @@ warm = ['#C85353','#fed976','#feb24c','#fd8d3c','#fc4e2a','#e31a1c','#bd0026']
 
 
 #Get count from first author publications
-first = df.loc[df['org_led']==True]  
+first = firstFromDF(df, first=True)  
 first_yr = countByYear(first)
 
 #Get count from co-author publications
-coauthor = df.loc[df['org_led']==False]  
+coauthor = firstFromDF(df, first=False)  
 co_yr = countByYear(coauthor)
 
 #Merge and rename columns
@@ -62,34 +62,18 @@ co_yr['First author'] = first_yr['count']
 all_yr = co_yr.rename(columns={'count' : 'Co-author'})
 
 #Group journals
-journals = df['journal'].groupby(df['journal']).agg({'count'}).sort_values(by=['count'], 
-                                                                           ascending=True)
-j10 = journals.tail(10)
-others = len(list(journals['count'][:-10]))
-
-#Affiliations of authorship
-affiliations = list(df['affiliations'])
-out1=[]
-for a in affiliations:
-    allc = a.split(', ')
-    [out1.append(a) for a in allc]
-out1 = Counter(out1).most_common()
-aff_keys10 = [o[0] for o in out1[1:11]]
-aff_vals10 = [o[1] for o in out1[1:11]]
-aff_keys10.append('Others')
-aff_vals10.append(sum(sorted(list(Counter(out1).values()))[11:]))
+j10 = countTop(df, 'journal', n=10, others=False).sort_values(ascending=True)
+others = df['journal'].nunique() - len(j10)
+
+#Affiliations of authorship, skipping the organisation itself
+aff10 = countTop(df, 'affiliations', n=10, skip=1)
+aff_keys10 = list(aff10.index)
+aff_vals10 = list(aff10)
  
 #Countries of authorship
-countries = list(df['countries'])
-out=[]
-for c in countries:
-    allc = c.split(', ')
-    [out.append(a) for a in allc]
-out = Counter(out).most_common()
-co_keys10 = [o[0] for o in out[0:10]]
-co_vals10 = [o[1] for o in out[0:10]]
-co_keys10.append('Others')
-co_vals10.append(sum(sorted(list(Counter(out).values()))[10:]))
+co10 = countTop(df, 'countries', n=10)
+co_keys10 = list(co10.index)
+co_vals10 = list(co10)
 
 #Prime subplots
 fig1, ax1 = plt.subplots(1, 1, figsize=(10,10))
@@ -127,7 +111,7 @@ ax1.legend(loc=4, fontsize=lfont2, framealpha=1,
            title='Publications by year')
 
 #Plot popular journals 
-ax2.barh([l*2 for l in np.arange(10)], list(j10['count']), color=bar_col[2])
+ax2.barh([l*2 for l in np.arange(10)], list(j10), color=bar_col[2])
 ax2.set_yticks([l*2 for l in np.arange(10)])
 labels = [ '\n'.join(wrap(l, 30)) for l in list(j10.index)]
 ax2.set_yticklabels(labels, fontsize=lfont3)
@@ -152,11 +136,12 @@ ax4.legend(legend_labels, loc='center left', bbox_to_anchor=(-0.6, 0.5),
 
 #Plot summary table
 ax4 = ax1.inset_axes([-0.02,0.38,0.4,0.1])
-cells = [['Total publications', str(len(df.index))], 
-         ['Organisation-led publications', str(len(first.index))], 
-         ['Co-authored publications', str(len(coauthor.index))],
-         ['Average citation count', str(int(np.nanmean(list(df['citations']))))],
-         ['Average altmetrics', str(int(np.nanmean(list(df['altmetric']))))]]
+summary = getSummary(df)
+cells = [['Total publications', str(summary['total'])], 
+         ['Organisation-led publications', str(summary['org_led'])], 
+         ['Co-authored publications', str(summary['coauthored'])],
+         ['Average citation count', str(int(summary['mean_citations']))],
+         ['Average altmetrics', str(int(summary['mean_altmetric']))]]
 table = ax4.table(cellText=cells, colWidths=[0.6,0.2], edges='horizontal',
                   cellLoc='left')
 ax4.axis("off")
@@ -184,37 +169,8 @@ hfont = {'fontname':'Arial', 'fontsize':16}#, 'fontweight': 'bold'}
 lfont1 = {'fontname':'Arial', 'fontsize':12, 'color':'#5D5D5D'}  
 tfont = {'fontname':'Arial', 'fontsize':8, 'color':'#5D5D5D'}
 
-#Get org gender from org papers
-df1=pd.DataFrame()
-for index, row in df.iterrows():
-    f_led=0
-    f_co=0
-    m_led=0
-    m_co=0
-    genders = str(row['org_genders']).split(', ')
-    if row['org_led']==True: 
-        if genders[0]=='female':
-            f_led=f_led+1
-        else:
-            m_led=m_led+1
-        genders = genders[1:]
-    
-    for g in genders:
-        if g=='female':
-            f_co=f_co+1
-        else:
-            m_co=m_co+1  
-    #Construct pandas series and append to dataframe
-    series = pd.Series({'year': row['date'].year, 
-                      'female_lead': f_led,
-                      'male_lead': m_led, 
-                      'female_co': f_co,
-                      'male_co': m_co})
-    df1 = df1.append(series, ignore_index=True)
-
-#Group and sum by year
-df2 = df1.groupby(['year']).agg({'female_lead':'sum','male_lead':'sum',
-                           'female_co':'sum','male_co':'sum'})    
+#Count organisation lead and co-authorships by gender and year
+df2 = countAuthorshipByYear(df)
 years = [int(y) for y in list(df2.index)]
 x = list(range(len(years)))
 x = [float(x1)*2 for x1 in x]
@@ -312,7 +268,7 @@ plt.show()
 
 
 #Get only organisation-led papers
-org_led = df.loc[df['org_led']==True] 
+org_led = firstFromDF(df, first=True) 
 
 #Compute gender percentages in authorships
 fauthors, mauthors, nbauthors = getGenderDistrib(org_led)
@@ -0,0 +1,153 @@
+"""
+The Filters module holds predicates for filtering bibs in a BibCollection,
+such as by keywords in the journal title or by the number of authors.
+Predicates are functions that take a Bib object and return True if it matches,
+and can be combined and evaluated together in a single pass over a collection
+(see BibCollection.removeWhere)
+"""
+
+import re
+
+#------------------------------------------------------------------------------
+
+def compileKeywords(keywords):
+    """Compile keywords into a single case non-specific matcher
+
+    Parameters
+    ----------
+    keywords : str or list
+      Keyword or list of keywords
+
+    Returns
+    -------
+    re.Pattern
+      Compiled matcher, which matches any of the keywords
+    """
+    if isinstance(keywords, str):
+        keywords = [keywords]
+    return re.compile('|'.join([re.escape(k) for k in keywords]),
+                      re.IGNORECASE)
+
+
+def matchKeywords(value, matcher):
+    """Check if value is a string matching a compiled keyword matcher
+
+    Parameters
+    ----------
+    value : str
+      Value to check
+    matcher : re.Pattern
+      Compiled keyword matcher (see compileKeywords)
+
+    Returns
+    -------
+    bool
+      Flag denoting if value contains a keyword
+    """
+    return isinstance(value, str) and matcher.search(value) is not None
+
+
+def keywordPredicate(bib_att, keywords):
+    """Get predicate matching bibs with any of the keywords (case
+    non-specific) in a bib attribute. All keywords are compiled into a single
+    matcher
+
+    Parameters
+    ----------
+    bib_att : str
+      Bib attribute to search (e.g. "journal", "title")
+    keywords : str or list
+      Keyword or list of keywords
+
+    Returns
+    -------
+    function
+      Predicate, returning True for bibs with a keyword in the attribute
+    """
+    matcher = compileKeywords(keywords)
+
+    def predicate(bib):
+        return matchKeywords(getattr(bib, bib_att, None), matcher)
+    return predicate
+
+
+def authorCountPredicate(min_authors=None, max_authors=None):
+    """Get predicate matching bibs with a number of authors outside of a
+    range. Bibs without authors do not match
+
+    Parameters
+    ----------
+    min_authors : int, optional
+      Minimum number of authors, below which bibs match
+    max_authors : int, optional
+      Maximum number of authors, above which bibs match
+
+    Returns
+    -------
+    function
+      Predicate, returning True for bibs with too few or too many authors
+    """
+    def predicate(bib):
+        authors = getattr(bib, 'authors', None)
+        if not authors:
+            return False
+        if min_authors is not None and len(authors) < min_authors:
+            return True
+        if max_authors is not None and len(authors) > max_authors:
+            return True
+        return False
+    return predicate
+
+
+def anyPredicate(*predicates):
+    """Get predicate matching bibs that match any of the given predicates
+
+    Parameters
+    ----------
+    *predicates : function
+      Predicates to combine
+
+    Returns
+    -------
+    function
+      Combined predicate
+    """
+    def predicate(bib):
+        return any(p(bib) for p in predicates)
+    return predicate
+
+
+def allPredicates(*predicates):
+    """Get predicate matching bibs that match all of the given predicates
+
+    Parameters
+    ----------
+    *predicates : function
+      Predicates to combine
+
+    Returns
+    -------
+    function
+      Combined predicate
+    """
+    def predicate(bib):
+        return all(p(bib) for p in predicates)
+    return predicate
+
+
+def notPredicate(predicate):
+    """Get predicate matching bibs that do not match the given predicate
+
+    Parameters
+    ----------
+    predicate : function
+      Predicate to invert
+
+    Returns
+    -------
+    function
+      Inverted predicate
+    """
+    def inverted(bib):
+        return not predicate(bib)
+    return inverted
@@ -3,10 +3,29 @@ The Name module handles all functionality with an author name, including
 formatting, gender, and affiliated bib information
 """
 
+import os
+import json
+import threading
+import weakref
 import numpy as np
-from scholarly import scholarly
-import gender_guesser.detector as gender
-from pybliometrics.scopus import AuthorSearch, AuthorRetrieval
+import pandas as pd
+from biblyser.deferred import getDeferredQueue
+from biblyser.cache import cachedCall
+from biblyser.concurrency import limitRate
+
+#Shared gender detector, loaded on first use (see getDetector)
+DETECTOR = None
+
+#Lock for user input prompts, so that prompts from concurrent threads are 
+#asked one at a time
+PROMPT_LOCK = threading.Lock()
+
+#Guessed genders that are too ambiguous to be used without definition
+AMBIGUOUS_GENDERS = ['unknown', 'andy', 'mostly_male', 'mostly_female']
+
+#Memoized gender guesses from the shared detector, keyed by first name (and 
+#country, if given)
+GENDER_CACHE = {}
     
 #------------------------------------------------------------------------------
 
@@ -44,6 +63,13 @@ class Name(object):
     affiliation : str
       Affiliation institute or university
     """
+    #Fixed attributes, with name parts held privately so that cached name 
+    #formats, and the name format indexes holding them, can be cleared when 
+    #they change
+    __slots__ = ('_fullname', '_firstname', '_middlename', '_surname', 
+                 '_formats', '_indexes', 'originalname', 'title', 'gender', 
+                 'orcid', 'hindex_scopus', 'hindex_scholar', 'scopusid', 
+                 'scholarid', 'affiliation')
     
     def __init__(self, name, title=None, gender=None, **kwargs):
         """Initialise name object
@@ -62,6 +88,9 @@ class Name(object):
           Keyword arguments for Name attributes (valid keywords: orcid, 
           scholarid, scopusid, hindex_scopus, hindex_scholar, affiliation)
         """
+        #Name format indexes holding this name (see addIndex)
+        self._indexes = None
+        
         #If fullname is provided
         if isinstance(name, str):
             self.fullname = name
@@ -89,8 +118,9 @@ class Name(object):
         else:
             raise TypeError(f'Input {name} not valid')
         
-        #Retain original name input
+        #Retain original name input, with name formats computed on request
         self.originalname = name
+        self._formats = None
         
         #Assign title and gender attributes from input
         self.title = title
@@ -102,13 +132,94 @@ class Name(object):
         self.hindex_scholar = getKeyValue(kwargs, 'hindex_scholar') 
         self.scopusid = getKeyValue(kwargs, 'scopusid')
         self.scholarid = getKeyValue(kwargs, 'scholarid')
-        # self.affiliation = getKeyValue(kwargs, 'affiliation')
+        self.affiliation = getKeyValue(kwargs, 'affiliation')
         # self.country = getKeyValue(kwargs, 'country')
   
+        
+    @property
+    def fullname(self):
+        """str : Full name"""
+        return self._fullname
+    
+    @fullname.setter
+    def fullname(self, value):
+        self._fullname = value
+        self.clearFormats()
+        
+    @property
+    def firstname(self):
+        """str : First name"""
+        return self._firstname
     
-    def populateFromScopus(self):
-        """Populate Name attributes using Scopus AuthorSearch"""
-        author = fetchScopusAuthor(self.firstname, self.surname)
+    @firstname.setter
+    def firstname(self, value):
+        self._firstname = value
+        self.clearFormats()
+
+    @property
+    def middlename(self):
+        """str : Middle name"""
+        return self._middlename
+    
+    @middlename.setter
+    def middlename(self, value):
+        self._middlename = value
+        self.clearFormats()
+        
+    @property
+    def surname(self):
+        """str : Last name"""
+        return self._surname
+    
+    @surname.setter
+    def surname(self, value):
+        self._surname = value
+        self.clearFormats()
+        
+        
+    def clearFormats(self):
+        """Clear cached name formats after a name part changes, along with 
+        the name format indexes that hold them (see addIndex)"""
+        self._formats = None
+        if self._indexes is not None:
+            for owner in self._indexes:
+                owner.clearIndex()
+                
+                
+    def addIndex(self, owner):
+        """Register a name format index holding this name, so that it is 
+        cleared when a name part changes. Owners are held weakly
+        
+        Parameters
+        ----------
+        owner : object
+          Owner of name format index, with a clearIndex method (e.g. 
+          Organisation)
+        """
+        if self._indexes is None:
+            self._indexes = weakref.WeakSet()
+        self._indexes.add(owner)
+
+
+    def __getstate__(self):
+        """Return attributes for copying and pickling, without the name format
+        indexes holding this name"""
+        state = {s: getattr(self, s, None) for s in self.__slots__}
+        state['_indexes'] = None
+        return None, state
+
+    
+    def populateFromScopus(self, author=None):
+        """Populate Name attributes using Scopus AuthorSearch
+        
+        Parameters
+        ----------
+        author : AuthorRetrieval, optional
+          Scopus author retrieval object to populate from. If not given, the
+          author is fetched with a name search
+        """
+        if author is None:
+            author = fetchScopusAuthor(self.firstname, self.surname)
         try:
             self.orcid = author.orcid
         except:
@@ -131,9 +242,17 @@ class Name(object):
         # except:
         #     pass
         
-    def populateFromScholar(self):
-        """Populate Name attributes using Scholar search"""
-        author = fetchScholarAuthor(self.firstname, self.surname)
+    def populateFromScholar(self, author=None):
+        """Populate Name attributes using Scholar search
+        
+        Parameters
+        ----------
+        author : dict, optional
+          Google Scholar author attributes to populate from. If not given, the
+          author is fetched with a name search
+        """
+        if author is None:
+            author = fetchScholarAuthor(self.firstname, self.surname)
         if author != None:
             hindex = getKeyValue(author, 'hindex')
             if hindex != None:
@@ -156,11 +275,10 @@ class Name(object):
         if self.gender is None:
             
             #Guess gender from first name
-            guesser = gender.Detector()
-            g = guessGender(guesser, self.fullname)
+            g = guessGender(None, self.fullname)
             
             #If name is ambiguous, define gender manually
-            if g in ['unknown', 'andy', 'mostly_male', 'mostly_female']:
+            if g in AMBIGUOUS_GENDERS:
                 g = defineGender(self.fullname)
             
             #Assign gender to attributes
@@ -186,6 +304,34 @@ class Name(object):
             return self.title
     
     
+    def getFormats(self):
+        """Get cached name formats, which are computed once and only 
+        recomputed if the name parts are changed
+        
+        Returns
+        -------
+        tuple
+          Name formats (full name, all initials, single initials, first name 
+          and initials, single first name)
+        """
+        if self._formats is None:
+            single_initials = getInitial(self.firstname) + self.surname
+            single_name = self.firstname + ' ' + self.surname
+            
+            #Initial middle names if given
+            if self.middlename is not None:
+                mid = ''.join([getInitial(p) for p in self.middlename.split(' ')])
+                full_initials = getInitial(self.firstname) + mid + self.surname
+                name_initials = self.firstname + ' ' + mid + self.surname
+            else:
+                full_initials = single_initials
+                name_initials = single_name
+            
+            self._formats = (self.fullname, full_initials, single_initials, 
+                             name_initials, single_name)
+        return self._formats
+    
+    
     def getFullInitials(self):
         """Get name with all initials formatting e.g. "Jane Emily Doe" >> 
         "J. E. Doe" 
@@ -195,14 +341,7 @@ class Name(object):
         str
           Full initials version of name
         """
-        if self.middlename is not None:
-            parts = self.middlename.split(' ')
-            mid = ''
-            for p in parts:
-                mid+= getInitial(p)
-            return getInitial(self.firstname) + mid + self.surname
-        else:
-            return self.getSingleInitials()
+        return self.getFormats()[1]
         
     
     def getSingleInitials(self):     
@@ -214,7 +353,7 @@ class Name(object):
         str
           Single initials version of name
         """       
-        return getInitial(self.firstname) + self.surname   
+        return self.getFormats()[2]
 
 
     def getSingleName(self):
@@ -226,7 +365,7 @@ class Name(object):
         str
           Single firt name version of name
         """
-        return self.firstname + ' ' + self.surname
+        return self.getFormats()[4]
 
 
     def getNameAndInitials(self):   
@@ -238,14 +377,7 @@ class Name(object):
         str
           First name and initials version of name
         """
-        if self.middlename is not None:
-            parts = self.middlename.split(' ')
-            mid = ''
-            for p in parts:
-                mid+= getInitial(p)
-            return self.firstname + ' ' + mid + self.surname
-        else:
-            return self.getSingleName()
+        return self.getFormats()[3]
 
     
     def getAllNameFormats(self):
@@ -258,8 +390,7 @@ class Name(object):
           All versions of name [full name, all initials, single initials, 
           first name and initials]
         """
-        return [self.fullname, self.getFullInitials(), 
-                 self.getSingleInitials(), self.getNameAndInitials()]
+        return list(self.getFormats()[:4])
     
     
     def matchName(self, n):
@@ -275,11 +406,7 @@ class Name(object):
         bool
           Flag denoting whether name matches (True) or not (False)
         """
-        all_formats = self.getAllNameFormats()
-        if n in all_formats:
-            return True
-        else:
-            return False
+        return n in self.getFormats()[:4]
        
 #------------------------------------------------------------------------------    
 
@@ -368,15 +495,34 @@ def splitFullName(fullname):
     return first, middle, last
         
 
+def getDetector():
+    """Return the shared gender detector, which is created on first call so 
+    that the gender_guesser name dictionary is only loaded once per process
+    
+    Returns
+    -------
+    detector.Detector
+      Gender guesser object
+    """
+    global DETECTOR
+    if DETECTOR is None:
+        import gender_guesser.detector as gender
+        DETECTOR = gender.Detector()
+    return DETECTOR
+
+
 def guessGender(guesser, fullname, country=None):
     """Guess gender from name using the gender_guesser package
     
     Parameters
     ----------
-    guesser : detector.Detector
-      Gender guesser object
+    guesser : detector.Detector or None
+      Gender guesser object. If None, the shared detector is used and guesses 
+      are memoized in the gender cache
     fullname : str
       Full name
+    country : str, optional
+      Country to guess gender for (see gender_guesser)
     
     Returns
     -------
@@ -384,8 +530,98 @@ def guessGender(guesser, fullname, country=None):
       Guessed gender of name
     """  
     name = fullname.split(' ')[0]
-    gname = guesser.get_gender(name, country)
+    if guesser is not None:
+        return guesser.get_gender(name, country)
+    
+    #Look up cached guess, and guess with shared detector if not present
+    key = getCacheKey(name, country)
+    gname = GENDER_CACHE.get(key)
+    if gname is None:
+        gname = getDetector().get_gender(name, country)
+        GENDER_CACHE[key] = gname
     return gname
+
+
+def guessGenders(fullnames, country=None):
+    """Guess genders from multiple names in one call. First names are split 
+    off and deduplicated, so that each unique first name is only guessed once
+    with the shared detector
+    
+    Parameters
+    ----------
+    fullnames : pandas.Series or list or numpy.ndarray
+      Full names
+    country : str, optional
+      Country to guess genders for (see gender_guesser)
+    
+    Returns
+    -------
+    numpy.ndarray
+      Guessed genders of names, with "unknown" for missing names
+    """
+    names = pd.Series(fullnames, dtype=object)
+    first = names.str.split(' ', n=1).str[0]
+    
+    #Guess each unique first name, with missing names coded as -1
+    codes, uniques = pd.factorize(first)
+    guessed = [guessGender(None, u, country) for u in uniques]
+    guessed = np.array(guessed + ['unknown'], dtype=object)
+    return guessed[codes]
+
+
+def getCacheKey(name, country=None):
+    """Get gender cache key from first name and country
+    
+    Parameters
+    ----------
+    name : str
+      First name
+    country : str, optional
+      Country
+    
+    Returns
+    -------
+    str
+      Gender cache key
+    """
+    if country is None:
+        return name
+    else:
+        return name + '|' + country
+
+
+def loadGenderCache(filepath):
+    """Load memoized gender guesses from file into the gender cache
+    
+    Parameters
+    ----------
+    filepath : str
+      Filepath to .json gender cache
+    
+    Returns
+    -------
+    int
+      Number of cached guesses loaded, 0 if the file does not exist
+    """
+    if not os.path.exists(filepath):
+        return 0
+    with open(filepath, 'r', encoding='utf-8') as f:
+        cached = json.load(f)
+    GENDER_CACHE.update(cached)
+    return len(cached)
+
+
+def saveGenderCache(filepath):
+    """Save memoized gender guesses in the gender cache to file
+    
+    Parameters
+    ----------
+    filepath : str
+      Filepath to .json gender cache
+    """
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump(GENDER_CACHE, f, ensure_ascii=False, indent=0, 
+                  sort_keys=True)
     
 
 def defineGender(fullname): 
@@ -399,13 +635,24 @@ def defineGender(fullname):
     Returns
     -------
     gname : str
-      "male"/"female"/"non-binary"
+      "male"/"female"/"non-binary", or "unknown" if the name has been queued 
+      for later definition in the active deferred queue
     """
+    #Use answer from active deferred queue, or queue name if not answered
+    queue = getDeferredQueue()
+    if queue is not None:
+        gname = queue.getAnswer('gender', fullname)
+        if gname is None:
+            queue.addGender(fullname)
+            gname = 'unknown'
+        return gname
+    
     #User input for gender
-    while True:
-        usr = input (f'Is {fullname} male, female or non-binary [m/f/nb]? ')
-        if usr in ['m', 'f', 'nb']:
-            break
+    with PROMPT_LOCK:
+        while True:
+            usr = input (f'Is {fullname} male, female or non-binary [m/f/nb]? ')
+            if usr in ['m', 'f', 'nb']:
+                break
         
     #Assign gender from letter
     if usr == 'm': 
@@ -431,8 +678,23 @@ def fetchScopusAuthor(firstname, lastname):
     scopus_author : AuthorRetrieval
       Scopus author retrieval object (scopus.author_retrieval.AuthorRetrieval)
     """
+    from pybliometrics.scopus import AuthorSearch, AuthorRetrieval
+    
+    #Use answer from active deferred queue if given
+    fullname = f'{firstname} {lastname}'
+    queue = getDeferredQueue()
+    if queue is not None:
+        eid = queue.getAnswer('scopus', fullname)
+        if eid == '':
+            print(f'Scopus information for {fullname} not retrieved')
+            return None
+        elif eid is not None:
+            limitRate('scopus')
+            return AuthorRetrieval(eid)
+    
     #Search for authors based on name
     try:
+        limitRate('scopus')
         a_search = AuthorSearch(f'AUTHLAST({lastname}) and AUTHFIRST({firstname})')
     except:
         print(f'Scopus information for {firstname} {lastname} not retrieved')
@@ -444,23 +706,37 @@ def fetchScopusAuthor(firstname, lastname):
     elif a_search.get_results_size() == 1:
         idx = 0
 
+    #Queue candidates if more than one author found in deferred mode
+    elif queue is not None:
+        candidates = [{'eid': a.eid, 
+                       'name': f'{a.givenname} {a.surname}',
+                       'affiliation': a.affiliation, 
+                       'country': a.country,
+                       'documents': a.documents} for a in a_search.authors]
+        queue.addScopusAuthor(fullname, candidates)
+        print(f'Multiple authors found in search for {fullname}, ' \
+              'queued for later definition')
+        idx = None
+
     #User input prompt if more than author found
     else:
-        print('Multiple authors found in search:')
-        print(a_search)
-        size = a_search.get_results_size()
-        while True:
-            i = input(f'Which author is correct? [1-{size}, or press enter to skip] ')
-            if i == '':
-                idx = None
-                break
-            else:
-                if int(i) in range(a_search.get_results_size()+1):
-                    idx = int(i)-1
+        with PROMPT_LOCK:
+            print('Multiple authors found in search:')
+            print(a_search)
+            size = a_search.get_results_size()
+            while True:
+                i = input(f'Which author is correct? [1-{size}, or press enter to skip] ')
+                if i == '':
+                    idx = None
                     break
+                else:
+                    if int(i) in range(a_search.get_results_size()+1):
+                        idx = int(i)-1
+                        break
 
     #Retrieve author from AuthorSearch object
     if idx != None:
+        limitRate('scopus')
         scopus_author = AuthorRetrieval(a_search.authors[idx].eid)
         return scopus_author
     else:
@@ -483,13 +759,36 @@ def fetchScholarAuthor(firstname, lastname):
     scholar_author : dict
       Google Scholar author attributes    
     """  
-    #Retrieve the author's data, fill-in, and print
     fullname = ' '.join([firstname, lastname])
+    return cachedCall('scholar', {'name': fullname}, 
+                      lambda: searchScholarAuthor(fullname))
+
+
+def searchScholarAuthor(fullname):
+    """Search for Scholar author with Google Scholar API, and fill first 
+    search hit
+    
+    Parameters
+    ----------
+    fullname : str                      
+      Full name string
+    
+    Returns
+    -------
+    scholar_author : dict
+      Google Scholar author attributes, or None if not retrieved
+    """
+    from scholarly import scholarly
+    
+    #Retrieve the author's data, fill-in, and print
     search_query = scholarly.search_author(fullname)  
     
     #Fill search hit
     try:
-        scholar_author = scholarly.fill(next(search_query))
+        limitRate('scholar')
+        hit = next(search_query)
+        limitRate('scholar')
+        scholar_author = scholarly.fill(hit)
     except:
         print(f'Google Scholar information for {fullname} not retrieved')
         scholar_author = None
@@ -497,4 +796,3 @@ def fetchScholarAuthor(firstname, lastname):
     #Close query
     search_query.close()
     return scholar_author
-               
\ No newline at end of file
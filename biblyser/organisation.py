@@ -4,7 +4,10 @@ names
 """
 
 import pandas as pd
-from biblyser.name import Name, getKeyValue
+from biblyser.deferred import getDeferredQueue
+from biblyser.concurrency import getRateLimiters, runConcurrent, limitRate
+from biblyser.name import Name, getKeyValue, guessGenders, defineGender, \
+    fetchScopusAuthor, fetchScholarAuthor, AMBIGUOUS_GENDERS
 
 #------------------------------------------------------------------------------    
 
@@ -16,8 +19,13 @@ class Organisation(object):
     ----------    
     names : list
       List of Name objects
+    name_index : dict
+      Lookup of every name format (see Name.getAllNameFormats) to its Name 
+      object, built on first use and kept up to date as names are added or 
+      changed
     """
-    def __init__(self, names, titles=None, genders=None, **kwargs):
+    def __init__(self, names, titles=None, genders=None, verbose=True, 
+                 **kwargs):
         """Initialise organisation from list of names
         
         Parameters
@@ -28,15 +36,18 @@ class Organisation(object):
           List of str titles
         genders : list, optional
           List of str genders
+        verbose : bool, default True
+          Flag to denote if construction progress should be printed
         **kwargs : dict
           Keyword arguments (valid keywords: orcid, cholarid, scopusid, 
           hindex_scopus, hindex_scholar, affiliation)        
         """
-        print(f'Constructing Organisation from {type(names)}')
+        if verbose:
+            print(f'Constructing Organisation from {type(names)}')
         if isinstance(names, list): 
             
             #Construction from list of Name objects
-            if isinstance(names[0], Name):
+            if len(names) == 0 or isinstance(names[0], Name):
                 self.names = names
                 
             #Construction from list containing name strings                
@@ -72,18 +83,59 @@ class Organisation(object):
         
         #Construction from single name string
         elif isinstance(names, str):
-            self.names = Name(names, titles, genders, kwargs) 
+            self.names = [Name(names, titles, genders, **kwargs)]
 
         #Construction from single Name object
         elif isinstance(names, Name):
-            self.names = names
+            self.names = [names]
             
         #Else, print error
         else:
             raise TypeError('List should contain Name objects or str,' \
                             f' found {type(names[0])}')
         
-        print(f'Organisation defined with {len(self.names)} names')
+        if verbose:
+            print(f'Organisation defined with {len(self.names)} names')
+
+
+    @property
+    def names(self):
+        """list : Name objects, where changes to the list update the name 
+        format index"""
+        return self._names
+    
+    @names.setter
+    def names(self, names):
+        
+        #Keep names list if extended in place (e.g. with +=)
+        if getattr(self, '_names', None) is names:
+            return
+        self._names = NameList(names, self)
+        self.clearIndex()
+        
+    @property
+    def name_index(self):
+        """dict : Name format index, built on first use (see buildIndex)"""
+        if self._name_index is None:
+            self.buildIndex()
+        return self._name_index
+    
+    
+    def __getstate__(self):
+        """Return attributes for copying and pickling, without the name 
+        format index, which is rebuilt on first lookup"""
+        state = self.__dict__.copy()
+        state['_name_index'] = None
+        return state
+    
+    
+    def __copy__(self):
+        """Return shallow copy, holding the same Name objects in its own 
+        names list and name format index"""
+        new = self.__class__.__new__(self.__class__)
+        new.__dict__.update(self.__getstate__())
+        new.names = list(self.names)
+        return new
 
     
     def getAllNames(self, all_formats=True):
@@ -123,19 +175,82 @@ class Organisation(object):
           Name string that input name matches with, or None if there is no 
           match
         """
-        check=None
-        for name in self.names:
-            if name.matchName(n):
-                check=name
-        if check==None:
-            return None
-        else:
-            return check
+        return self.name_index.get(n)
+    
+    
+    def buildIndex(self):
+        """Build name format index from all Name objects in Organisation. 
+        This is run on first lookup after the index is cleared, which happens
+        when names are removed, replaced or reordered, or when a name part of 
+        an indexed Name changes"""
+        self._name_index = {}
+        for n in self.names:
+            self.indexName(n)
+            
+            
+    def clearIndex(self):
+        """Clear name format index, so that it is rebuilt on next lookup"""
+        self._name_index = None
+            
+            
+    def extendIndex(self, names):
+        """Add names to the name format index, if the index is built. 
+        Otherwise, the names are indexed when the index is built on next 
+        lookup
+        
+        Parameters
+        ----------
+        names : list
+          Name objects to index
+        """
+        if self._name_index is not None:
+            for n in names:
+                self.indexName(n)
+            
+            
+    def indexName(self, n):
+        """Add all name formats of a Name object to the name format index. 
+        Formats that are already indexed are overwritten, so the last added 
+        Name takes precedence. The Name clears the index if its name parts 
+        change
+        
+        Parameters
+        ----------
+        n : Name
+          Name object to index
+        """
+        n.addIndex(self)
+        for f in n.getAllNameFormats():
+            self.name_index[f] = n
         
         
-    def populateOrg(self, scopus=True, scholar=True):
+    def getAllGenders(self):
+        """Return genders of all names in Organisation. Names without a gender 
+        are guessed together in one batch, and ambiguous guesses are defined 
+        by the user
+        
+        Returns
+        -------
+        list
+          Genders of all names
+        """
+        missing = [n for n in self.names if n.gender is None]
+        if len(missing) > 0:
+            guessed = guessGenders([n.fullname for n in missing])
+            for n, g in zip(missing, guessed):
+                if g in AMBIGUOUS_GENDERS:
+                    g = defineGender(n.fullname)
+                n.gender = g
+        return [n.gender for n in self.names]
+        
+        
+    def populateOrg(self, scopus=True, scholar=True, workers=1, rates=None):
         """Populate Organisation with additional information gathered from 
-        Scopus and/or Scholar
+        Scopus and/or Scholar. With more than one worker, authors are fetched 
+        concurrently with each source rate limited separately. Concurrent 
+        populating is best used with a deferred queue (see 
+        biblyser.deferred), so that ambiguous Scopus searches do not wait on 
+        user input
         
         Parameters
         ----------
@@ -143,13 +258,70 @@ class Organisation(object):
           Flag to denote if Scopus authors should be used to populate object
         scholar : bool, default True
           Flag to denote if Scholar authors should be used to populate object
+        workers : int, default 1
+          Number of concurrent author fetches
+        rates : dict, optional
+          Request rates by source ("scopus", "scholar") in requests per 
+          second, if different from default rates (see 
+          biblyser.concurrency.DEFAULT_RATES)
         """
+        if workers == 1:
+            for n in self.names:
+                if scopus == True:
+                    n.populateFromScopus()
+                if scholar == True:
+                    n.populateFromScholar()
+            return
+        
+        #Compile author fetches for all names and sources
+        tasks=[]
+        targets=[]
         for n in self.names:
             if scopus == True:
-                n.populateFromScopus()
+                tasks.append(['scopus', fetchScopusAuthor, 
+                              [n.firstname, n.surname]])
+                targets.append(n.populateFromScopus)
             if scholar == True:
-                n.populateFromScholar()
+                tasks.append(['scholar', fetchScholarAuthor, 
+                              [n.firstname, n.surname]])
+                targets.append(n.populateFromScholar)
+        
+        #Fetch concurrently and populate names from fetched authors in order
+        authors = runConcurrent(tasks, workers, getRateLimiters(rates))
+        for populate, author in zip(targets, authors):
+            if author is not None and not isinstance(author, Exception):
+                populate(author)
+            
+    
+    def applyDeferred(self, queue=None, scopus=True):
+        """Apply answers from a deferred queue to all names in Organisation, 
+        setting answered genders and populating answered Scopus authors
+        
+        Parameters
+        ----------
+        queue : DeferredQueue, optional
+          Deferred queue to apply answers from. If not given, the active 
+          deferred queue is used
+        scopus : bool, default True
+          Flag to denote if answered Scopus authors should be used to populate
+          names
+        """
+        if queue is None:
+            queue = getDeferredQueue()
+        genders = queue.getAnswers('gender')
+        eids = queue.getAnswers('scopus')
+        
+        for n in self.names:
+            if n.fullname in genders:
+                n.gender = genders[n.fullname]
             
+            #Retrieve chosen Scopus author
+            eid = eids.get(f'{n.firstname} {n.surname}')
+            if scopus and eid:
+                from pybliometrics.scopus import AuthorRetrieval
+                limitRate('scopus')
+                n.populateFromScopus(AuthorRetrieval(eid))
+    
     
     def addName(self, n, t=None, g=None, **kwargs):
         """Add name to Organisation
@@ -173,47 +345,56 @@ class Organisation(object):
         
         #If fullname string or list [first, middle, last] given
         elif isinstance(n, list) or isinstance(n, str):
-            new = Name(n, t, g, kwargs)
+            new = Name(n, t, g, **kwargs)
         
         #Else, pass 
         else:
             raise TypeError('Invalid name type {type(args)} given. ' \
                             'Expected str, list or Author object.') 
         
-        #Append new author
+        #Append new author and index name formats
         self.names.append(new)
                        
         
     def asDataFrame(self):
-        """Export Organisation as dataframe
+        """Export Organisation as dataframe. Genders are exported as held in 
+        each Name (see getAllGenders)
         
         Returns
         -------
         df : pandas.DataFrame
           Organisation attributes as dataframe
         """
-        df = pd.DataFrame()
-        for a in self.names:
-            df = df.append({'full_name': a.fullname,
-                            'title': a.title,
-                            'guessed_gender': a.getGender(),
-                            # 'affiliation': a.affiliation,
-                            'orcid_id': a.orcid,
-                            'scholar_id': a.scholarid,
-                            'scopus_id': a.scopusid,
-                            'full_initials': a.getFullInitials(),
-                            'single_initials': a.getSingleInitials(),
-                            'partial_initials': a.getNameAndInitials(),
-                            'only_first': a.getSingleName(),
-                            'h-index_scopus': a.hindex_scopus,
-                            'h-index_scholar': a.hindex_scholar},
-                            ignore_index=True)           
+        df = pd.DataFrame({'full_name': [a.fullname for a in self.names],
+                           'title': [a.title for a in self.names],
+                           'guessed_gender': [a.gender for a in self.names],
+                           'orcid_id': [a.orcid for a in self.names],
+                           'scholar_id': [a.scholarid for a in self.names],
+                           'scopus_id': [a.scopusid for a in self.names],
+                           'full_initials': [a.getFullInitials() 
+                                             for a in self.names],
+                           'single_initials': [a.getSingleInitials() 
+                                               for a in self.names],
+                           'partial_initials': [a.getNameAndInitials() 
+                                                for a in self.names],
+                           'only_first': [a.getSingleName() 
+                                          for a in self.names],
+                           'h-index_scopus': [a.hindex_scopus 
+                                              for a in self.names],
+                           'h-index_scholar': [a.hindex_scholar 
+                                               for a in self.names]},
+                          dtype=object)
+        for c in ['h-index_scopus', 'h-index_scholar']:
+            df[c] = pd.to_numeric(df[c], errors='coerce')
         return df
     
     
     def checkNames(self): 
         """Checker and user editor for names and genders in Organisation
         """
+        #Guess missing genders
+        self.getAllGenders()
+        
         #Begin loop
         r1='n'
         while True:
@@ -268,6 +449,89 @@ class Organisation(object):
                 break
         
 
+#------------------------------------------------------------------------------
+
+class NameList(list):
+    """The NameList object holds the Name objects of an Organisation, 
+    keeping the Organisation name format index up to date. Added names are 
+    indexed, and the index is cleared when names are removed, replaced or 
+    reordered
+    
+    Attributes
+    ----------
+    owner : Organisation
+      Organisation holding the names
+    """
+    def __init__(self, names, owner):
+        """Initialise list of names
+        
+        Parameters
+        ----------
+        names : list
+          List of Name objects
+        owner : Organisation
+          Organisation holding the names
+        """
+        super().__init__(names)
+        self.owner = owner
+        
+        
+    def __reduce__(self):
+        """Return constructor arguments for copying and pickling"""
+        return NameList, (list(self), self.owner)
+        
+        
+    def append(self, n):
+        """Append name, and add it to the name format index"""
+        super().append(n)
+        self.owner.extendIndex([n])
+        
+        
+    def extend(self, names):
+        """Extend with names, and add them to the name format index"""
+        names = list(names)
+        super().extend(names)
+        self.owner.extendIndex(names)
+        
+        
+    def insert(self, i, n):
+        """Insert name, and add it to the name format index"""
+        super().insert(i, n)
+        self.owner.extendIndex([n])
+        
+        
+    def __iadd__(self, names):
+        """Extend with names in place, and add them to the name format 
+        index"""
+        self.extend(names)
+        return self
+        
+        
+    def changed(method):
+        """Wrap list method so that it clears the owner name format index"""
+        def wrapped(self, *args):
+            result = method(self, *args)
+            self.owner.clearIndex()
+            return result
+        wrapped.__name__ = method.__name__
+        wrapped.__doc__ = method.__doc__
+        return wrapped
+    
+    pop = changed(list.pop)
+    remove = changed(list.remove)
+    clear = changed(list.clear)
+    reverse = changed(list.reverse)
+    __setitem__ = changed(list.__setitem__)
+    __delitem__ = changed(list.__delitem__)
+    __imul__ = changed(list.__imul__)
+    
+    def sort(self, *, key=None, reverse=False):
+        """Sort names in place"""
+        super().sort(key=key, reverse=reverse)
+        self.owner.clearIndex()
+        
+    del changed
+        
 #------------------------------------------------------------------------------    
        
 def lookupName(n, names):
@@ -306,12 +570,11 @@ def checkGender(name, organisation):
     gender  : str or None
       Gender of name, or None if name does not appear in Organisation object
     """
-    gender=None
-    for n in organisation.names:
-        all_n = n.getAllNameFormats()
-        if name in all_n:
-            gender = n.gender
-    return gender
+    n = organisation.checkOrgName(name)
+    if n is not None:
+        return n.gender
+    else:
+        return None
 
 
 def checkAffiliation(name, organisation):
@@ -330,12 +593,11 @@ def checkAffiliation(name, organisation):
       Affiliation of name, or None if name does not appear in Organisation 
       object
     """
-    aff=None
-    for n in organisation.names:
-        all_n = n.getAllNameFormats()
-        if name in all_n:
-            aff = n.affiliation
-    return aff
+    n = organisation.checkOrgName(name)
+    if n is not None:
+        return n.affiliation
+    else:
+        return None
 
 
 def orgFromCSV(csv_file):
@@ -351,10 +613,26 @@ def orgFromCSV(csv_file):
     org : Organisation
       Organisation object
     """
-    #Setup gender database from file
-    database = pd.read_csv(csv_file)
-    n_db = list(database['full_name'])
-    t_db = list(database['title'])
-    g_db = list(database['guessed_gender'])
-    org = Organisation(n_db, t_db, g_db)
+    #Setup gender database from file, with identifiers kept as strings
+    database = pd.read_csv(csv_file, dtype={'full_name': str, 'title': str, 
+                                            'guessed_gender': str, 
+                                            'orcid_id': str, 
+                                            'scholar_id': str, 
+                                            'scopus_id': str})
+    database = database.astype(object).where(database.notna(), None)
+    
+    #Get columns, with missing columns as empty
+    cols = {}
+    for c in ['full_name', 'title', 'guessed_gender', 'orcid_id', 'scholar_id',
+              'scopus_id', 'h-index_scopus', 'h-index_scholar']:
+        if c in database.columns:
+            cols[c] = database[c].tolist()
+        else:
+            cols[c] = [None] * len(database.index)
+    
+    #Construct all names in one pass
+    names = [Name(n, t, g, orcid=o, scholarid=si, scopusid=sc, 
+                  hindex_scopus=hsc, hindex_scholar=hsi) 
+             for n, t, g, o, si, sc, hsc, hsi in zip(*cols.values())]
+    org = Organisation(names, verbose=False)
     return org
@@ -0,0 +1,662 @@
+"""
+The Replay module handles recording of bib database responses to disk, and
+replaying them offline with configurable latency and error injection, so that
+harvesting, caching and retry behaviour can be tested and benchmarked without
+live services. CrossRef and Altmetric are recorded and replayed at the HTTP
+level, either through the shared session (see recordSources, replaySources)
+or from a local stand-in server (see StandInServer). Scopus and Google Scholar
+are queried through their client packages, so their retrieval functions are
+recorded and replayed instead
+"""
+
+import time
+import types
+import random
+import threading
+import importlib
+import contextlib
+from urllib.parse import urlsplit, parse_qsl
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+import biblyser.clients as clients
+from biblyser.name import Name
+from biblyser.cache import ResponseCache, DEFAULT_TTL
+
+#Retrieval functions recorded and replayed by module, with their source
+FUNCTIONS = {'biblyser.name': {'fetchScopusAuthor': 'scopus',
+                               'fetchScholarAuthor': 'scholar'},
+             'biblyser.organisation': {'fetchScopusAuthor': 'scopus',
+                                       'fetchScholarAuthor': 'scholar'},
+             'biblyser.bibcollection': {'fetchScopusBibs': 'scopus',
+                                        'fetchScholarBibs': 'scholar'}}
+
+#Scopus author attributes kept in recordings (see Name.populateFromScopus)
+SCOPUS_AUTHOR_ATTRIBUTES = ['eid', 'identifier', 'orcid', 'h_index',
+                            'indexed_name', 'document_count']
+
+#Request parameters left out of recording keys, as they do not change the
+#response
+IGNORED_PARAMS = ['mailto']
+
+#Response headers that are not recorded, as recorded bodies are decoded and
+#connections are managed by the replaying side
+IGNORED_HEADERS = ['content-encoding', 'content-length', 'transfer-encoding',
+                   'connection', 'keep-alive']
+
+#------------------------------------------------------------------------------
+
+class FaultInjector(object):
+    """The FaultInjector object adds latency and random errors to replayed
+    responses. Errors are drawn from a seeded random generator shared across
+    threads, so a sequential replay gives the same errors on every run
+
+    Attributes
+    ----------
+    latency : float
+      Added latency of each response, in seconds
+    jitter : float
+      Maximum random latency added on top of latency, in seconds
+    error_rate : float
+      Fraction of responses replaced with an error, between 0 and 1
+    """
+
+    def __init__(self, latency=0, jitter=0, error_rate=0, seed=None):
+        """Initialise fault injector
+
+        Parameters
+        ----------
+        latency : float, default 0
+          Added latency of each response, in seconds
+        jitter : float, default 0
+          Maximum random latency added on top of latency, in seconds
+        error_rate : float, default 0
+          Fraction of responses replaced with an error, between 0 and 1
+        seed : int, optional
+          Random seed of errors and jitter
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+
+    def apply(self):
+        """Wait for response latency and draw whether the response is an
+        error
+
+        Returns
+        -------
+        bool
+          Flag denoting if the response should be replaced with an error
+        """
+        with self.lock:
+            error = self.rng.random() < self.error_rate
+            delay = self.latency + self.rng.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        return error
+
+
+class RecordingAdapter(HTTPAdapter):
+    """The RecordingAdapter object is a pooled HTTP adapter that records every
+    response it receives to fixtures
+    """
+
+    def __init__(self, fixtures, **kwargs):
+        """Initialise recording adapter
+
+        Parameters
+        ----------
+        fixtures : ResponseCache
+          Fixtures to record to (see openFixtures)
+        **kwargs : dict
+          Keyword arguments of requests.adapters.HTTPAdapter
+        """
+        super().__init__(**kwargs)
+        self.fixtures = fixtures
+
+
+    def send(self, request, **kwargs):
+        """Send request and record its response"""
+        response = super().send(request, **kwargs)
+        self.fixtures.set('http', getHTTPParams(request.method, request.url),
+                          responseToFixture(response))
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """The ReplayAdapter object is an HTTP adapter that answers requests from
+    recorded fixtures, without opening any connection. Requests without a
+    recorded response fail as if the service could not be reached
+    """
+
+    def __init__(self, fixtures, faults=None, error_status=503):
+        """Initialise replay adapter
+
+        Parameters
+        ----------
+        fixtures : ResponseCache
+          Fixtures to replay from (see openFixtures)
+        faults : FaultInjector, optional
+          Latency and error injection of responses
+        error_status : int, default 503
+          HTTP status of injected errors
+        """
+        super().__init__()
+        self.fixtures = fixtures
+        self.faults = faults
+        self.error_status = error_status
+
+
+    def send(self, request, **kwargs):
+        """Return recorded response to request"""
+        if self.faults is not None and self.faults.apply():
+            fixture = errorFixture(self.error_status)
+        else:
+            found, fixture = self.fixtures.get('http',
+                                               getHTTPParams(request.method,
+                                                             request.url))
+            if not found:
+                raise requests.ConnectionError(f'No recorded response for ' \
+                                               f'{request.method} ' \
+                                               f'{request.url}',
+                                               request=request)
+        return fixtureToResponse(fixture, request)
+
+
+    def close(self):
+        """Close adapter"""
+        pass
+
+
+class StandInServer(object):
+    """The StandInServer object is a local HTTP server standing in for the
+    CrossRef and Altmetric APIs, serving recorded responses with configurable
+    latency and error injection. Requests are handled in a thread each, so
+    latency does not serialise concurrent requests. Used as a context
+    manager, the server is started and the HTTP clients are pointed to it e.g.
+
+    with StandInServer('fixtures', latency=0.05) as server:
+        collection.harvestBibs(scopus=False, crossref=True, workers=8)
+
+    Attributes
+    ----------
+    fixtures : ResponseCache or None
+      Recorded responses served (see openFixtures)
+    faults : FaultInjector
+      Latency and error injection of responses
+    error_status : int
+      HTTP status of injected errors
+    fallback : function or None
+      Function answering requests without a recorded response
+    counts : dict
+      Number of requests, injected errors and requests without a recorded
+      response ("requests", "errors", "missing")
+    """
+
+    def __init__(self, fixtures=None, latency=0, jitter=0, error_rate=0,
+                 error_status=503, seed=None, fallback=None,
+                 host='127.0.0.1', port=0):
+        """Initialise stand-in server, bound to a free port by default
+
+        Parameters
+        ----------
+        fixtures : ResponseCache or str, optional
+          Recorded responses to serve, either as fixtures or as a filepath to
+          a fixture directory (see openFixtures)
+        latency : float, default 0
+          Added latency of each response, in seconds
+        jitter : float, default 0
+          Maximum random latency added on top of latency, in seconds
+        error_rate : float, default 0
+          Fraction of responses replaced with an error, between 0 and 1
+        error_status : int, default 503
+          HTTP status of injected errors
+        seed : int, optional
+          Random seed of errors and jitter
+        fallback : function, optional
+          Function answering requests without a recorded response, taking the
+          method and path and returning a fixture dict (status, headers,
+          body), or None. Requests that are not answered are given a 404
+        host : str, default "127.0.0.1"
+          Host to bind to
+        port : int, default 0
+          Port to bind to, where 0 binds to a free port
+        """
+        if isinstance(fixtures, str):
+            fixtures = openFixtures(fixtures)
+        self.fixtures = fixtures
+        self.faults = FaultInjector(latency, jitter, error_rate, seed)
+        self.error_status = error_status
+        self.fallback = fallback
+        self.counts = {'requests': 0, 'errors': 0, 'missing': 0}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), StandInHandler)
+        self.server.daemon_threads = True
+        self.server.standin = self
+        self.thread = None
+        self.previous = None
+
+
+    @property
+    def url(self):
+        """Return base URL of server"""
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+    def start(self):
+        """Start serving in a background thread"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.server.serve_forever,
+                                           daemon=True)
+            self.thread.start()
+
+
+    def stop(self):
+        """Stop serving and close server"""
+        if self.thread is not None:
+            self.server.shutdown()
+            self.thread.join()
+            self.thread = None
+        self.server.server_close()
+
+
+    def getResponse(self, method, path):
+        """Get response to request, from recorded responses or fallback
+
+        Parameters
+        ----------
+        method : str
+          HTTP method
+        path : str
+          Request path, including query
+
+        Returns
+        -------
+        dict
+          Response fixture (status, headers, body)
+        """
+        error = self.faults.apply()
+        with self.lock:
+            self.counts['requests'] += 1
+            if error:
+                self.counts['errors'] += 1
+        if error:
+            return errorFixture(self.error_status)
+        found = False
+        if self.fixtures is not None:
+            found, fixture = self.fixtures.get('http',
+                                               getHTTPParams(method, path))
+        if not found and self.fallback is not None:
+            fixture = self.fallback(method, path)
+            found = fixture is not None
+        if not found:
+            with self.lock:
+                self.counts['missing'] += 1
+            return errorFixture(404, 'No recorded response')
+        return fixture
+
+
+    def __enter__(self):
+        """Start server and point HTTP clients to it"""
+        self.start()
+        self.previous = {k: clients.SETTINGS[k] for k in ['crossref_url',
+                                                          'altmetric_url']}
+        clients.configureClients(crossref_url=self.url,
+                                 altmetric_url=getStandInURL(
+                                     self.url, self.previous['altmetric_url']))
+        return self
+
+
+    def __exit__(self, *args):
+        """Point HTTP clients back and stop server"""
+        clients.configureClients(**self.previous)
+        self.stop()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Request handler of StandInServer. Connections are kept alive, and each
+    response is sent in a single write, so that small responses are not held
+    back waiting for the acknowledgement of a separately sent header
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        """Answer GET request"""
+        self.respond()
+
+
+    def do_POST(self):
+        """Answer POST request"""
+        self.respond()
+
+
+    def respond(self):
+        """Answer request with response from stand-in server"""
+        length = int(self.headers.get('Content-Length', 0))
+        if length > 0:
+            self.rfile.read(length)
+        fixture = self.server.standin.getResponse(self.command, self.path)
+        status = fixture['status']
+        lines = [f'{self.protocol_version} {status} ' \
+                 f'{self.responses.get(status, [""])[0]}']
+        for k, v in fixture['headers'].items():
+            if k.lower() not in IGNORED_HEADERS:
+                lines.append(f'{k}: {v}')
+        lines.append(f'Content-Length: {len(fixture["body"])}')
+        head = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+        self.wfile.write(head + fixture['body'])
+
+
+    def log_message(self, format, *args):
+        """Do not log requests"""
+        pass
+
+#------------------------------------------------------------------------------
+
+def openFixtures(filepath, backend='file'):
+    """Open fixtures of recorded responses, held as a response cache without
+    expiry
+
+    Parameters
+    ----------
+    filepath : str
+      Filepath to fixture directory, or to SQLite database file if the sqlite
+      backend is used
+    backend : str, default "file"
+      Storage backend, either "file" or "sqlite" (see
+      biblyser.cache.ResponseCache)
+
+    Returns
+    -------
+    ResponseCache
+      Fixtures
+    """
+    ttl = {s: None for s in list(DEFAULT_TTL) + ['http', 'scopus']}
+    return ResponseCache(filepath, backend, ttl=ttl)
+
+
+def getHTTPParams(method, url):
+    """Get recording key parameters of HTTP request. Only the path and query
+    are used, so requests recorded from a bib database can be matched on a
+    stand-in server
+
+    Parameters
+    ----------
+    method : str
+      HTTP method
+    url : str
+      Request URL, or path including query
+
+    Returns
+    -------
+    dict
+      Recording key parameters
+    """
+    parts = urlsplit(url)
+    query = sorted([[k, v] for k, v in parse_qsl(parts.query)
+                    if k not in IGNORED_PARAMS])
+    return {'method': method, 'path': parts.path, 'query': query}
+
+
+def getCallParams(func_name, args):
+    """Get recording key parameters of retrieval function call, where Name
+    arguments are given by full name and IDs
+
+    Parameters
+    ----------
+    func_name : str
+      Function name
+    args : list
+      Function arguments
+
+    Returns
+    -------
+    dict
+      Recording key parameters
+    """
+    keys = []
+    for a in args:
+        if isinstance(a, Name):
+            a = [a.fullname, a.scopusid, a.scholarid]
+        keys.append(a)
+    return {'function': func_name, 'args': keys}
+
+
+def responseToFixture(response):
+    """Get fixture from HTTP response
+
+    Parameters
+    ----------
+    response : requests.Response
+      HTTP response
+
+    Returns
+    -------
+    dict
+      Response fixture (status, headers, body)
+    """
+    headers = {k: v for k, v in response.headers.items()
+               if k.lower() not in IGNORED_HEADERS}
+    return {'status': response.status_code, 'headers': headers,
+            'body': response.content}
+
+
+def fixtureToResponse(fixture, request):
+    """Get HTTP response from fixture
+
+    Parameters
+    ----------
+    fixture : dict
+      Response fixture (status, headers, body)
+    request : requests.PreparedRequest
+      Request answered
+
+    Returns
+    -------
+    requests.Response
+      HTTP response
+    """
+    response = requests.Response()
+    response.status_code = fixture['status']
+    response.headers = CaseInsensitiveDict(fixture['headers'])
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = fixture['body']
+    response.url = request.url
+    response.request = request
+    return response
+
+
+def errorFixture(status, message='Injected error'):
+    """Get fixture of an error response
+
+    Parameters
+    ----------
+    status : int
+      HTTP status
+    message : str, default "Injected error"
+      Error message
+
+    Returns
+    -------
+    dict
+      Response fixture (status, headers, body)
+    """
+    return {'status': status,
+            'headers': {'Content-Type': 'application/json'},
+            'body': ('{"status": "error", "message": "' + message +
+                     '"}').encode('utf-8')}
+
+
+def getStandInURL(url, service_url):
+    """Get stand-in URL of a service, keeping the path of the service URL so
+    that recorded paths match e.g. "https://api.altmetric.com/v1" >>
+    "http://127.0.0.1:8000/v1"
+
+    Parameters
+    ----------
+    url : str
+      Base URL of stand-in server
+    service_url : str
+      URL of service
+
+    Returns
+    -------
+    str
+      Stand-in URL of service
+    """
+    return url + urlsplit(service_url).path.rstrip('/')
+
+
+def snapshotScopusAuthor(author):
+    """Get picklable snapshot of Scopus author, holding the attributes used in
+    populating names
+
+    Parameters
+    ----------
+    author : AuthorRetrieval
+      Scopus author retrieval object
+
+    Returns
+    -------
+    types.SimpleNamespace
+      Snapshot of author attributes. Attributes that could not be retrieved
+      are left out
+    """
+    snapshot = types.SimpleNamespace()
+    for att in SCOPUS_AUTHOR_ATTRIBUTES:
+        try:
+            setattr(snapshot, att, getattr(author, att))
+        except:
+            pass
+    return snapshot
+
+
+@contextlib.contextmanager
+def patchFunctions(wrap):
+    """Context manager replacing retrieval functions (see FUNCTIONS) with
+    wrapped functions, restoring them on exit
+
+    Parameters
+    ----------
+    wrap : function
+      Function taking a retrieval function, its name and its source, and
+      returning the replacement function
+    """
+    originals = []
+    for module, funcs in FUNCTIONS.items():
+        m = importlib.import_module(module)
+        for name, source in funcs.items():
+            func = getattr(m, name)
+            originals.append([m, name, func])
+            setattr(m, name, wrap(func, name, source))
+    try:
+        yield
+    finally:
+        for m, name, func in originals:
+            setattr(m, name, func)
+
+
+@contextlib.contextmanager
+def recordSources(fixtures):
+    """Context manager recording all bib database responses to fixtures. HTTP
+    responses (CrossRef, Altmetric) are recorded from the shared session, and
+    Scopus and Google Scholar retrievals are recorded by function call e.g.
+
+    with recordSources('fixtures'):
+        org.populateOrg(scopus=True, scholar=True)
+        collection.harvestBibs(scopus=True, scholar=True, crossref=True)
+        collection.retrieveAltmetrics()
+
+    Parameters
+    ----------
+    fixtures : ResponseCache or str
+      Fixtures to record to, or filepath to fixture directory (see
+      openFixtures)
+    """
+    if isinstance(fixtures, str):
+        fixtures = openFixtures(fixtures)
+
+    def wrap(func, name, source):
+        def recorded(*args):
+            value = func(*args)
+            stored = value
+            if name == 'fetchScopusAuthor' and value is not None:
+                stored = snapshotScopusAuthor(value)
+            fixtures.set(source, getCallParams(name, args), stored)
+            return value
+        return recorded
+
+    #Mount recording adapter on a new shared session
+    clients.configureClients()
+    adapter = RecordingAdapter(fixtures,
+                               pool_connections=clients.SETTINGS['pool_size'],
+                               pool_maxsize=clients.SETTINGS['pool_size'],
+                               max_retries=clients.SETTINGS['retries'])
+    session = clients.getSession()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    try:
+        with patchFunctions(wrap):
+            yield fixtures
+    finally:
+        clients.configureClients()
+
+
+@contextlib.contextmanager
+def replaySources(fixtures, latency=0, jitter=0, error_rate=0,
+                  error_status=503, seed=None):
+    """Context manager replaying recorded bib database responses, so that no
+    network calls are made. Responses without a recording fail, HTTP requests
+    with a connection error and retrieval function calls with a LookupError.
+    Injected errors are given as HTTP error responses, and as IOError from
+    retrieval functions
+
+    Parameters
+    ----------
+    fixtures : ResponseCache or str
+      Fixtures to replay from, or filepath to fixture directory (see
+      openFixtures)
+    latency : float, default 0
+      Added latency of each response, in seconds
+    jitter : float, default 0
+      Maximum random latency added on top of latency, in seconds
+    error_rate : float, default 0
+      Fraction of responses replaced with an error, between 0 and 1
+    error_status : int, default 503
+      HTTP status of injected errors
+    seed : int, optional
+      Random seed of errors and jitter
+    """
+    if isinstance(fixtures, str):
+        fixtures = openFixtures(fixtures)
+    faults = FaultInjector(latency, jitter, error_rate, seed)
+
+    def wrap(func, name, source):
+        def replayed(*args):
+            if faults.apply():
+                raise IOError(f'Injected {source} error')
+            found, value = fixtures.get(source, getCallParams(name, args))
+            if not found:
+                raise LookupError(f'No recorded {source} response for ' \
+                                  f'{name} {getCallParams(name, args)["args"]}')
+            return value
+        return replayed
+
+    #Mount replay adapter on a new shared session
+    clients.configureClients()
+    adapter = ReplayAdapter(fixtures, faults, error_status)
+    session = clients.getSession()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    try:
+        with patchFunctions(wrap):
+            yield fixtures
+    finally:
+        clients.configureClients()
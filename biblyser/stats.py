@@ -0,0 +1,344 @@
+"""
+The Stats module handles statistics of an exported BibCollection (see
+BibCollection.asDataFrame), such as gender distributions of authorship and
+publication counts by year. All statistics are computed over the whole
+dataframe at once, and input dataframes are left unchanged
+"""
+
+import numpy as np
+import pandas as pd
+
+#Gender labels counted in gender distributions, with their column names
+GENDER_COLUMNS = {'female': 'female', 'male': 'male', 'non-binary': 'nonbinary'}
+
+#Exported columns holding comma-delineated lists
+LIST_COLUMNS = ['authors', 'org_authors', 'genders', 'org_genders', 
+                'affiliations', 'countries']
+
+#------------------------------------------------------------------------------
+
+def toLists(column):
+    """Return column of lists from a column of either lists or
+    comma-delineated strings, as exported by BibCollection.asDataFrame
+
+    Parameters
+    ----------
+    column : pandas.Series
+      Dataframe column
+
+    Returns
+    -------
+    pandas.Series
+      Column of lists, with missing values as NaN
+    """
+    if pd.api.types.infer_dtype(column, skipna=True) in ['string', 'empty']:
+        return column.astype(object).str.split(', ')
+    return column
+
+
+def toBoolean(column):
+    """Return boolean column from a column of booleans or of "True"/"False"
+    strings (e.g. as read from csv)
+
+    Parameters
+    ----------
+    column : pandas.Series
+      Dataframe column
+
+    Returns
+    -------
+    pandas.Series
+      Boolean column, with missing or unrecognised values as False
+    """
+    if pd.api.types.is_bool_dtype(column):
+        return column.fillna(False).astype(bool)
+    values = column.astype(str).str.strip().str.lower()
+    return values.isin(['true', '1', '1.0'])
+
+
+def explodeLists(column):
+    """Return values of a column of lists as one flat array, with the row
+    position of each value and the position of each value within its list.
+    Columns of comma-delineated strings are split together in one operation
+
+    Parameters
+    ----------
+    column : pandas.Series
+      Column of lists or comma-delineated strings
+
+    Returns
+    -------
+    rows : numpy.ndarray
+      Row position of each value
+    values : numpy.ndarray
+      Values of all lists, in row order
+    positions : numpy.ndarray
+      Position of each value within its list, from 0
+    """
+    valid = column.notna().to_numpy()
+    lengths = np.zeros(len(column), dtype=int)
+    if not valid.any():
+        empty = np.array([], dtype=int)
+        return empty, np.array([], dtype=object), empty
+
+    #Get lists as one flat array, with the length of each list
+    if pd.api.types.infer_dtype(column, skipna=True) == 'string':
+        strings = column[valid].tolist()
+        values = np.array(', '.join(strings).split(', '), dtype=object)
+        lengths[valid] = np.char.count(np.array(strings), ', ') + 1
+    else:
+        exploded = pd.Series(column.to_numpy()[valid]).explode()
+        values = exploded.to_numpy()
+        lengths[valid] = exploded.index.value_counts(sort=False) \
+            .sort_index().to_numpy()
+    rows = np.repeat(np.arange(len(column)), lengths)
+    positions = np.arange(len(rows)) - np.repeat(np.cumsum(lengths) - lengths,
+                                                 lengths)
+
+    #Remove missing values, such as from empty lists
+    keep = pd.notna(values)
+    return rows[keep], values[keep], positions[keep]
+
+
+def explodeGenders(df, first=True):
+    """Return author genders of all publications as one flat array, with the
+    row position of the publication of each author
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+      A dataframe representing an exported BibCollection
+    first : bool, default True
+      Flag to denote if first author genders should be included or not
+
+    Returns
+    -------
+    rows : numpy.ndarray
+      Publication row position of each author
+    genders : numpy.ndarray
+      Gender of each author
+    """
+    rows, genders, positions = explodeLists(df['genders'])
+    if not first:
+        rows, genders = rows[positions > 0], genders[positions > 0]
+    return rows, genders
+
+
+def getGenderPercentages(df, first=True):
+    """Get percentage of female, male and non-binary authors for each
+    publication
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+      A dataframe representing an exported BibCollection
+    first : bool, default True
+      Flag to denote if first author gender should be included or not
+
+    Returns
+    -------
+    pandas.DataFrame
+      Percentages of female, male and nonbinary authors, with the same index
+      as the input dataframe. Publications without counted authors are NaN
+    """
+    n = len(df.index)
+    rows, genders = explodeGenders(df, first)
+    
+    #Count each gender in each publication
+    codes, labels = pd.factorize(genders)
+    labels = list(labels)
+    k = len(labels)
+    counts = np.bincount(rows * k + codes, minlength=n * k).reshape(n, k)
+    total = counts.sum(axis=1).astype(float)
+    total[total == 0] = np.nan
+    
+    #Get percentages of counted genders
+    out = {}
+    for g, c in GENDER_COLUMNS.items():
+        if g in labels:
+            count = counts[:, labels.index(g)]
+        else:
+            count = np.zeros(n)
+        out[c] = count / total * 100
+    return pd.DataFrame(out, index=df.index)
+
+
+def getGenderDistrib(df, first=True):
+    '''Get gender distribution of women, men and non-binary authors as a
+    percentage. This is derived from the gender count columns from a given
+    dataframe
+
+    Parameters
+    ----------
+    df : pandas.Dataframe
+      A dataframe representing an exported BibCollection
+    first : bool
+      Flag to denote if first author gender should be included or not
+
+    Returns
+    -------
+    f : list
+      List of percentage of female authors for each publication
+    m : list
+      List of percentage of male authors for each publication
+    nb : list
+      List of percentage of non-binary authors for each publication
+    '''
+    pct = getGenderPercentages(df, first).dropna()
+    return (pct['female'].tolist(), pct['male'].tolist(),
+            pct['nonbinary'].tolist())
+
+
+def firstFromDF(df, first=True):
+    '''Get either Organisation-led (i.e. first author) or co-author publication
+    entries from dataframe
+
+    Parameters
+    ----------
+    df : pandas.Dataframe
+      A dataframe representing an exported BibCollection
+    first : bool
+      Flag to denote if first author or co-author publications should be
+      retrieved
+
+    Returns
+    -------
+    df1 : pandas.Dataframe
+      A dataframe of only Organisation-led publication entries
+    '''
+    return df.loc[toBoolean(df['org_led']) == first]
+
+
+def countByYear(df):
+    '''Count publications in dataframe by year
+
+    Parameters
+    ----------
+    df : pandas.Dataframe
+      A dataframe representing an exported BibCollection
+
+    Returns
+    -------
+    pandas.Dataframe
+      Publication count by year, in a column named "count". Publications
+      without a valid date are not counted
+    '''
+    dates = pd.to_datetime(df['date'], errors='coerce').dropna()
+    return dates.groupby(dates.dt.year).agg(['count'])
+
+
+def countFirstLast(df):
+    '''Count first and last author genders of publications
+
+    Parameters
+    ----------
+    df : pandas.Dataframe
+      A dataframe representing an exported BibCollection
+
+    Returns
+    -------
+    pandas.Dataframe
+      Count of first and last author genders, in columns "first" and "last",
+      indexed by gender
+    '''
+    counts = pd.DataFrame({'first': df['first_gender'].value_counts(),
+                           'last': df['last_gender'].value_counts()})
+    return counts.fillna(0).astype(int)
+
+
+def countAuthorshipByYear(df):
+    '''Count organisation lead and co-authorships by gender and year. In 
+    organisation-led publications, the first organisation author is counted as
+    the lead author and all others as co-authors. Authors not guessed as 
+    female are counted as male
+
+    Parameters
+    ----------
+    df : pandas.Dataframe
+      A dataframe representing an exported BibCollection
+
+    Returns
+    -------
+    pandas.Dataframe
+      Counts of female_lead, male_lead, female_co and male_co authorships, 
+      indexed by year. Publications without a valid date are not counted
+    '''
+    dates = pd.to_datetime(df['date'], errors='coerce')
+    rows, genders, positions = explodeLists(df['org_genders'])
+    
+    #Classify each organisation authorship
+    led = toBoolean(df['org_led']).to_numpy()[rows] & (positions == 0)
+    female = genders == 'female'
+    authorships = pd.DataFrame({'year': dates.dt.year.to_numpy()[rows],
+                                'female_lead': led & female,
+                                'male_lead': led & ~female,
+                                'female_co': ~led & female,
+                                'male_co': ~led & ~female})
+    
+    #Sum by year, including years without organisation authorships
+    counts = authorships.dropna(subset=['year']).groupby('year').sum()
+    years = dates.dropna().dt.year.unique()
+    counts = counts.reindex(np.sort(years), fill_value=0).astype(int)
+    counts.index = counts.index.astype(int)
+    counts.index.name = 'year'
+    return counts
+
+
+def countTop(df, column, n=10, skip=0, others=True):
+    '''Count the most common values of a column, such as journals, or of a
+    column of lists, such as affiliations or countries
+
+    Parameters
+    ----------
+    df : pandas.Dataframe
+      A dataframe representing an exported BibCollection
+    column : str
+      Column name
+    n : int, default 10
+      Number of most common values to return
+    skip : int, default 0
+      Number of most common values to skip (e.g. to skip the affiliation of
+      the organisation itself)
+    others : bool, default True
+      Flag to denote if the total count of all other values should be added,
+      labelled "Others"
+
+    Returns
+    -------
+    pandas.Series
+      Counts of most common values, in descending order
+    '''
+    if column in LIST_COLUMNS:
+        rows, values, positions = explodeLists(df[column])
+    else:
+        values = df[column].dropna().to_numpy()
+    counts = pd.Series(values).value_counts()
+    top = counts.iloc[skip:skip+n]
+    if others:
+        top = pd.concat([top, pd.Series({'Others': counts.iloc[skip+n:].sum()})])
+    top.index.name = column
+    return top
+
+
+def getSummary(df):
+    '''Get summary statistics of publications
+
+    Parameters
+    ----------
+    df : pandas.Dataframe
+      A dataframe representing an exported BibCollection
+
+    Returns
+    -------
+    dict
+      Total, organisation-led and co-authored publication counts, and mean
+      citation count and Altmetric score
+    '''
+    led = toBoolean(df['org_led'])
+    return {'total': len(df.index),
+            'org_led': int(led.sum()),
+            'coauthored': int((~led).sum()),
+            'mean_citations': pd.to_numeric(df['citations'], 
+                                            errors='coerce').mean(),
+            'mean_altmetric': pd.to_numeric(df['altmetric'], 
+                                            errors='coerce').mean()}
@@ -41,7 +41,8 @@ setuptools.setup(
         "Topic :: Scientific/Engineering",
         "Operating System :: OS Independent",
     ],
-    install_requires=['gender-guesser', 'habanero', 'numpy', 'pandas', 'pybliometrics', 'scholarly'],
+    install_requires=['gender-guesser', 'numpy', 'pandas', 'pybliometrics', 'requests', 'scholarly'],
+    extras_require={'parquet': ['pyarrow']},
     python_requires='>=3.7',
 )
 
@@ -0,0 +1,46 @@
+"""
+Tests of the Bib module
+"""
+
+import numpy as np
+import pandas as pd
+from datetime import datetime, date
+import biblyser.bib as bib
+from biblyser.bib import Bib, toDatetime
+
+#------------------------------------------------------------------------------
+
+def test_to_datetime():
+    assert toDatetime(datetime(2020, 3, 1)) == datetime(2020, 3, 1)
+    assert toDatetime(date(2020, 3, 1)) == datetime(2020, 3, 1)
+    assert toDatetime(pd.Timestamp('2020-03-01')) == datetime(2020, 3, 1)
+    assert toDatetime('2021-03-01 00:00:00') == datetime(2021, 3, 1)
+    assert toDatetime('01/03/2021') == datetime(2021, 3, 1)
+    assert toDatetime('2021') == datetime(2021, 1, 1)
+
+
+def test_to_datetime_years():
+    assert toDatetime(2021) == datetime(2021, 1, 1)
+    assert toDatetime(2021.0) == datetime(2021, 1, 1)
+    assert toDatetime(np.int64(2021)) == datetime(2021, 1, 1)
+    assert toDatetime(np.float32(2021)) == datetime(2021, 1, 1)
+
+
+def test_to_datetime_invalid():
+    for d in [None, float('nan'), np.nan, float('inf'), -np.inf, 0, 20000,
+              True, 'not a date']:
+        assert toDatetime(d) is None
+
+
+def test_altmetrics_not_refetched(monkeypatch):
+    fetched = []
+    def retrieve(doi):
+        fetched.append(doi)
+        return None, 'not_found'
+    monkeypatch.setattr(bib, 'retrieveAltmetricScore', retrieve)
+    
+    b = Bib(doi='10.1/a', title='A')
+    assert b.retrieveFromAMetric() is None
+    assert b.altmetric_status == 'not_found'
+    b.retrieveFromAMetric()
+    assert fetched == ['10.1/a']
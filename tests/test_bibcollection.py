@@ -0,0 +1,72 @@
+"""
+Tests of the BibCollection module
+"""
+
+import pytest
+import biblyser.name as name
+import biblyser.bibcollection as bibcollection
+from biblyser.bib import Bib
+from biblyser.bibcollection import BibCollection, bibsFromCSV
+from biblyser.organisation import Organisation
+
+#------------------------------------------------------------------------------
+
+@pytest.fixture
+def collection():
+    org = Organisation(['Jane Doe', 'John Smith'], genders=['female', None])
+    bibs = [Bib(doi='10.1/a', title='A', authors=['Jane Doe', 'Ann Other'],
+                genders=['female', 'female'], date='2020-01-01'),
+            Bib(doi='10.1/b', title='B', authors=['Ann Other', 'John Smith'],
+                genders=['female', 'male'], date='2021-06-01')]
+    collection = BibCollection(bibs)
+    collection.addOrganisation(org)
+    return collection
+
+
+def test_export_does_not_define_genders(collection, monkeypatch):
+    def fail(*args):
+        raise AssertionError('Gender defined during export')
+    monkeypatch.setattr('builtins.input', fail)
+    monkeypatch.setattr(name, 'getDetector', fail)
+    
+    df = collection.asDataFrame()
+    assert list(df['org_authors']) == ['Jane Doe', 'John Smith']
+    assert list(df['org_genders']) == ['female', 'unknown']
+    assert list(df['org_led']) == [True, False]
+    assert collection.getOrganisation().names[1].gender is None
+
+
+def test_csv_round_trip(collection, tmp_path):
+    csv_file = str(tmp_path / 'bibs.csv')
+    collection.asDataFrame().to_csv(csv_file)
+    loaded = bibsFromCSV(csv_file)
+    assert [b.doi for b in loaded.bibs] == ['10.1/a', '10.1/b']
+    assert [a.fullname for a in loaded.bibs[1].authors] == ['Ann Other', 
+                                                            'John Smith']
+    assert loaded.bibs[1].genders == ['female', 'male']
+    assert loaded.bibs[1].date.year == 2021
+
+
+def test_altmetrics_not_refetched(monkeypatch):
+    fetched = []
+    def retrieve(doi):
+        fetched.append(doi)
+        if doi == '10.1/a':
+            return 12.5, 'found'
+        return None, 'not_found'
+    monkeypatch.setattr(bibcollection, 'retrieveAltmetricScore', retrieve)
+    
+    bibs = [Bib(doi='10.1/a', title='A'), Bib(doi='10.1/A', title='A2'),
+            Bib(doi='10.1/b', title='B'), Bib(doi=None, title='C'),
+            Bib(doi='', title='D')]
+    collection = BibCollection(bibs)
+    collection.retrieveAltmetrics(workers=2)
+    assert sorted(fetched) == ['10.1/a', '10.1/b']
+    assert [b.altmetrics for b in bibs] == [12.5, 12.5, None, None, None]
+    assert [b.altmetric_status for b in bibs] == ['found', 'found', 
+                                                  'not_found', 'no_doi', 
+                                                  'no_doi']
+    
+    #Outcomes are kept, so nothing is retrieved again
+    collection.retrieveAltmetrics(workers=2)
+    assert len(fetched) == 2
@@ -0,0 +1,114 @@
+"""
+Tests of the on-disk response cache (biblyser.cache)
+"""
+
+import time
+import pytest
+from biblyser.cache import ResponseCache, SQLiteBackend, FileBackend, \
+    cachedCall, setCache, getRequestKey
+
+#------------------------------------------------------------------------------
+
+@pytest.fixture(params=['sqlite', 'file'])
+def cache(request, tmp_path):
+    if request.param == 'sqlite':
+        filepath = str(tmp_path / 'cache.db')
+    else:
+        filepath = str(tmp_path / 'cache')
+    return ResponseCache(filepath, backend=request.param)
+
+
+def test_request_key():
+    assert getRequestKey('crossref', {'query': ' Jane  DOE', 'rows': 5}) == \
+        getRequestKey('crossref', {'rows': 5, 'query': 'jane doe'})
+    assert getRequestKey('crossref', {'query': 'a'}) != \
+        getRequestKey('scholar', {'query': 'a'})
+
+
+def test_round_trip(cache):
+    assert cache.get('crossref', {'query': 'a'}) == (False, None)
+    cache.set('crossref', {'query': 'a'}, {'items': [1, 2]})
+    assert cache.get('crossref', {'query': 'A '}) == (True, {'items': [1, 2]})
+    assert cache.getStats()['crossref'] == {'hits': 1, 'misses': 1,
+                                            'hit_rate': 0.5}
+
+
+def test_expiry(cache):
+    cache.ttl['altmetric'] = 0.01
+    cache.set('altmetric', {'doi': 'a'}, 1)
+    time.sleep(0.05)
+    assert cache.get('altmetric', {'doi': 'a'}) == (False, None)
+
+
+def test_cached_call(cache):
+    calls = []
+    def request():
+        calls.append(1)
+        return None
+    setCache(cache)
+    try:
+        cachedCall('altmetric', {'doi': 'a'}, request)
+        cachedCall('altmetric', {'doi': 'a'}, request)
+        cachedCall('altmetric', {'doi': 'b'}, request, cache_none=True)
+        assert cachedCall('altmetric', {'doi': 'b'}, request) is None
+    finally:
+        setCache(None)
+    assert len(calls) == 3
+
+
+def test_running_size(cache, tmp_path):
+    cache.max_size = 10**6
+    cache.set('crossref', {'query': 'a'}, 'x' * 100)
+    cache.set('crossref', {'query': 'b'}, 'x' * 200)
+    cache.set('crossref', {'query': 'a'}, 'x' * 50)
+    cache.backend.delete(getRequestKey('crossref', {'query': 'b'}))
+    size = cache.backend.size
+    assert size > 50
+    
+    #Size is loaded when reopened
+    if isinstance(cache.backend, SQLiteBackend):
+        assert SQLiteBackend(cache.backend.filepath).size == size
+    else:
+        assert FileBackend(cache.backend.directory).size == size
+    cache.clear()
+    assert cache.backend.size == 0
+
+
+def test_writes_do_not_scan(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'), max_size=10**6)
+    statements = []
+    cache.backend.conn.set_trace_callback(statements.append)
+    for i in range(10):
+        cache.set('crossref', {'query': str(i)}, 'response')
+    assert not any('SUM' in s for s in statements)
+
+
+def test_hits_are_batched(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'))
+    cache.set('crossref', {'query': 'a'}, 'response')
+    statements = []
+    cache.backend.conn.set_trace_callback(statements.append)
+    for i in range(10):
+        assert cache.get('crossref', {'query': 'a'})[0]
+    assert not any(s.startswith('UPDATE') for s in statements)
+    assert len(cache.backend.accessed) == 1
+    
+    cache.flush()
+    assert len(cache.backend.accessed) == 0
+    assert sum(s.startswith('UPDATE') for s in statements) == 1
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'))
+    cache.set('crossref', {'query': 'a'}, 'x' * 100)
+    time.sleep(0.01)
+    cache.set('crossref', {'query': 'b'}, 'x' * 100)
+    time.sleep(0.01)
+    
+    #Access time of hit is held in memory until eviction
+    cache.get('crossref', {'query': 'a'})
+    cache.max_size = 300
+    cache.set('crossref', {'query': 'c'}, 'x' * 100)
+    assert cache.get('crossref', {'query': 'a'})[0]
+    assert not cache.get('crossref', {'query': 'b'})[0]
+    assert cache.get('crossref', {'query': 'c'})[0]
@@ -0,0 +1,84 @@
+"""
+Tests of concurrent requests with rate limits (biblyser.concurrency)
+"""
+
+import time
+import biblyser.clients as clients
+from biblyser.concurrency import RateLimiter, getRateLimiters, \
+    getActiveRateLimiters, limitRate, runConcurrent
+
+
+class CountingLimiter(object):
+    """Rate limiter that counts acquired requests without waiting"""
+    def __init__(self):
+        self.count = 0
+
+    def acquire(self):
+        self.count += 1
+
+
+class FakeResponse(object):
+    """Minimal HTTP response of an empty CrossRef search"""
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'status': 'ok', 'message': {'items': []}}
+
+
+class FakeSession(object):
+    """Minimal HTTP session returning empty CrossRef searches"""
+    def get(self, url, **kwargs):
+        return FakeResponse()
+
+
+def test_rate_limiter_rate():
+    limiter = RateLimiter(rate=20, capacity=1)
+    t0 = time.perf_counter()
+    for i in range(5):
+        limiter.acquire()
+    assert time.perf_counter() - t0 >= 0.15
+
+
+def test_disabled_rates():
+    limiters = getRateLimiters({'scholar': None})
+    assert 'scholar' not in limiters
+    assert 'crossref' in limiters
+
+
+def test_limit_per_request():
+    limiter = CountingLimiter()
+
+    def task():
+        limitRate('crossref')
+        limitRate('crossref')
+        return True
+
+    tasks = [['crossref', task, []] for i in range(3)]
+    assert runConcurrent(tasks, 2, {'crossref': limiter}) == [True] * 3
+    assert limiter.count == 6
+    assert getActiveRateLimiters() == {}
+
+
+def test_client_requests_limited(monkeypatch):
+    monkeypatch.setattr(clients, 'getSession', lambda: FakeSession())
+    limiter = CountingLimiter()
+
+    def task():
+        clients.crossrefWorks(query='a')
+        clients.crossrefWorks(query='b')
+
+    runConcurrent([['scholar', task, []]], 1, {'crossref': limiter})
+    assert limiter.count == 2
+
+
+def test_failed_task_keeps_results():
+    def fail():
+        raise RuntimeError('request failed')
+
+    tasks = [['crossref', lambda: 1, []],
+             ['crossref', fail, []],
+             ['crossref', lambda: 3, []]]
+    results = runConcurrent(tasks, 2)
+    assert results[0] == 1 and results[2] == 3
+    assert isinstance(results[1], RuntimeError)
@@ -0,0 +1,51 @@
+"""
+Tests of the precomputed count cube (biblyser.cube)
+"""
+
+import pandas as pd
+import pytest
+from biblyser.cube import BibCube
+
+#------------------------------------------------------------------------------
+
+@pytest.fixture
+def cube():
+    df = pd.DataFrame({
+        'date': ['2020-01-01', '2020-06-01', '2021-03-01', '2021-05-01', None],
+        'first_gender': ['female', 'male', 'female', None, 'male'],
+        'org_led': ['True', 'False', True, False, True],
+        'journal': ['Nature', 'The Cryosphere', 'Nature', 'Nature', None],
+        'countries': ['Denmark, Greenland', 'Denmark', None, 
+                      'Denmark, Denmark', 'Norway']})
+    return BibCube(df)
+
+
+def test_labels(cube):
+    assert cube.getLabels('year') == [2020, 2021]
+    assert cube.getLabels('country') == ['Denmark', 'Greenland', 'Norway']
+    with pytest.raises(ValueError):
+        cube.getLabels('title')
+
+
+def test_count(cube):
+    assert cube.count() == 5
+    assert cube.count(gender='female') == 2
+    assert cube.count(gender='female', org_led=True, year=2020) == 1
+    assert cube.count(year=None) == 1
+    assert cube.count(gender=['female', None]) == 3
+    assert cube.count(journal='Science') == 0
+
+
+def test_count_countries(cube):
+    assert cube.count(country='Denmark') == 3
+    assert cube.count(country='Denmark', year=2020) == 2
+    assert cube.count(country=['Greenland', 'Norway']) == 2
+
+
+def test_rollup(cube):
+    assert cube.rollup('year').to_dict() == {2020: 2, 2021: 2, None: 1}
+    by = cube.rollup(['gender', 'org_led'], journal='Nature')
+    by = {(None if pd.isna(g) else g, o): c for (g, o), c in by.items()}
+    assert by == {('female', True): 2, (None, False): 1}
+    assert cube.rollup('country', org_led=True).to_dict() == \
+        {'Denmark': 1, 'Greenland': 1, 'Norway': 1}
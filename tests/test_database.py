@@ -0,0 +1,71 @@
+"""
+Tests of the Database module
+"""
+
+from biblyser.name import Name
+from biblyser.database import NameDatabase, databaseFromCSV
+from biblyser.organisation import Organisation
+
+#------------------------------------------------------------------------------
+
+def test_lookup_by_name_format(tmp_path):
+    db = NameDatabase(str(tmp_path / 'names.db'))
+    db.addName('Jane Emily Doe', g='female', scopusid='123')
+    for f in ['Jane Emily Doe', 'J. E. Doe', 'J. Doe', 'Jane E. Doe']:
+        assert db.checkGender(f) == 'female'
+    assert db.checkOrgName('J. Doe').scopusid == '123'
+    assert db.checkGender('John Smith') is None
+    assert len(db) == 1
+    db.close()
+
+
+def test_upsert_keeps_stored_values(tmp_path):
+    db = NameDatabase(str(tmp_path / 'names.db'))
+    db.addName('Jane Doe', g='female', orcid='0000-0001', scopusid='123',
+               hindex_scopus=12)
+    
+    #Update with a name that only holds a gender
+    db.addNames([Name('Jane Doe', gender='non-binary')])
+    n = db.checkOrgName('Jane Doe')
+    assert n.gender == 'non-binary'
+    assert n.orcid == '0000-0001'
+    assert n.scopusid == '123'
+    assert n.hindex_scopus == 12
+    assert len(db) == 1
+    db.close()
+
+
+def test_updated_name_takes_precedence(tmp_path):
+    db = NameDatabase(str(tmp_path / 'names.db'))
+    db.addName('John Doe', g='male')
+    db.addName('Jane Doe', g='female')
+    assert db.checkGender('J. Doe') == 'female'
+    
+    #Updating the older name makes it the most recent
+    db.addName('John Doe', g='male', orcid='0000-0002')
+    assert db.checkGender('J. Doe') == 'male'
+    db.close()
+
+
+def test_persists_and_exports(tmp_path):
+    filepath = str(tmp_path / 'names.db')
+    db = NameDatabase(filepath)
+    db.addNames([Name('Jane Doe', gender='female'), 
+                 Name('John Smith', gender='male')])
+    db.close()
+    
+    db = NameDatabase(filepath)
+    assert [n.fullname for n in db.getAllNames()] == ['Jane Doe', 
+                                                      'John Smith']
+    assert isinstance(db.asOrganisation(), Organisation)
+    assert list(db.asDataFrame()['guessed_gender']) == ['female', 'male']
+    db.close()
+
+
+def test_database_from_csv(tmp_path):
+    org = Organisation(['Jane Doe', 'John Smith'], genders=['female', 'male'])
+    csv_file = str(tmp_path / 'org.csv')
+    org.asDataFrame().to_csv(csv_file)
+    db = databaseFromCSV(csv_file, str(tmp_path / 'names.db'))
+    assert db.checkGender('J. Smith') == 'male'
+    db.close()
@@ -0,0 +1,113 @@
+"""
+Tests of finding and merging duplicate bibs (biblyser.dedup)
+"""
+
+from biblyser.bib import Bib
+from biblyser.dedup import normaliseDOI, normaliseTitle, groupDuplicates, \
+    mergeBibs, findNearDuplicates, isTruncated, getBands
+
+
+def test_normalise():
+    assert normaliseDOI('https://doi.org/10.5194/TC-1') == '10.5194/tc-1'
+    assert normaliseDOI('nan') is None
+    assert normaliseTitle('Ice &amp; Snow: A Review…') == 'ice snow a review'
+
+
+def test_group_transitive():
+    bibs = [Bib(doi='10.1/a', title='Ice sheets'),
+            Bib(doi=None, title='Ice sheets (preprint)'),
+            Bib(doi='https://doi.org/10.1/A', title='Ice Sheets (Preprint)'),
+            Bib(doi='10.1/b', title='Glaciers')]
+    assert groupDuplicates(bibs) == [[0, 1, 2], [3]]
+
+
+def test_group_conflicting_dois():
+    bibs = [Bib(doi='10.1/a', title='Editorial'),
+            Bib(doi='10.1/b', title='Editorial'),
+            Bib(doi=None, title='Editorial'),
+            Bib(doi='10.1/b', title='Preface')]
+    assert groupDuplicates(bibs) == [[0, 2], [1, 3]]
+
+
+def test_group_near_duplicates():
+    bibs = [Bib(doi=None, title='Mass balance of the Greenland Ice Sheet'),
+            Bib(doi=None, title='Mass balance of the Greenland ice sheet.'),
+            Bib(doi=None, title='Mass balance of the Greenland Ice…'),
+            Bib(doi=None, title='Sea level rise from Antarctica')]
+    assert groupDuplicates(bibs, near_threshold=0.8) == [[0, 1, 2], [3]]
+
+
+def test_group_near_duplicates_across_dois():
+    bibs = [Bib(doi='10.5194/tc-2020-1', 
+                title='Mass balance of the Greenland Ice Sheet'),
+            Bib(doi='10.5194/tc-14-1-2020', 
+                title='Mass balance of the Greenland ice sheet.'),
+            Bib(doi='10.1/c', title='Sea level rise from Antarctica')]
+    assert groupDuplicates(bibs, near_threshold=0.8) == [[0], [1], [2]]
+    assert groupDuplicates(bibs, near_threshold=0.8, cross_doi=True) == \
+        [[0, 1], [2]]
+
+
+def test_near_duplicates_lsh():
+    titles = ['Surface melt of the Greenland ice sheet from 1979 to 2020',
+              'Surface melt of the Greenland ice sheet from 1979 to 2021',
+              'Calving dynamics of Antarctic ice shelves',
+              None,
+              'Surface melt of the Greenland…']
+    assert findNearDuplicates(titles, threshold=0.8) == [[0, 1, 4]]
+
+
+def test_lsh_bands():
+    for threshold in [0.5, 0.8, 0.9]:
+        bands, rows = getBands(threshold, 64)
+        assert bands * rows == 64
+        assert 1 - (1 - threshold**rows)**bands >= 0.99
+
+
+def test_near_duplicates_threshold():
+    titles = ['Greenland ice sheet surface mass balance',
+              'Greenland ice sheet surface mass budget',
+              'Antarctic ice sheet surface mass balance']
+    assert findNearDuplicates(titles, threshold=0.95) == []
+    assert findNearDuplicates(titles, threshold=0.6)[0][:2] == [0, 1]
+
+
+def test_near_duplicates_truncated():
+    assert isTruncated('Ice sheet mass balance from...')
+    assert not isTruncated('Ice sheet mass balance')
+    titles = ['Ice sheet mass balance from satellite gravimetry and '
+              'altimetry over two decades',
+              'Ice sheet mass balance from…',
+              'Ice sheet…']
+    assert findNearDuplicates(titles, threshold=0.9) == [[0, 1]]
+
+
+def test_merge_authors_from_same_bib():
+    scopus = Bib(doi='10.1/a', title='Ice', authors=['Jane Doe', 'John Smith'],
+                 genders=None, author_ids=['1', '2'], citations=3,
+                 source='scopus')
+    crossref = Bib(doi='10.1/a', title='Ice', authors=['J. Doe', 'J. Smith'],
+                   genders=['female', 'male'], citations=5,
+                   source='crossref')
+    scholar = Bib(doi=None, title='Ice', authors=['J Doe'],
+                  genders=['female'], author_countries=[['DK']],
+                  source='scholar')
+    merged = mergeBibs([scholar, crossref, scopus])
+    assert [a.fullname for a in merged.authors] == ['Jane Doe', 'John Smith']
+    assert merged.author_ids == ['1', '2']
+    assert merged.genders == ['female', 'male']
+    assert merged.author_countries is None
+    assert merged.citations == 5
+
+
+def test_merge_keeps_inputs():
+    scopus = Bib(doi='10.1/a', title='Ice', authors=None, citations=3,
+                 aff_countries=['DK'], source='scopus')
+    crossref = Bib(doi='10.1/a', title='Ice', authors=['Jane Doe'],
+                   citations=5, aff_countries=['GL'], source='crossref')
+    merged = mergeBibs([crossref, scopus])
+    assert merged is not scopus
+    assert merged.aff_countries == ['DK', 'GL']
+    assert scopus.authors is None
+    assert scopus.citations == 3
+    assert scopus.aff_countries == ['DK']
@@ -0,0 +1,70 @@
+"""
+Tests of the Deferred module, and of deferred gender definition when fetching 
+co-author genders
+"""
+
+from biblyser.bib import Bib
+from biblyser.bibcollection import BibCollection
+from biblyser.database import NameDatabase
+from biblyser.deferred import DeferredQueue, setDeferredQueue
+
+#Name that gender_guesser cannot guess
+AMBIGUOUS = 'Xqzwv Smith'
+
+#------------------------------------------------------------------------------
+
+def test_queue_round_trip(tmp_path):
+    queue = DeferredQueue(str(tmp_path / 'queue.json'))
+    queue.addGender(AMBIGUOUS)
+    queue.addScopusAuthor('Jane Doe', [{'eid': '1'}, {'eid': '2'}])
+    assert queue.getPending('gender') == [AMBIGUOUS]
+    assert queue.getAnswer('gender', AMBIGUOUS) is None
+    
+    queue.items['gender'][AMBIGUOUS]['answer'] = 'female'
+    queue.save()
+    loaded = DeferredQueue(str(tmp_path / 'queue.json'))
+    assert loaded.getAnswers('gender') == {AMBIGUOUS: 'female'}
+    assert loaded.getPending('scopus') == ['Jane Doe']
+
+
+def test_deferred_gender_across_runs(tmp_path):
+    db = NameDatabase(str(tmp_path / 'names.db'))
+    queue = DeferredQueue(str(tmp_path / 'queue.json'))
+    setDeferredQueue(queue)
+    try:
+        #First run queues the ambiguous name without storing it
+        bibs = BibCollection([Bib(doi='10.1/a', title='A', 
+                                  authors=[AMBIGUOUS])])
+        bibs.getAllGenders(db)
+        assert bibs.bibs[0].genders == ['unknown']
+        assert queue.getPending('gender') == [AMBIGUOUS]
+        assert db.checkGender(AMBIGUOUS) is None
+        
+        #Next run uses the queued answer and stores it
+        queue.items['gender'][AMBIGUOUS]['answer'] = 'female'
+        bibs = BibCollection([Bib(doi='10.1/b', title='B', 
+                                  authors=[AMBIGUOUS])])
+        bibs.getAllGenders(db)
+        assert bibs.bibs[0].genders == ['female']
+        assert db.checkGender(AMBIGUOUS) == 'female'
+    finally:
+        setDeferredQueue(None)
+        db.close()
+
+
+def test_stored_unknown_gender_is_redefined(tmp_path):
+    db = NameDatabase(str(tmp_path / 'names.db'))
+    db.addName(AMBIGUOUS, g='unknown')
+    queue = DeferredQueue(str(tmp_path / 'queue.json'))
+    queue.addGender(AMBIGUOUS)
+    queue.items['gender'][AMBIGUOUS]['answer'] = 'non-binary'
+    setDeferredQueue(queue)
+    try:
+        bibs = BibCollection([Bib(doi='10.1/a', title='A', 
+                                  authors=[AMBIGUOUS])])
+        bibs.getAllGenders(db)
+        assert bibs.bibs[0].genders == ['non-binary']
+        assert db.checkGender(AMBIGUOUS) == 'non-binary'
+    finally:
+        setDeferredQueue(None)
+        db.close()
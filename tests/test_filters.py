@@ -0,0 +1,61 @@
+"""
+Tests of bib filtering predicates (biblyser.filters)
+"""
+
+import pytest
+from biblyser.bib import Bib
+from biblyser.bibcollection import BibCollection
+from biblyser.filters import compileKeywords, matchKeywords, \
+    keywordPredicate, authorCountPredicate, anyPredicate, allPredicates, \
+    notPredicate
+
+#------------------------------------------------------------------------------
+
+@pytest.fixture
+def bibs():
+    return [Bib(doi='10.1/a', title='A', journal='EGU Abstracts', 
+                authors=['Jane Doe']),
+            Bib(doi='10.1/b', title='B', journal='The Cryosphere Discussions',
+                authors=['Jane Doe', 'John Smith']),
+            Bib(doi='10.1/c', title='C', journal='The Cryosphere', 
+                authors=None),
+            Bib(doi='10.1/d', title='D', journal=None,
+                authors=['Jane Doe', 'John Smith', 'Ann Other'])]
+
+
+def test_keywords():
+    matcher = compileKeywords(['abstract', 'c++'])
+    assert matchKeywords('EGU ABSTRACTS', matcher)
+    assert matchKeywords('Notes on C++', matcher)
+    assert not matchKeywords('The Cryosphere', matcher)
+    assert not matchKeywords(None, matcher)
+
+
+def test_predicates(bibs):
+    abstract = keywordPredicate('journal', 'abstract')
+    discussion = keywordPredicate('journal', ['discussion'])
+    counts = authorCountPredicate(min_authors=2, max_authors=2)
+    assert [abstract(b) for b in bibs] == [True, False, False, False]
+    assert [counts(b) for b in bibs] == [True, False, False, True]
+    assert [anyPredicate(abstract, discussion)(b) for b in bibs] == \
+        [True, True, False, False]
+    assert [allPredicates(abstract, counts)(b) for b in bibs] == \
+        [True, False, False, False]
+    assert [notPredicate(abstract)(b) for b in bibs] == \
+        [False, True, True, True]
+
+
+def test_remove_where(bibs):
+    collection = BibCollection(bibs)
+    collection.removeWhere(keywordPredicate('journal', 'abstract'),
+                           authorCountPredicate(max_authors=2))
+    assert [b.title for b in collection.bibs] == ['B', 'C']
+
+
+def test_remove_from_keyword_list(bibs):
+    collection = BibCollection(bibs)
+    collection.removeFromKeyword(['x', 'glacier', 'y', 'Glaciers'], 'glacier')
+    assert [b.title for b in collection.bibs] == ['A', 'C']
+    with pytest.raises(ValueError):
+        collection.removeFromKeyword(['glacier'], 'glacier')
+    assert len(collection.bibs) == 2
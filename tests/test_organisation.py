@@ -0,0 +1,103 @@
+"""
+Tests of the Organisation module
+"""
+
+import copy
+import pickle
+from biblyser.name import Name
+from biblyser.organisation import Organisation, checkAffiliation, \
+    checkGender, orgFromCSV
+
+#------------------------------------------------------------------------------
+
+def test_lookup_formats():
+    org = Organisation(['Jane Emily Doe', 'John Smith'],
+                       genders=['female', 'male'])
+    assert org.checkOrgName('J. E. Doe') is org.names[0]
+    assert checkGender('J. Smith', org) == 'male'
+    assert org.checkOrgName('Ann Other') is None
+
+
+def test_index_follows_name_edits():
+    org = Organisation(['Jane Doe', 'John Smith'])
+    assert org.checkOrgName('J. Doe') is not None
+    org.names[0].surname = 'Roe'
+    assert org.checkOrgName('J. Doe') is None
+    assert org.checkOrgName('J. Roe') is org.names[0]
+
+
+def test_index_follows_list_changes():
+    org = Organisation(['Jane Doe', 'John Smith'])
+    assert org.checkOrgName('J. Smith') is not None
+    org.names.append(Name('Ann Other'))
+    assert org.checkOrgName('A. Other') is org.names[2]
+    del org.names[1]
+    assert org.checkOrgName('J. Smith') is None
+    org.names[0] = Name('Bo Bee')
+    assert org.checkOrgName('J. Doe') is None
+    org.names = [Name('Cy Dee')]
+    assert org.checkOrgName('C. Dee') is org.names[0]
+    org.addName('Ed Eff')
+    assert org.checkOrgName('E. Eff') is org.names[1]
+    org.names += [Name('Fi Gee')]
+    org.names.insert(0, Name('Hal Ide'))
+    assert org.checkOrgName('F. Gee') is org.names[3]
+    assert org.checkOrgName('H. Ide') is org.names[0]
+
+
+def test_add_name_without_rebuild(monkeypatch):
+    org = Organisation(['Jane Doe', 'John Smith'])
+    assert org.checkOrgName('J. Doe') is org.names[0]
+    
+    def fail():
+        raise AssertionError('Name index rebuilt')
+    monkeypatch.setattr(org, 'buildIndex', fail)
+    for i in range(10):
+        org.addName(f'Ann Other{i}')
+        assert org.checkOrgName(f'A. Other{i}') is org.names[-1]
+    org.names.extend([Name('Bo Bee')])
+    assert org.checkOrgName('B. Bee') is org.names[-1]
+    assert org.checkOrgName('J. Smith') is org.names[1]
+
+
+def test_index_after_copy():
+    org = Organisation(['Jane Doe', 'John Smith'])
+    org.checkOrgName('J. Doe')
+    for new in [copy.deepcopy(org), pickle.loads(pickle.dumps(org))]:
+        new.names[0].surname = 'Roe'
+        assert new.checkOrgName('J. Roe') is new.names[0]
+    assert org.checkOrgName('J. Doe') is org.names[0]
+
+
+def test_index_after_shallow_copy():
+    org = Organisation(['Jane Doe', 'John Smith'])
+    org.checkOrgName('J. Doe')
+    new = copy.copy(org)
+    new.addName(Name('Kim Smith'))
+    assert new.checkOrgName('Kim Smith') is new.names[2]
+    assert new.names[0] is org.names[0]
+    assert org.checkOrgName('Kim Smith') is None
+    assert len(org.names) == 2
+    
+    #Edits to shared names update both indexes
+    org.names[0].surname = 'Roe'
+    assert org.checkOrgName('J. Roe') is org.names[0]
+    assert new.checkOrgName('J. Roe') is org.names[0]
+
+
+def test_affiliation():
+    org = Organisation([Name('Jane Doe', affiliation='GEUS')])
+    assert checkAffiliation('J. Doe', org) == 'GEUS'
+    assert checkAffiliation('Ann Other', org) is None
+
+
+def test_csv_round_trip_quiet(tmp_path, capsys):
+    org = Organisation(['Jane Doe', 'John Smith'], genders=['female', 'male'])
+    csv_file = str(tmp_path / 'org.csv')
+    org.asDataFrame().to_csv(csv_file)
+    capsys.readouterr()
+    
+    loaded = orgFromCSV(csv_file)
+    assert capsys.readouterr().out == ''
+    assert [n.fullname for n in loaded.names] == ['Jane Doe', 'John Smith']
+    assert checkGender('J. Doe', loaded) == 'female'
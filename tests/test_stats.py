@@ -0,0 +1,96 @@
+"""
+Tests of BibCollection statistics (biblyser.stats)
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from biblyser.stats import toLists, toBoolean, explodeLists, \
+    getGenderPercentages, getGenderDistrib, firstFromDF, countByYear, \
+    countFirstLast, countAuthorshipByYear, countTop, getSummary
+
+#------------------------------------------------------------------------------
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        'date': ['2020-01-01', '2020-06-01', '2021-03-01', None],
+        'org_led': ['True', 'False', True, np.nan],
+        'genders': ['female, male', 'male, male, non-binary', None,
+                    'unknown'],
+        'org_genders': ['female', 'male, unknown', None, 'unknown'],
+        'first_gender': ['female', 'male', None, 'unknown'],
+        'last_gender': ['male', 'non-binary', None, None],
+        'journal': ['Nature', 'The Cryosphere', 'Nature', None],
+        'countries': ['Denmark, Greenland', 'Denmark', None, 'Norway'],
+        'affiliations': ['GEUS, KU', 'GEUS', None, 'UiO'],
+        'citations': [10, 2, None, 0],
+        'altmetric': [5.0, None, 1.0, None]})
+
+
+def test_lists(df):
+    assert toLists(df['countries']).iloc[0] == ['Denmark', 'Greenland']
+    assert list(toBoolean(df['org_led'])) == [True, False, True, False]
+    rows, values, positions = explodeLists(df['genders'])
+    assert list(rows) == [0, 0, 1, 1, 1, 3]
+    assert list(values) == ['female', 'male', 'male', 'male', 'non-binary',
+                            'unknown']
+    assert list(positions) == [0, 1, 0, 1, 2, 0]
+
+
+def test_explode_list_column(df):
+    lists = df['genders'].str.split(', ')
+    rows, values, positions = explodeLists(lists)
+    assert list(rows) == [0, 0, 1, 1, 1, 3]
+    assert list(positions) == [0, 1, 0, 1, 2, 0]
+
+
+def test_gender_distribution(df):
+    pct = getGenderPercentages(df)
+    assert list(pct.iloc[0]) == [50, 50, 0]
+    assert np.allclose(pct.iloc[1], [0, 200/3, 100/3])
+    assert pct.iloc[2].isna().all()
+    f, m, nb = getGenderDistrib(df, first=False)
+    assert f == [0, 0]
+    assert m == [100, 50]
+    assert nb == [0, 50]
+
+
+def test_first_and_years(df):
+    assert list(firstFromDF(df).index) == [0, 2]
+    assert list(firstFromDF(df, first=False).index) == [1, 3]
+    counts = countByYear(df)
+    assert list(counts.index) == [2020, 2021]
+    assert list(counts['count']) == [2, 1]
+
+
+def test_first_last(df):
+    counts = countFirstLast(df)
+    assert counts.loc['female'].tolist() == [1, 0]
+    assert counts.loc['male'].tolist() == [1, 1]
+    assert counts.loc['non-binary'].tolist() == [0, 1]
+    assert counts['first'].sum() == 3
+
+
+def test_authorship_by_year(df):
+    counts = countAuthorshipByYear(df)
+    assert list(counts.index) == [2020, 2021]
+    assert counts.loc[2020].tolist() == [1, 0, 0, 2]
+    assert counts.loc[2021].tolist() == [0, 0, 0, 0]
+
+
+def test_top(df):
+    top = countTop(df, 'journal', n=1)
+    assert top.to_dict() == {'Nature': 2, 'Others': 1}
+    top = countTop(df, 'countries', n=2, skip=1, others=False)
+    assert sorted(top.index) == ['Greenland', 'Norway']
+    assert countTop(df, 'countries', n=1)['Denmark'] == 2
+
+
+def test_summary(df):
+    summary = getSummary(df)
+    assert summary['total'] == 4
+    assert summary['org_led'] == 2
+    assert summary['coauthored'] == 2
+    assert summary['mean_citations'] == 4
+    assert summary['mean_altmetric'] == 3